@@ -1,37 +1,76 @@
 from __future__ import absolute_import
-import unittest
 import sys
-
-from natlang import format
-from natlang import analysis
-
-from natlang import exporter
-from natlang import fileConverter
-from natlang import loader as loade
+import importlib
 
 from natlang import __version__
 __version__ = __version__.version
 
-testModules = {
-    analysis.conllTransformer,
-    format.AMR,
-    format.semanticFrame,
-    format.tree,
-    format.txt,
-    format.txtFiles,
-    format.txtOrTree,
-    format.conll,
-    loader,
-}
+# Submodules are imported on first access (e.g. natlang.format), so that
+# "import natlang" stays cheap. fileConverter in particular pulls in jieba.
+_lazyModules = (
+    "format",
+    "analysis",
+    "exporter",
+    "fileConverter",
+    "loader",
+    "parallel",
+    "cache",
+    "corpus",
+    "progress",
+    "columnar",
+    "vocabulary",
+    "phrase",
+    "lazy",
+    "traversal",
+)
+
+testModules = (
+    "natlang.analysis.conllTransformer",
+    "natlang.analysis.treebankIndex",
+    "natlang.analysis.conllSearch",
+    "natlang.format.AMR",
+    "natlang.format.semanticFrame",
+    "natlang.format.tree",
+    "natlang.format.txt",
+    "natlang.format.txtFiles",
+    "natlang.format.txtOrTree",
+    "natlang.format.conll",
+    "natlang.loader",
+    "natlang.parallel",
+    "natlang.cache",
+    "natlang.corpus",
+    "natlang.progress",
+    "natlang.reader",
+    "natlang.columnar",
+    "natlang.vocabulary",
+    "natlang.phrase",
+    "natlang.lazy",
+    "natlang.traversal",
+    "natlang.exporter",
+)
+
+
+def __getattr__(attr):
+    if attr in _lazyModules:
+        return importlib.import_module("natlang." + attr)
+    raise AttributeError("module 'natlang' has no attribute '" + attr + "'")
+
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ is not supported, import everything upfront
+    for _module in _lazyModules:
+        importlib.import_module("natlang." + _module)
 
 
 def testSuite():
+    import unittest
     loader = unittest.TestLoader()
     suite = unittest.TestSuite()
 
     # add tests to the test suite
     for module in testModules:
-        suite.addTests(loader.loadTestsFromModule(module))
+        suite.addTests(
+            loader.loadTestsFromModule(importlib.import_module(module)))
     return suite
 
 
@@ -42,28 +81,62 @@ name = "natlang"
 def load(filePattern,
          format='txtOrTree',
          loader=None,
-         linesToLoad=sys.maxsize, verbose=True, option=None):
-    _loader = loade.DataLoader(format, loader)
+         linesToLoad=sys.maxsize, verbose=True, option=None, workers=1,
+         cache=None, skip=0):
+    from natlang.loader import DataLoader
+    _loader = DataLoader(format, loader, cache=cache)
     return _loader(filePattern,
                    linesToLoad=linesToLoad,
                    verbose=verbose,
-                   option=option)
+                   option=option,
+                   workers=workers,
+                   skip=skip)
+
+
+def iterload(filePattern,
+             format='txtOrTree',
+             loader=None,
+             linesToLoad=sys.maxsize, verbose=True, option=None, skip=0):
+    from natlang.loader import DataLoader
+    _loader = DataLoader(format, loader)
+    return _loader.iter(filePattern,
+                        linesToLoad=linesToLoad,
+                        verbose=verbose,
+                        option=option,
+                        skip=skip)
 
 
 def biload(srcFilePattern, tgtFilePattern,
            srcFormat='txtOrTree', tgtFormat='txtOrTree',
            srcLoader=None, tgtLoader=None,
-           linesToLoad=sys.maxsize, verbose=True, option=None):
-    lad = loader.ParallelDataLoader(srcFormat, tgtFormat)
+           linesToLoad=sys.maxsize, verbose=True, option=None, skip=0):
+    from natlang.loader import ParallelDataLoader
+    lad = ParallelDataLoader(srcFormat, tgtFormat)
     return lad(fFile=srcFilePattern,
                eFile=tgtFilePattern,
                linesToLoad=linesToLoad,
                verbose=verbose,
-               option=option)
+               option=option,
+               skip=skip)
+
+
+def iterbiload(srcFilePattern, tgtFilePattern,
+               srcFormat='txtOrTree', tgtFormat='txtOrTree',
+               srcLoader=None, tgtLoader=None,
+               linesToLoad=sys.maxsize, verbose=True, option=None, skip=0,
+               reportMismatch=False):
+    from natlang.loader import ParallelDataLoader
+    lad = ParallelDataLoader(srcFormat, tgtFormat, srcLoader, tgtLoader)
+    return lad.iter(fFile=srcFilePattern,
+                    eFile=tgtFilePattern,
+                    linesToLoad=linesToLoad,
+                    verbose=verbose,
+                    option=option,
+                    skip=skip,
+                    reportMismatch=reportMismatch)
 
 
 def export(content, fileName):
-    f = exporter.RealtimeExporter(fileName)
-    for line in content:
-        f.write(line)
+    from natlang.exporter import exportToFile
+    exportToFile(content, fileName)
     return
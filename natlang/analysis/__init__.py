@@ -1,4 +1,24 @@
 from __future__ import absolute_import
+import sys
+import importlib
 
-import unittest
-from natlang.analysis import conllTransformer
+# Submodules are imported on first access, e.g.
+# natlang.analysis.conllTransformer
+_lazyModules = (
+    "conllTransformer",
+    "treebankIndex",
+    "conllSearch",
+)
+
+
+def __getattr__(attr):
+    if attr in _lazyModules:
+        return importlib.import_module("natlang.analysis." + attr)
+    raise AttributeError(
+        "module 'natlang.analysis' has no attribute '" + attr + "'")
+
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ is not supported, import everything upfront
+    for _module in _lazyModules:
+        importlib.import_module("natlang.analysis." + _module)
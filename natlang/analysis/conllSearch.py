@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Search CoNLL files for a Dependency Expression from the command line
+# Simon Fraser University
+# Jetic Gu
+#
+# Prints one line per matching node: the file, the sentence (its sent_id
+# comment, or its position in the file counting from 1) and the ID of the
+# node, separated by tabs. With --excerpt the CoNLL lines of the subtree of
+# the node follow, then a blank line. Files, and ranges of sentences of large
+# files, are searched by a pool of processes; matches are printed in file
+# order.
+#
+#   > python -m natlang.analysis.conllSearch "(* nsubj * |root| *)" \
+#         "treebanks/*.conllu" --excerpt -o matches.txt
+#
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import glob
+import errno
+import inspect
+import argparse
+import unittest
+import multiprocessing
+
+from natlang.format import conll
+from natlang.parallel import splitFile, readRange
+from natlang.reader import isCompressed
+from natlang.exporter import Writer
+from natlang.analysis.conllTransformer import compile
+
+__version__ = "0.3a"
+
+
+def _searchRange(args):
+    # Runs in a worker process, hence defined at module level for pickling
+    pattern, fileName, start, end, excerpt = args
+    pattern = compile(pattern)
+    matches = []
+    sentence = 0
+    entry = []
+    comments = []
+    for rawLine in readRange(fileName, start, end):
+        line = rawLine.strip()
+        if line != "":
+            if line[0] != conll.defaultCommentMark:
+                entry.append(line)
+            else:
+                comments.append(line)
+            continue
+        _searchSentence(pattern, sentence, comments, entry, excerpt, matches)
+        sentence += 1
+        entry = []
+        comments = []
+    if len(entry) > 0:
+        _searchSentence(pattern, sentence, comments, entry, excerpt, matches)
+        sentence += 1
+    return sentence, matches
+
+
+def _searchSentence(pattern, sentence, comments, entry, excerpt, matches):
+    root = conll.constructFromText(entry)
+    if root is None:
+        return
+    sentId = conll.parseComments(comments).get("sent_id")
+    for node in pattern.finditer(root):
+        text = None
+        if excerpt is True:
+            text = "".join("\t".join(token.rawEntries) + "\n"
+                           for token in node.phrase)
+        matches.append((sentence, sentId, node.id, text))
+    return
+
+
+def search(pattern, fileNames, workers=1, excerpt=False, chunksPerWorker=4):
+    '''
+    @param pattern: str, a Dependency Expression
+    @param fileNames: list of str, CoNLL files
+    @param workers: int, the number of processes. With more than one, each
+        uncompressed file is split in up to workers * chunksPerWorker ranges
+        of sentences.
+    @param excerpt: bool, also return the CoNLL lines of each match
+    @return: generator of (file name, sentence id, node ID, excerpt) tuples
+        in file order. The sentence id is the sent_id comment of the sentence
+        if it has one, otherwise its position in the file counting from 1.
+        excerpt is None unless requested.
+    '''
+    compile(pattern)
+    tasks = []
+    for fileName in fileNames:
+        fileName = os.path.expanduser(fileName)
+        if workers > 1 and not isCompressed(fileName):
+            ranges = splitFile(fileName, workers * chunksPerWorker,
+                               blankLine=True)
+        else:
+            ranges = [(0, None)]
+        tasks += [(pattern, fileName, start, end, excerpt)
+                  for start, end in ranges]
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_searchRange, tasks)
+    else:
+        pool = None
+        results = (_searchRange(task) for task in tasks)
+    try:
+        # Sentences of a file are numbered across its ranges
+        offset = 0
+        for task, (count, matches) in zip(tasks, results):
+            fileName, start = task[1], task[2]
+            if start == 0:
+                offset = 0
+            for sentence, sentId, nodeId, text in matches:
+                if sentId is None:
+                    sentId = str(offset + sentence + 1)
+                yield fileName, sentId, nodeId, text
+            offset += count
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return
+
+
+def formatMatch(fileName, sentId, nodeId, text=None):
+    '''
+    @return: str, the output of a match without the final newline
+    '''
+    result = "\t".join([fileName, sentId, str(nodeId)])
+    if text is not None:
+        result += "\n" + text
+    return result
+
+
+class TestConllSearch(unittest.TestCase):
+    def testSearch(self):
+        import shutil
+        import tempfile
+        currentdir = os.path.dirname(os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe()))))
+        fileName = currentdir + "/test/sampleCoNLLU.conll"
+        pattern = "(* (*|case|*) * |*| *)"
+        content = conll.load(fileName, verbose=False)
+        expected = [(fileName, str(i + 1), node.id, None)
+                    for i, sentence in enumerate(content)
+                    for node in compile(pattern).finditer(sentence)]
+        self.assertNotEqual([], expected)
+        self.assertEqual(expected, list(search(pattern, [fileName])))
+        self.assertEqual(expected * 2,
+                         list(search(pattern, [fileName, fileName],
+                                     workers=2, chunksPerWorker=2)))
+
+        result = list(search("(*|root|*)", [fileName], excerpt=True))
+        self.assertEqual([(fileName, str(i + 1), sentence.rightChild.id,
+                           sentence.rightChild.export())
+                          for i, sentence in enumerate(content)], result)
+        self.assertEqual(
+            fileName + "\t1\t4\n" + content[0].export(),
+            formatMatch(*result[0]))
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with open(fileName) as f:
+                raw = f.read().split("\n\n")
+            commented = os.path.join(tmpdir, "commented.conll")
+            with open(commented, "w") as f:
+                f.write("# sent_id = a\n" + raw[0] + "\n\n" + raw[1] +
+                        "\n\n# sent_id = c\n" + raw[2])
+            self.assertEqual(
+                ["a", "2", "c"],
+                [x[1] for x in search("(*|root|*)", [commented], workers=2)])
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertRaises(ValueError, list, search(None, [fileName]))
+        return
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(
+        description="""Search CoNLL files for a Dependency Expression""")
+    ap.add_argument(
+        "pattern", metavar='PATTERN',
+        help="""Dependency Expression, e.g. "(* nsubj * |root| *)\"""")
+    ap.add_argument(
+        "filename", metavar='FILENAME', nargs='+',
+        help="""CoNLL files, glob patterns are expanded.
+                If bash reports argument list too long, use quotation marks""")
+    ap.add_argument(
+        "-o", "--output", default=None,
+        help="""Output file, compressed according to its extension.
+                Default: stdout""")
+    ap.add_argument(
+        "-e", "--excerpt", action='store_true',
+        help="""Print the CoNLL lines of the subtree of each match""")
+    ap.add_argument(
+        "-j", "--workers", type=int, default=multiprocessing.cpu_count(),
+        help="""Number of processes. Default: number of CPUs""")
+    args = ap.parse_args()
+
+    fileNames = []
+    for filePattern in args.filename:
+        matched = sorted(glob.glob(os.path.expanduser(filePattern)))
+        if len(matched) == 0:
+            ap.error("no file matches " + filePattern)
+        fileNames += matched
+    try:
+        compile(args.pattern)
+    except ValueError as e:
+        ap.error(str(e))
+
+    matches = search(args.pattern, fileNames, max(1, args.workers),
+                     args.excerpt)
+    if args.output is not None:
+        with Writer(args.output) as output:
+            for match in matches:
+                output.write(formatMatch(*match))
+    else:
+        try:
+            for match in matches:
+                print(formatMatch(*match))
+        except IOError as e:
+            # Output piped into e.g. head, which exited
+            if e.errno != errno.EPIPE:
+                raise
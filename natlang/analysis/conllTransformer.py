@@ -14,9 +14,13 @@ import copy
 import inspect
 import unittest
 import progressbar
+from itertools import islice
 
 from natlang.loader import DataLoader
 from natlang.format import conll
+from natlang.lazy import LazySentence
+from natlang.traversal import preorder
+from natlang.analysis.treebankIndex import TreebankIndex, pairField
 
 
 # Pattern specification (Dependency Expression V0.1a)
@@ -32,6 +36,9 @@ from natlang.format import conll
 #   tag that is not VBZ and a nsubj with universal POS tag NN as leftChild and
 #   arbitrary number/types of rightChild.
 #
+#   In a sequence of children, a * matches zero or one child, and any number
+#   of them when it ends the sequence.
+#
 #   (|*[UPOS=NN;XPOS=NN]|)
 #   This example has a multiple feature constraint on a leafnode. The node can
 #   have deprel of any type but has to have UPOS and XPOS tag NN.
@@ -161,16 +168,15 @@ def matchPattern(pattern, node):
     candidates = []
     if node is None:
         return candidates
+    if not isinstance(pattern, str):
+        raise ValueError(
+            "natlang.analysis.conllTransformer.matchPattern: pattern " +
+            "must be a str")
     if not isinstance(node, conll.Node):
         raise ValueError(
             "natlang.analysis.conllTransformer.matchPattern: node " +
             "must be a natlang.format.conll.Node instance")
-    if matchPatternOnNode(pattern, node):
-        candidates += [node]
-    candidates += matchPattern(pattern, node.sibling)
-    candidates += matchPattern(pattern, node.leftChild)
-    candidates += matchPattern(pattern, node.rightChild)
-    return candidates
+    return compile(pattern).findall(node)
 
 
 def matchPatternOnNode(pattern, node):
@@ -184,161 +190,753 @@ def matchPatternOnNode(pattern, node):
         raise ValueError(
             "natlang.analysis.conllTransformer.matchPatternOnNode: pattern " +
             "must be a natlang.format.conll.Node instance")
-    cPattern = parsePattern(pattern)
-    return _matchCPattern(cPattern, node)
+    return compile(pattern).match(node)
 
 
-def _matchFeatureConstraints(dPattern, node):
-    """
-    This function matches features constraints:
-        DEPERL[CONSTRAINTS]
-    For example:
-        DEPERL[CONSTRAINT1, CONSTRAINT2]
-    Or:
-        DEPERL[(CONSTRAINT1 and CONSTRAINT2) or CONSTRAINT3]
-    """
-    def constraintMet(constraint, node):
-        """
-        This function takes care of a single constraint, for example: UPOS=VERB
-        """
-        if "!=" in constraint:
-            constraint = constraint.split("!=")
-            matchEqual = False
-        else:
-            constraint = constraint.split("=")
-            matchEqual = True
+# Compiled patterns
+# compile parses a Dependency Expression once and turns every deprel test and
+# feature constraint into a predicate on nodes, so that matching a corpus
+# costs only the matching. Usage is similar to the re module:
+#
+#   > pattern = compile("( * nsubj[UPOS=NOUN] * | root | * )")
+#   > pattern.match(node)            # True if node matches
+#   > pattern.search(tree)           # first matching node in tree, or None
+#   > pattern.finditer(corpus)       # generator of matching nodes
+#   > pattern.first(corpus, k=1)     # first k matches, stops at the k-th
+#   > pattern.count(corpus)          # number of matches
+#
+# corpus can be a natlang.analysis.treebankIndex.TreebankIndex, to only match
+# the sentences and nodes carrying the labels the pattern requires.
+#
+# A PatternSet runs a whole rule set in a single pass:
+#
+#   > rules = PatternSet(["(|nsubj|)", "(* nsubj * |root| *)"])
+#   > for node, matched in rules.finditer(corpus):
+#   >     ...                        # matched: positions of the rules
+#
+# Wildcard in child sequences, matching zero or one sibling, or any number of
+# them at the end of the sequence
+_wildcard = "*"
+# Compiled form of a _wildcard ending a child sequence
+_trailingWildcard = object()
 
-        if len(constraint) != 2:
-            raise ValueError(
-                "natlang.analysis.conllTransformer." +
-                "_matchFeatureConstraints:" +
-                " invalid feature constraint")
-        key, value = constraint[0], constraint[1]
-        if key not in node.format:
-            raise ValueError(
-                "natlang.analysis.conllTransformer." +
-                "_matchFeatureConstraints:" +
-                " invalid feature constraint: feature entry \"" + key +
-                "\" not found in node format")
-        if matchEqual:
-            return value == node.rawEntries[node.format[key]]
-        else:
-            return value != node.rawEntries[node.format[key]]
-
-    def constraintsMet(constraints, node):
-        # Step1: replace all constraints with Bool values, that includes
-        # subsequences
-        for i in range(len(constraints)):
-            if constraints[i] == "and" or constraints[i] == "or" or\
-                    constraints[i] == "not":
+# Compiled patterns by Dependency Expression
+_compiled = {}
+_compiledLimit = 512
+
+
+def compile(pattern):
+    '''
+    @param pattern: str, a Dependency Expression
+    @return: Pattern. Recently compiled patterns are cached.
+    '''
+    try:
+        return _compiled[pattern]
+    except KeyError:
+        pass
+    if not isinstance(pattern, str):
+        raise ValueError(
+            "natlang.analysis.conllTransformer.compile: pattern must be a " +
+            "str")
+    compiled = Pattern(pattern)
+    if len(_compiled) >= _compiledLimit:
+        _compiled.clear()
+    _compiled[pattern] = compiled
+    return compiled
+
+
+class Pattern(object):
+    '''
+    Compiled Dependency Expression, see compile.
+    @param pattern: str, the Dependency Expression
+    '''
+    def __init__(self, pattern):
+        self.pattern = pattern
+        cPattern = parsePattern(pattern)
+        self._root = _compileCPattern(cPattern)
+        # Labels a TreebankIndex can look up: those of the top node and
+        # those every matching sentence contains
+        self._anchorKeys, self._sentenceKeys = _indexKeys(cPattern)
+        return
+
+    def match(self, node):
+        '''
+        @param node: natlang.format.conll.Node
+        @return: bool, whether the subtree rooted at node matches
+        '''
+        return _matchCompiled(self._root, node)
+
+    def _iterNodes(self, tree):
+        if isinstance(tree, LazySentence):
+            tree = tree.node
+        if tree is None:
+            return ()
+        # Same order as the former recursive matchPattern: node, the subtree
+        # of its sibling, then those of its left and right children
+        return preorder([tree], _matchOrder)
+
+    def search(self, tree):
+        '''
+        @param tree: natlang.format.conll.Node, its siblings and descendants
+            are searched too
+        @return: the first matching node, None if there is none
+        '''
+        for node in self._iterNodes(tree):
+            if _matchCompiled(self._root, node):
+                return node
+        return None
+
+    def findall(self, tree):
+        '''
+        @return: list of the matching nodes of tree
+        '''
+        root = self._root
+        return [node for node in self._iterNodes(tree)
+                if _matchCompiled(root, node)]
+
+    def _nodes(self, corpus):
+        if isinstance(corpus, TreebankIndex):
+            return self._indexedNodes(corpus)
+        return (node for tree in _trees(corpus)
+                for node in self._iterNodes(tree))
+
+    def _indexedNodes(self, index):
+        anchorKeys = self._anchorKeys
+        for i in index.sentences(self._sentenceKeys):
+            tree = index.sentence(i)
+            if tree is None:
                 continue
-            if isinstance(constraints[i], list):
-                constraints[i] = constraintsMet(constraints[i], node)
-            elif isinstance(constraints[i], str):
-                constraints[i] = constraintMet(constraints[i], node)
-        # Step2: get rid of the "not"s
-        for i in reversed(list(range(1, len(constraints)))):
-            if constraints[i-1] == "not":
-                if not isinstance(constraints[i], bool):
-                    raise ValueError(
-                        "natlang.analysis.conllTransformer._matchFeatureCons" +
-                        "traints: invalid feature constraint")
-                constraints[i-1] = not constraints[i]
-                constraints[i] = None
-        constraints = [cons for cons in constraints if cons is not None]
-        # Step3: get rid of the "and"s
-        for i in reversed(list(range(1, len(constraints)))):
-            if constraints[i-1] == "and":
-                if (not isinstance(constraints[i], bool)) or (i-2 < 0) or\
-                        (not isinstance(constraints[i-2], bool)):
-                    raise ValueError(
-                        "natlang.analysis.conllTransformer._matchFeatureCons" +
-                        "traints: invalid feature constraint")
-                constraints[i-2] = constraints[i-2] and constraints[i]
-                constraints[i-1] = constraints[i] = None
-                i -= 1
-        constraints = [cons for cons in constraints if cons is not None]
-        # Step4: right now, it should all be "or"s
-        constraints = [cons for cons in constraints if cons != "or"]
-        for cons in constraints:
-            if cons is True:
-                return True
+            if len(anchorKeys) == 0:
+                for node in self._iterNodes(tree):
+                    yield node
+                continue
+            # Sentence order is not ID order in non-projective trees
+            nodes = [tree] * (len(tree.phrase) + 1)
+            for node in tree.phrase:
+                nodes[node.id] = node
+            for id in index.tokens(i, anchorKeys):
+                yield nodes[id]
+        return
+
+    def finditer(self, corpus):
+        '''
+        @param corpus: natlang.format.conll.Node, or iterable of them such as
+            the list returned by conll.load or the conll.iterload generator.
+            Lazy and corrupt (None) sentences are accepted. corpus can also
+            be a natlang.analysis.treebankIndex.TreebankIndex, then only the
+            sentences and nodes holding the labels the pattern requires are
+            matched, and the nodes of each sentence come in ID order.
+        @return: generator of the matching nodes. corpus is only read as far
+            as the generator is consumed.
+        '''
+        root = self._root
+        for node in self._nodes(corpus):
+            if _matchCompiled(root, node):
+                yield node
+        return
+
+    def first(self, corpus, k=1):
+        '''
+        @param corpus: see finditer
+        @param k: int, the number of matches wanted
+        @return: list of the first k matching nodes, fewer if corpus has less.
+            Matching stops at the k-th match, e.g. first(corpus) is an
+            existence query.
+        '''
+        if k <= 0:
+            return []
+        return list(islice(self.finditer(corpus), k))
+
+    def count(self, corpus):
+        '''
+        @param corpus: see finditer
+        @return: int, the number of matching nodes
+        '''
+        root = self._root
+        result = 0
+        for node in self._nodes(corpus):
+            if _matchCompiled(root, node):
+                result += 1
+        return result
+
+    def __repr__(self):
+        return "conllTransformer.compile(" + repr(self.pattern) + ")"
+
+
+def finditer(pattern, corpus):
+    '''
+    @return: generator of the nodes of corpus matching pattern, see
+        Pattern.finditer
+    '''
+    return compile(pattern).finditer(corpus)
+
+
+def first(pattern, corpus, k=1):
+    '''
+    @return: list of the first k nodes of corpus matching pattern, see
+        Pattern.first
+    '''
+    return compile(pattern).first(corpus, k)
+
+
+def count(pattern, corpus):
+    '''
+    @return: int, the number of nodes of corpus matching pattern
+    '''
+    return compile(pattern).count(corpus)
+
+
+class PatternSet(object):
+    '''
+    Rule set of Dependency Expressions matched together in one pass over a
+    corpus. Identical patterns and subpatterns are compiled once, and each
+    node is only tested against the patterns whose top deprel is its deprel
+    (or is *), so the cost of a pass hardly grows with the number of rules
+    that have distinct top deprels.
+    @param patterns: iterable of str, Dependency Expressions
+    '''
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        shared = {}
+        # Patterns to test on nodes of a deprel, and on every node, as
+        # (position in self.patterns, compiled pattern) tuples
+        self._byDeprel = {}
+        self._anyDeprel = []
+        for i, pattern in enumerate(self.patterns):
+            if not isinstance(pattern, str):
+                raise ValueError(
+                    "natlang.analysis.conllTransformer.PatternSet: patterns " +
+                    "must be str")
+            cPattern = parsePattern(pattern)
+            entry = (i, _compileCPattern(cPattern, shared))
+            deprel = cPattern[0].split('[')[0]
+            if deprel == _wildcard:
+                self._anyDeprel.append(entry)
+            else:
+                self._byDeprel.setdefault(deprel, []).append(entry)
+        return
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def match(self, node):
+        '''
+        @param node: natlang.format.conll.Node
+        @return: list of the positions in self.patterns of the patterns
+            matching the subtree rooted at node, in increasing order
+        '''
+        result = [i for i, compiled in self._byDeprel.get(node.deprel, ())
+                  if _matchCompiled(compiled, node)]
+        if len(self._anyDeprel) != 0:
+            matched = [i for i, compiled in self._anyDeprel
+                       if _matchCompiled(compiled, node)]
+            if len(result) == 0:
+                return matched
+            if len(matched) != 0:
+                result = sorted(result + matched)
+        return result
+
+    def finditer(self, corpus):
+        '''
+        @param corpus: natlang.format.conll.Node or iterable of them, see
+            Pattern.finditer
+        @return: generator of (node, list of pattern positions) tuples for
+            the nodes matching at least one pattern, in the order of
+            Pattern.finditer
+        '''
+        match = self.match
+        byDeprel = self._byDeprel
+        testAll = len(self._anyDeprel) != 0
+        for tree in _trees(corpus):
+            if isinstance(tree, LazySentence):
+                tree = tree.node
+            if tree is None:
+                continue
+            for node in preorder([tree], _matchOrder):
+                if not testAll and node.deprel not in byDeprel:
+                    continue
+                matched = match(node)
+                if len(matched) != 0:
+                    yield node, matched
+        return
+
+    def count(self, corpus):
+        '''
+        @return: list of int, the number of matches of each pattern
+        '''
+        result = [0] * len(self.patterns)
+        for node, matched in self.finditer(corpus):
+            for i in matched:
+                result[i] += 1
+        return result
+
+    def __repr__(self):
+        return "conllTransformer.PatternSet(" + repr(self.patterns) + ")"
+
+
+def _trees(corpus):
+    if isinstance(corpus, (conll.Node, LazySentence)):
+        return [corpus]
+    return corpus
+
+
+def _indexKeys(cPattern):
+    '''
+    @param cPattern: parsed pattern, see parsePattern
+    @return: (list, set), the TreebankIndex keys every node matching
+        cPattern has, and those every sentence containing a match has
+    '''
+    if isinstance(cPattern, str):
+        anchorKeys = _dPatternKeys(cPattern)
+        return anchorKeys, set(anchorKeys)
+    dPattern, left, right = cPattern
+    anchorKeys = _dPatternKeys(dPattern)
+    sentenceKeys = set()
+    deprel = dPattern.split('[')[0]
+    for child in left + right:
+        if child == _wildcard:
+            continue
+        sentenceKeys |= _indexKeys(child)[1]
+        childDeprel = (child if isinstance(child, str) else child[0])\
+            .split('[')[0]
+        if deprel != _wildcard and childDeprel != _wildcard:
+            anchorKeys.append((pairField, (deprel, childDeprel)))
+    sentenceKeys.update(anchorKeys)
+    return anchorKeys, sentenceKeys
+
+
+def _dPatternKeys(dPattern):
+    '''
+    @return: list of the TreebankIndex keys a node matching dPattern has.
+        Only plain conjunctions of equality constraints are used, other
+        constraints are left to the matcher.
+    '''
+    deprel, _, constraints = dPattern.partition('[')
+    keys = []
+    if deprel != _wildcard:
+        keys.append(("DEPREL", deprel))
+    constraints = constraints.replace(']', '').replace('(', " ( ")
+    constraints = constraints.replace(')', " ) ")
+    for operator in (';', '&&', '&'):
+        constraints = constraints.replace(operator, " and ")
+    if '|' in constraints or any(entry in ("or", "not", "(", ")")
+                                 for entry in constraints.split()):
+        return keys
+    for entry in constraints.split():
+        if entry == "and" or "!=" in entry:
+            continue
+        entry = entry.split("=")
+        if len(entry) == 2 and entry[0] in TreebankIndex.fields:
+            keys.append((entry[0], entry[1]))
+    return keys
+
+
+def _matchOrder(node):
+    return [child for child in (node.sibling, node.leftChild, node.rightChild)
+            if child is not None]
+
+
+class _CompiledNode(object):
+    '''
+    @param test: function, test(node) checks the deprel and features of node
+    @param left: _ChildSequence, the pattern of the left children. None if
+        the children are not constrained.
+    @param right: _ChildSequence, same for the right children
+    '''
+    __slots__ = ("test", "left", "right")
+
+    def __init__(self, test, left=None, right=None):
+        self.test = test
+        self.left = left
+        self.right = right
+        return
+
+
+class _ChildSequence(object):
+    '''
+    Compiled child pattern, e.g. "* nsubj * obj *". Each _wildcard matches
+    zero or one sibling, except one ending the pattern, which is replaced by
+    _trailingWildcard and matches any number of siblings. Each other item
+    matches exactly one sibling.
+    @param items: tuple of _CompiledNode and _wildcard
+    '''
+    __slots__ = ("items", "closures", "endClosures", "matchesAll")
+
+    def __init__(self, items):
+        if len(items) != 0 and items[-1] is _wildcard:
+            items = items[:-1] + (_trailingWildcard, )
+        self.items = items
+        # closures[i]: the positions reachable from position i by letting
+        # wildcards match nothing before a sibling. Once the siblings are
+        # exhausted, only the _trailingWildcard may still match nothing, as
+        # in _ReferenceMatcher._matchCPatternChildren: endClosures[i].
+        self.closures = [self._closure(i, (_wildcard, _trailingWildcard))
+                         for i in range(len(items) + 1)]
+        self.endClosures = [self._closure(i, (_trailingWildcard, ))
+                            for i in range(len(items) + 1)]
+        self.matchesAll = items == (_trailingWildcard, )
+        return
+
+    def _closure(self, i, skipped):
+        closure = [i]
+        while closure[-1] < len(self.items) and\
+                self.items[closure[-1]] in skipped:
+            closure.append(closure[-1] + 1)
+        return frozenset(closure)
+
+
+def _compileCPattern(cPattern, shared=None):
+    '''
+    @param shared: dict, compiled subpatterns by parse. Patterns compiled
+        with the same dict share their identical subpatterns.
+    '''
+    if shared is not None:
+        key = repr(cPattern)
+        if key in shared:
+            return shared[key]
+    if isinstance(cPattern, str):
+        compiled = _CompiledNode(_compileDPattern(cPattern))
+    else:
+        compiled = _CompiledNode(_compileDPattern(cPattern[0]),
+                                 _compileChildPattern(cPattern[1], shared),
+                                 _compileChildPattern(cPattern[2], shared))
+    if shared is not None:
+        shared[key] = compiled
+    return compiled
+
+
+def _compileChildPattern(childPattern, shared=None):
+    return _ChildSequence(tuple(
+        _wildcard if entry == _wildcard else _compileCPattern(entry, shared)
+        for entry in childPattern))
+
+
+def _matchCompiled(compiled, node):
+    if not compiled.test(node):
         return False
+    if compiled.left is None:
+        return True
+    return _matchCompiledChildren(compiled.left, node.leftChild) and\
+        _matchCompiledChildren(compiled.right, node.rightChild)
+
+
+def _matchCompiledChildren(sequence, node):
+    '''
+    Matches the sibling chain starting at node against sequence. This is a
+    dynamic program over (pattern position, sibling position): the siblings
+    are consumed left to right while keeping the set of pattern positions
+    reachable so far, so each item is tested at most once on each sibling and
+    the cost is O(len(items) * len(siblings)) item tests.
+    '''
+    if sequence.matchesAll:
+        return True
+    items = sequence.items
+    closures = sequence.closures
+    end = len(items)
+    states = set([0])
+    while node is not None:
+        reachable = set()
+        for i in states:
+            reachable |= closures[i]
+        nextStates = set()
+        for i in reachable:
+            if i == end:
+                continue
+            if items[i] is _trailingWildcard:
+                # Matches the remaining siblings
+                return True
+            if items[i] is _wildcard or _matchCompiled(items[i], node):
+                nextStates.add(i + 1)
+        if len(nextStates) == 0:
+            return False
+        states = nextStates
+        node = node.sibling
+    endClosures = sequence.endClosures
+    return any(end in endClosures[i] for i in states)
 
+
+def _anyNode(node):
+    return True
+
+
+def _compileDPattern(dPattern):
+    '''
+    @param dPattern: str, DEPREL or DEPREL[CONSTRAINTS]
+    @return: function, test(node) returns whether node satisfies dPattern
+    '''
     if '[' not in dPattern:
-        # No constraint
-        if dPattern == '*' or (node is not None and dPattern == node.deprel):
-            return True
+        if dPattern == '*':
+            return _anyNode
+        return lambda node: node.deprel == dPattern
+
+    dPattern = dPattern.replace('(', " ( ").replace(')', " ) ")
+    constraints = dPattern.replace('[', '°').replace(']', '').split('°')
+    if len(constraints) != 2:
+        raise ValueError(
+            "natlang.analysis.conllTransformer.compile: invalid feature " +
+            "constraint")
+    deprel, constraints = constraints[0], constraints[1]
+    constraints = constraints.replace(';', " and ")
+    constraints = constraints.replace('&&', " and ")
+    constraints = constraints.replace('&', " and ")
+    constraints = constraints.replace('||', " or ")
+    constraints = constraints.replace('|', " or ").split()
+    constraints, _ = closeBrackets(['('] + constraints + [')'])
+    constraintTest = _compileConstraints(constraints)
+    # The root node has no entries, hence no features to constrain
+    if deprel == '*':
+        return lambda node: len(node.rawEntries) != 0 and constraintTest(node)
+    return lambda node: node.deprel == deprel and\
+        len(node.rawEntries) != 0 and constraintTest(node)
+
+
+def _compileConstraints(constraints):
+    '''
+    Compiles a constraint sequence split by closeBrackets, e.g.
+    ["UPOS=NN", "and", ["not", "XPOS=NN", "or", "LEMMA=x"]]. "not" binds
+    tighter than "and", which binds tighter than "or".
+    '''
+    alternatives = [[]]
+    negate = False
+    expectOperand = True
+    for entry in constraints:
+        if entry == "not" and expectOperand:
+            negate = not negate
+            continue
+        if entry in ("and", "or"):
+            if expectOperand:
+                raise ValueError(
+                    "natlang.analysis.conllTransformer.compile: invalid " +
+                    "feature constraint")
+            if entry == "or":
+                alternatives.append([])
+            expectOperand = True
+            continue
+        if not expectOperand:
+            raise ValueError(
+                "natlang.analysis.conllTransformer.compile: invalid " +
+                "feature constraint")
+        if isinstance(entry, list):
+            test = _compileConstraints(entry)
         else:
-            return False
+            test = _compileConstraint(entry)
+        if negate:
+            test = _negate(test)
+        alternatives[-1].append(test)
+        negate = False
+        expectOperand = False
+    if expectOperand:
+        raise ValueError(
+            "natlang.analysis.conllTransformer.compile: invalid feature " +
+            "constraint")
+    alternatives = [tuple(tests) for tests in alternatives]
+
+    def constraintsMet(node):
+        for tests in alternatives:
+            for test in tests:
+                if not test(node):
+                    break
+            else:
+                return True
+        return False
+    return constraintsMet
+
+
+def _negate(test):
+    return lambda node: not test(node)
+
+
+def _compileConstraint(constraint):
+    '''
+    @param constraint: str, a single constraint such as UPOS=VERB
+    '''
+    if "!=" in constraint:
+        constraint = constraint.split("!=")
+        matchEqual = False
     else:
-        dPattern = dPattern.replace('(', " ( ").replace(')', " ) ")
-        constraints = dPattern.replace('[', '°').replace(']', '').split('°')
-        if len(constraints) != 2:
+        constraint = constraint.split("=")
+        matchEqual = True
+    if len(constraint) != 2:
+        raise ValueError(
+            "natlang.analysis.conllTransformer.compile: invalid feature " +
+            "constraint")
+    key, value = constraint[0], constraint[1]
+
+    def constraintMet(node):
+        try:
+            index = node.format[key]
+        except KeyError:
             raise ValueError(
-                "natlang.analysis.conllTransformer._matchFeatureConstraints:" +
-                " invalid feature constraint")
-        deprel, constraints = constraints[0], constraints[1]
-        if deprel != '*' and (node is None or deprel != node.deprel):
-            return False
+                "natlang.analysis.conllTransformer.compile: invalid feature " +
+                "constraint: feature entry \"" + key + "\" not found in " +
+                "node format")
+        return (node.rawEntries[index] == value) == matchEqual
+    return constraintMet
 
-        # Processing constraints
-        constraints = constraints.replace(';', " and ")
-        constraints = constraints.replace('&&', " and ")
-        constraints = constraints.replace('&', " and ")
-        constraints = constraints.replace('||', " or ")
-        constraints = constraints.replace('|', " or ").split()
-        constraints, _ = closeBrackets(['('] + constraints + [')'])
 
-        return constraintsMet(constraints, node)
+class _ReferenceMatcher(object):
+    '''
+    The former interpreter of parsed patterns (see parsePattern), mixed into
+    the test cases as the reference compiled patterns are checked against.
+    '''
+    @classmethod
+    def _matchFeatureConstraints(cls, dPattern, node):
+        """
+        This function matches features constraints:
+            DEPERL[CONSTRAINTS]
+        For example:
+            DEPERL[CONSTRAINT1, CONSTRAINT2]
+        Or:
+            DEPERL[(CONSTRAINT1 and CONSTRAINT2) or CONSTRAINT3]
+        """
+        def constraintMet(constraint, node):
+            """
+            This function takes care of a single constraint, for example:
+            UPOS=VERB
+            """
+            if "!=" in constraint:
+                constraint = constraint.split("!=")
+                matchEqual = False
+            else:
+                constraint = constraint.split("=")
+                matchEqual = True
 
+            if len(constraint) != 2:
+                raise ValueError(
+                    "natlang.analysis.conllTransformer." +
+                    "_matchFeatureConstraints:" +
+                    " invalid feature constraint")
+            key, value = constraint[0], constraint[1]
+            if key not in node.format:
+                raise ValueError(
+                    "natlang.analysis.conllTransformer." +
+                    "_matchFeatureConstraints:" +
+                    " invalid feature constraint: feature entry \"" + key +
+                    "\" not found in node format")
+            if matchEqual:
+                return value == node.rawEntries[node.format[key]]
+            else:
+                return value != node.rawEntries[node.format[key]]
 
-def _matchCPattern(cPattern, node):
-    """
-    This pattern takes as input a cPattern generated by _parseStage2(or
-    parsePattern, samething).
-    featureConstraints(dPattern) operates on the node itself, limiting the
-    various features of that particular word (UPOS, FORM, etc.). It is always
-    of the format:
-        DEPREL[FURTHER_CONSTRAINTS]
-
-    cPattern can just be a dPattern if it is a str. It can also be a tree, in
-    which case cPattern[0] would be a dPattern on the current node and
-    cPattern[1] a sequence of its left children, cPattern[1][1] a sequence of
-    its right children (childPattern).
-    """
-    if isinstance(cPattern, str):
-        return _matchFeatureConstraints(dPattern=cPattern, node=node)
-    # Match Root
-    if _matchFeatureConstraints(dPattern=cPattern[0], node=node):
-        if _matchCPatternChildren(cPattern[1], node.leftChild) and\
-                _matchCPatternChildren(cPattern[2], node.rightChild):
-            return True
-    return False
+        def constraintsMet(constraints, node):
+            # Step1: replace all constraints with Bool values, that includes
+            # subsequences
+            for i in range(len(constraints)):
+                if constraints[i] == "and" or constraints[i] == "or" or\
+                        constraints[i] == "not":
+                    continue
+                if isinstance(constraints[i], list):
+                    constraints[i] = constraintsMet(constraints[i], node)
+                elif isinstance(constraints[i], str):
+                    constraints[i] = constraintMet(constraints[i], node)
+            # Step2: get rid of the "not"s
+            for i in reversed(list(range(1, len(constraints)))):
+                if constraints[i-1] == "not":
+                    if not isinstance(constraints[i], bool):
+                        raise ValueError(
+                            "natlang.analysis.conllTransformer._matchFeature" +
+                            "Constraints: invalid feature constraint")
+                    constraints[i-1] = not constraints[i]
+                    constraints[i] = None
+            constraints = [cons for cons in constraints if cons is not None]
+            # Step3: get rid of the "and"s
+            for i in reversed(list(range(1, len(constraints)))):
+                if constraints[i-1] == "and":
+                    if (not isinstance(constraints[i], bool)) or\
+                            (i-2 < 0) or\
+                            (not isinstance(constraints[i-2], bool)):
+                        raise ValueError(
+                            "natlang.analysis.conllTransformer._matchFeature" +
+                            "Constraints: invalid feature constraint")
+                    constraints[i-2] = constraints[i-2] and constraints[i]
+                    constraints[i-1] = constraints[i] = None
+                    i -= 1
+            constraints = [cons for cons in constraints if cons is not None]
+            # Step4: right now, it should all be "or"s
+            constraints = [cons for cons in constraints if cons != "or"]
+            for cons in constraints:
+                if cons is True:
+                    return True
+            return False
+
+        if '[' not in dPattern:
+            # No constraint
+            if dPattern == '*' or\
+                    (node is not None and dPattern == node.deprel):
+                return True
+            else:
+                return False
+        else:
+            dPattern = dPattern.replace('(', " ( ").replace(')', " ) ")
+            constraints =\
+                dPattern.replace('[', '°').replace(']', '').split('°')
+            if len(constraints) != 2:
+                raise ValueError(
+                    "natlang.analysis.conllTransformer._matchFeature" +
+                    "Constraints: invalid feature constraint")
+            deprel, constraints = constraints[0], constraints[1]
+            if deprel != '*' and (node is None or deprel != node.deprel):
+                return False
 
+            # Processing constraints
+            constraints = constraints.replace(';', " and ")
+            constraints = constraints.replace('&&', " and ")
+            constraints = constraints.replace('&', " and ")
+            constraints = constraints.replace('||', " or ")
+            constraints = constraints.replace('|', " or ").split()
+            constraints, _ = closeBrackets(['('] + constraints + [')'])
 
-# Match Children
-def _matchCPatternChildren(childPattern, node):
-    if childPattern == ['*'] or (childPattern == [] and node is None):
-        return True
-    if childPattern == [] or node is None:
+            return constraintsMet(constraints, node)
+
+    @classmethod
+    def _matchCPattern(cls, cPattern, node):
+        """
+        This pattern takes as input a cPattern generated by _parseStage2(or
+        parsePattern, samething).
+        featureConstraints(dPattern) operates on the node itself, limiting
+        the various features of that particular word (UPOS, FORM, etc.). It
+        is always of the format:
+            DEPREL[FURTHER_CONSTRAINTS]
+
+        cPattern can just be a dPattern if it is a str. It can also be a
+        tree, in which case cPattern[0] would be a dPattern on the current
+        node and cPattern[1] a sequence of its left children, cPattern[1][1]
+        a sequence of its right children (childPattern).
+        """
+        if isinstance(cPattern, str):
+            return cls._matchFeatureConstraints(dPattern=cPattern, node=node)
+        # Match Root
+        if cls._matchFeatureConstraints(dPattern=cPattern[0], node=node):
+            if cls._matchCPatternChildren(cPattern[1], node.leftChild) and\
+                    cls._matchCPatternChildren(cPattern[2], node.rightChild):
+                return True
         return False
 
-    # At this point, node is not None and childPattern has at least something
-    if childPattern[0] == '*':
-        if _matchCPatternChildren(childPattern[1:], node) or\
-                _matchCPatternChildren(childPattern[1:], node.sibling):
+    # Match Children
+    @classmethod
+    def _matchCPatternChildren(cls, childPattern, node):
+        if childPattern == ['*'] or (childPattern == [] and node is None):
             return True
-        else:
-            return False
-    else:
-        if not _matchCPattern(childPattern[0], node):
+        if childPattern == [] or node is None:
             return False
-        return _matchCPatternChildren(
-            childPattern[1:], node.sibling)
+
+        # At this point, node is not None and childPattern has at least
+        # something
+        if childPattern[0] == '*':
+            if cls._matchCPatternChildren(childPattern[1:], node) or\
+                    cls._matchCPatternChildren(childPattern[1:],
+                                               node.sibling):
+                return True
+            else:
+                return False
+        else:
+            if not cls._matchCPattern(childPattern[0], node):
+                return False
+            return cls._matchCPatternChildren(
+                childPattern[1:], node.sibling)
 
 
-class TestPatternMatching(unittest.TestCase):
+class TestPatternMatching(_ReferenceMatcher, unittest.TestCase):
     def testParseStage1A(self):
         content = _parseStage1("(closeBrackets(pattern))")
         answer = ["closeBrackets", ["pattern"]]
@@ -383,6 +981,9 @@ class TestPatternMatching(unittest.TestCase):
         content = _parseStage1("(* nsubj [ POS = NN ] * cop * |root [ POS = " +
                                "VBZ ]|*)")
         self.assertSequenceEqual(content, answer)
+        content = _parseStage1("(**nsubj|root|*)")
+        self.assertSequenceEqual(
+            content, ['*', '*', 'nsubj', '|', 'root', '|', '*'])
         return
 
     def testParseStage2A(self):
@@ -463,12 +1064,12 @@ class TestPatternMatching(unittest.TestCase):
         x, y = content[0], content[1]
         self.assertEqual(
             True,
-            _matchFeatureConstraints(
+            self._matchFeatureConstraints(
                 "*[UPOS=VERB;XPOS=VBZ]",
                 x.rightChild))
         self.assertEqual(
             False,
-            _matchFeatureConstraints(
+            self._matchFeatureConstraints(
                 "*[UPOS!=VERB;XPOS=VBZ]",
                 x.rightChild))
         return
@@ -482,7 +1083,7 @@ class TestPatternMatching(unittest.TestCase):
         x, y = content[0], content[1]
         self.assertEqual(
             False,
-            _matchFeatureConstraints("nsubj[ID!=story]", x.rightChild))
+            self._matchFeatureConstraints("nsubj[ID!=story]", x.rightChild))
         return
 
     def testMatchFeatureConstraints2(self):
@@ -494,23 +1095,23 @@ class TestPatternMatching(unittest.TestCase):
         x, y = content[0], content[1]
         self.assertEqual(
             True,
-            _matchFeatureConstraints("*[FORM=comes]", x.rightChild))
+            self._matchFeatureConstraints("*[FORM=comes]", x.rightChild))
         self.assertEqual(
             False,
-            _matchFeatureConstraints("*[FORM!=comes]", x.rightChild))
+            self._matchFeatureConstraints("*[FORM!=comes]", x.rightChild))
         self.assertEqual(
             True,
-            _matchFeatureConstraints(
+            self._matchFeatureConstraints(
                 "*[FORM!=comes or LEMMA=come]",
                 x.rightChild))
         self.assertEqual(
             True,
-            _matchFeatureConstraints(
+            self._matchFeatureConstraints(
                 "*[(FORM!=comes or not LEMMA!=come)]",
                 x.rightChild))
         self.assertEqual(
             True,
-            _matchFeatureConstraints(
+            self._matchFeatureConstraints(
                 "*[(FORM!=comes or not LEMMA!=come) and (FORM!=comes or " +
                 "LEMMA=come)]",
                 x.rightChild))
@@ -537,6 +1138,219 @@ class TestPatternMatching(unittest.TestCase):
         return
 
 
+class TestCompiledPattern(_ReferenceMatcher, unittest.TestCase):
+    def load(self, **kwargs):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        return conll.load(parentdir + "/test/sampleCoNLLU.conll",
+                          verbose=False, **kwargs)
+
+    def testSameAsUncompiled(self):
+        from natlang.traversal import conllPreorder
+        patterns = [
+            "(*|root|* nsubj *)", "(* nsubj *|root|*)", "(case *|nmod|*)",
+            "(* | root | nmod )", "(*|root|nmod punct)", "(|*|)",
+            "( * (*|nsubj|*) * | root | * advmod * )",
+            "(*|*[UPOS=NOUN;XPOS!=NNS]|*)",
+            "(*|*[UPOS=DET || UPOS=NOUN && XPOS=NN]|*)",
+            "(* det[UPOS=DET] * |nmod[UPOS=PROPN||UPOS=NOUN]|*)",
+            "(* * case |*|)", "(|*| * * *)", "(* det * * |*| * (|*|) *)",
+            "(* * * nsubj * * |root| * * punct)"]
+        matched = 0
+        for pattern in patterns:
+            compiled = compile(pattern)
+            for tree in self.load():
+                # Skipping the root, which _matchCPattern cannot match
+                # feature constraints on
+                for node in conllPreorder(tree.rightChild):
+                    result = compiled.match(node)
+                    self.assertEqual(
+                        self._matchCPattern(parsePattern(pattern), node),
+                        result)
+                    matched += result
+        self.assertNotEqual(0, matched)
+        dPatterns = [
+            "*[UPOS=VERB;XPOS=VBZ]", "*[UPOS!=VERB;XPOS=VBZ]",
+            "nsubj[FORM=story]", "*[FORM!=comes or LEMMA=come]",
+            "*[(FORM!=comes or not LEMMA!=come)]",
+            "*[(FORM!=comes or not LEMMA!=come) and (FORM!=comes or " +
+            "LEMMA=come)]", "*[UPOS=NOUN|UPOS=PROPN&&FEATS=_]"]
+        for dPattern in dPatterns:
+            test = _compileDPattern(dPattern)
+            for tree in self.load():
+                for node in conllPreorder(tree.rightChild):
+                    self.assertEqual(
+                        self._matchFeatureConstraints(dPattern, node),
+                        test(node))
+        return
+
+    def testSearch(self):
+        content = self.load()
+        pattern = compile("(case *|nmod|*)")
+        self.assertIs(pattern, compile("(case *|nmod|*)"))
+        self.assertEqual(3, pattern.search(content[0]).id)
+        self.assertEqual(None, pattern.search(content[0].rightChild.sibling))
+        self.assertEqual([3], [node.id for node in
+                               compile("(*|*[UPOS=PROPN]|*)").findall(
+                                   content[0])])
+        self.assertEqual([4, 14, 18],
+                         sorted(node.id for node in pattern.findall(
+                             content[1])))
+        # Node reprs print whole trees, compare ids instead
+        expected = [node.id for x in content
+                    for node in matchPattern("(case *|nmod|*)", x)]
+        self.assertEqual(expected,
+                         [node.id for node in pattern.finditer(content)])
+        self.assertEqual(
+            expected,
+            [node.id for node in pattern.finditer(self.load(lazy=True))])
+        self.assertEqual([4, 14, 18],
+                         [node.id for node in pattern.finditer(content[1])])
+        constraints = _compileDPattern(
+            "*[(FORM!=comes or not LEMMA!=come) and (FORM!=comes or " +
+            "LEMMA=come)]")
+        self.assertTrue(constraints(content[0].rightChild))
+        self.assertFalse(_compileDPattern("*[not FORM=comes]")(
+            content[0].rightChild))
+        self.assertRaises(ValueError, compile, "(*|*[UPOS]|*)")
+        self.assertRaises(ValueError, compile, "(*|*[UPOS=NN;]|*)")
+        self.assertRaises(ValueError, compile("(*|*[FOO=x]|*)").match,
+                          content[0].rightChild)
+        return
+
+    def testWildcards(self):
+        deprels = ["advmod", "aux", "nsubj", "root", "obj", "punct"]
+        node = conll.constructFromText([
+            "\t".join([str(i), "w", "w", "X", "X", "_",
+                       "0" if deprel == "root" else "4", deprel, "_", "_"])
+            for i, deprel in enumerate(deprels, 1)]).rightChild
+        for pattern, result in (("(* nsubj * | root | * punct)", False),
+                                ("(* * nsubj * | root | * punct)", True),
+                                ("(advmod * | root | obj *)", True),
+                                ("(* aux nsubj | root | * * obj punct)", True),
+                                ("(aux * | root | *)", False),
+                                ("(* | root | * obj)", False),
+                                ("(* | root | )", False),
+                                ("(* nsubj | root | * punct)", False),
+                                ("(* * nsubj | root | * punct)", True),
+                                ("(**nsubj | root | obj *)", True),
+                                ("(* | root | * * * obj)", False),
+                                ("(* | root | obj punct * *)", False),
+                                ("(* | root | obj punct *)", True)):
+            self.assertEqual(result, compile(pattern).match(node))
+            self.assertEqual(result,
+                             self._matchCPattern(parsePattern(pattern), node))
+        # 2000 right children, the last two being obj and punct
+        node = conll.constructFromText([
+            "\t".join([str(i), "w", "w", "X", "X", "_",
+                       "0" if i == 1 else "1",
+                       "root" if i == 1 else "obj" if i == 2000 else
+                       "punct" if i == 2001 else "dep", "_", "_"])
+            for i in range(1, 2002)]).rightChild
+        self.assertTrue(compile(
+            "(|root| dep * dep * dep *)").match(node))
+        self.assertFalse(compile(
+            "(|root| * * obj * punct *)").match(node))
+        self.assertFalse(compile(
+            "(|root| * dep * dep * obj * punct *)").match(node))
+        return
+
+    def testFirstAndCount(self):
+        content = self.load()
+        pattern = compile("(case *|nmod|*)")
+        matches = [node.id for node in pattern.finditer(content)]
+        self.assertEqual(len(matches), pattern.count(content))
+        self.assertEqual(len(matches), count("(case *|nmod|*)", content))
+        self.assertEqual(3, pattern.count(content[1]))
+        self.assertEqual(matches[:2],
+                         [node.id for node in pattern.first(content, 2)])
+        self.assertEqual([], pattern.first(content, 0))
+        self.assertEqual(len(matches),
+                         len(first("(case *|nmod|*)", content, 1000)))
+        self.assertEqual(matches, [node.id for node in finditer(
+            "(case *|nmod|*)", iter(content))])
+
+        # Reading stops at the first match
+        read = []
+
+        def corpus():
+            for x in content:
+                read.append(x)
+                yield x
+        self.assertEqual(1, len(pattern.first(corpus())))
+        self.assertEqual(1, len(read))
+        return
+
+    def testTreebankIndex(self):
+        content = self.load()
+        # Non-projective: 4 is a dependent of 2 between 3 and its head 5
+        content.append(conll.constructFromText([
+            "\t".join([str(i), "w", "w", upos, upos, "_", str(head), deprel,
+                       "_", "_"])
+            for i, upos, head, deprel in ((1, "PRON", 2, "nsubj"),
+                                          (2, "VERB", 0, "root"),
+                                          (3, "DET", 5, "det"),
+                                          (4, "ADV", 2, "advmod"),
+                                          (5, "NOUN", 2, "obj"))]))
+        index = TreebankIndex(content)
+        for pattern in ("(|nsubj|)", "(*|root|*)", "(* nsubj * | root | *)",
+                        "(*|root| * (|obj[UPOS=NOUN]|) *)",
+                        "(*|*[UPOS=NOUN;XPOS=NN]|*)", "(*|*|*)",
+                        "(|*[UPOS!=NOUN]|)", "(* det * |*[UPOS=NOUN]|*)",
+                        "(* (|nsubj|) * |root| *)", "(|none|)",
+                        "(* det * |obj[UPOS=NOUN]|)", "(|advmod|)"):
+            compiled = compile(pattern)
+            expected = sorted(id(node) for node in compiled.finditer(content))
+            self.assertEqual(
+                expected,
+                sorted(id(node) for node in compiled.finditer(index)))
+            self.assertEqual(len(expected), compiled.count(index))
+        anchorKeys, sentenceKeys = _indexKeys(
+            parsePattern("(* det * |x[UPOS=NOUN]|* (|y[LEMMA=z]|) *)"))
+        self.assertEqual([("DEPREL", "x"), ("UPOS", "NOUN"),
+                          (pairField, ("x", "det")), (pairField, ("x", "y"))],
+                         anchorKeys)
+        self.assertEqual(set(anchorKeys + [("DEPREL", "det"),
+                                           ("DEPREL", "y"), ("LEMMA", "z")]),
+                         sentenceKeys)
+        self.assertEqual(
+            [("DEPREL", "x")],
+            _dPatternKeys("x[UPOS=NOUN;not XPOS=NN]"))
+        self.assertEqual([("DEPREL", "x")],
+                         _dPatternKeys("x[UPOS=NOUN||(XPOS=NN)]"))
+        self.assertEqual([("UPOS", "NOUN"), ("XPOS", "NN")],
+                         _dPatternKeys("*[UPOS=NOUN&XPOS=NN;FEATS=_]"))
+        self.assertEqual([], _dPatternKeys("*[UPOS!=NOUN]"))
+        return
+
+    def testPatternSet(self):
+        content = self.load()
+        patterns = ["(|nsubj|)", "(*|root|*)", "(* nsubj * | root | *)",
+                    "(*|*[UPOS=NOUN]|*)", "(* det * |*|*)", "(|nsubj|)",
+                    "(*|obj| * (|amod|) *)", "(*|root| * (|obj|) *)",
+                    "(|none|)", "(*|*|*)", "(|obj|)"]
+        rules = PatternSet(patterns)
+        self.assertEqual(len(patterns), len(rules))
+        expected = {}
+        for i, pattern in enumerate(patterns):
+            for node in compile(pattern).finditer(content):
+                expected.setdefault(id(node), []).append(i)
+        result = [(id(node), matched)
+                  for node, matched in rules.finditer(content)]
+        self.assertEqual(sorted(expected.items()), sorted(result))
+        self.assertEqual([compile(pattern).count(content)
+                          for pattern in patterns], rules.count(content))
+        # Shared subpatterns are compiled once
+        self.assertIs(rules._byDeprel["nsubj"][0][1],
+                      rules._byDeprel["nsubj"][1][1])
+        self.assertIs(dict(rules._byDeprel["root"])[7].right.items[1],
+                      dict(rules._byDeprel["obj"])[10])
+        self.assertEqual([], PatternSet([]).count(content))
+        self.assertRaises(ValueError, PatternSet, [None])
+        return
+
+
 if __name__ == '__main__':
     if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
         unittest.main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Inverted index over dependency treebanks.
+# Simon Fraser University
+# Jetic Gu
+#
+# A TreebankIndex maps the values of the DEPREL, UPOS, XPOS, LEMMA and FORM
+# columns, as well as (head DEPREL, child DEPREL) pairs, to the sentences and
+# tokens carrying them. Compiled Dependency Expressions
+# (natlang.analysis.conllTransformer.compile) accept an index in place of a
+# corpus: only the sentences holding every label the pattern requires are
+# read, and only the tokens fitting the top node of the pattern are matched.
+#
+#   > corpus = natlang.corpus.Corpus("treebank.conllu")
+#   > index = TreebankIndex(corpus)
+#   > conllTransformer.compile("(|nsubj[UPOS=PRON]|)").count(index)
+#
+from __future__ import absolute_import
+import os
+import sys
+import inspect
+import unittest
+
+from natlang.lazy import LazySentence
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+__version__ = "0.3a"
+
+# Field of the (head DEPREL, child DEPREL) keys. They are recorded on the
+# head token.
+pairField = "DEPREL-PAIR"
+
+
+class TreebankIndex(object):
+    '''
+    Postings of the labels of a dependency corpus. Keys are (field, value)
+    tuples, e.g. ("UPOS", "NOUN") or (pairField, ("root", "nsubj")).
+    @param corpus: sequence of natlang.format.conll.Node, e.g. the list
+        returned by conll.load or a natlang.corpus.Corpus, which then only
+        parses the sentences a query needs. Lazy and corrupt (None) sentences
+        are accepted.
+    @param postings: dict, the postings of corpus, see load. Built from
+        corpus if None.
+    '''
+    fields = ("DEPREL", "UPOS", "XPOS", "LEMMA", "FORM")
+
+    def __init__(self, corpus, postings=None):
+        self.corpus = corpus
+        if postings is None:
+            postings = self._build(corpus)
+        # postings[key][sentence]: sorted list of the IDs of the tokens of
+        # the sentence with key
+        self.postings = postings
+        return
+
+    def _build(self, corpus):
+        postings = {}
+        fieldIndices = {}
+        for i, sentence in enumerate(corpus):
+            if isinstance(sentence, LazySentence):
+                sentence = sentence.node
+            if sentence is None:
+                continue
+            keys = {}
+            for node in sentence.phrase:
+                entries = node.rawEntries
+                try:
+                    indices = fieldIndices[id(node.format)]
+                except KeyError:
+                    indices = fieldIndices[id(node.format)] = [
+                        (field, node.format[field]) for field in self.fields
+                        if field in node.format]
+                for field, index in indices:
+                    if index < len(entries):
+                        keys.setdefault((field, entries[index]),
+                                        set()).add(node.id)
+                head = node.parent
+                if head.parent is not None:
+                    keys.setdefault((pairField, (head.deprel, node.deprel)),
+                                    set()).add(head.id)
+            for key, ids in keys.items():
+                postings.setdefault(key, {})[i] = sorted(ids)
+        return postings
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def sentence(self, i):
+        '''
+        @return: natlang.format.conll.Node, the root of sentence i. None if
+            the sentence is corrupt.
+        '''
+        sentence = self.corpus[i]
+        if isinstance(sentence, LazySentence):
+            return sentence.node
+        return sentence
+
+    def sentences(self, keys):
+        '''
+        @param keys: iterable of keys
+        @return: sorted list of the indices of the sentences containing every
+            key, all sentences if keys is empty
+        '''
+        postings = []
+        for key in set(keys):
+            posting = self.postings.get(key)
+            if posting is None:
+                return []
+            postings.append(posting)
+        if len(postings) == 0:
+            return list(range(len(self.corpus)))
+        # Intersect from the rarest key, the result is at most that long
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if len(result) == 0:
+                return []
+        return sorted(result)
+
+    def tokens(self, i, keys):
+        '''
+        @param i: int, a sentence index
+        @param keys: iterable of keys, not empty
+        @return: sorted list of the IDs of the tokens of sentence i with
+            every key
+        '''
+        result = None
+        for key in set(keys):
+            ids = self.postings.get(key, {}).get(i)
+            if ids is None:
+                return []
+            if result is None:
+                result = set(ids)
+            else:
+                result.intersection_update(ids)
+        if result is None:
+            raise ValueError(
+                "natlang.analysis.treebankIndex.tokens: no keys given")
+        return sorted(result)
+
+    def save(self, fileName):
+        '''
+        Saves the postings, the corpus itself is not saved.
+        '''
+        with open(os.path.expanduser(fileName), 'wb') as f:
+            pickle.dump((len(self.corpus), self.postings), f,
+                        pickle.HIGHEST_PROTOCOL)
+        return
+
+    @classmethod
+    def load(cls, fileName, corpus):
+        '''
+        @param corpus: the corpus the index was built from
+        @return: TreebankIndex
+        '''
+        with open(os.path.expanduser(fileName), 'rb') as f:
+            length, postings = pickle.load(f)
+        if length != len(corpus):
+            raise ValueError(
+                "natlang.analysis.treebankIndex.load: the index has " +
+                str(length) + " sentences, the corpus " + str(len(corpus)))
+        return cls(corpus, postings)
+
+
+class TestTreebankIndex(unittest.TestCase):
+    def testIndex(self):
+        import shutil
+        import tempfile
+        from natlang.format import conll
+        from natlang.corpus import Corpus
+        currentdir = os.path.dirname(os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe()))))
+        fileName = currentdir + "/test/sampleCoNLLU.conll"
+        content = conll.load(fileName, verbose=False)
+        index = TreebankIndex(content)
+        self.assertEqual(len(content), len(index))
+        for i, sentence in enumerate(content):
+            for node in sentence.phrase:
+                for key in (("DEPREL", node.deprel),
+                            ("UPOS", node.rawEntries[3]),
+                            ("FORM", node.value[0])):
+                    self.assertIn(i, index.sentences([key]))
+                    self.assertIn(node.id, index.tokens(i, [key]))
+                if node.parent.parent is not None:
+                    key = (pairField, (node.parent.deprel, node.deprel))
+                    self.assertIn(node.parent.id, index.tokens(i, [key]))
+        self.assertEqual(list(range(len(content))), index.sentences([]))
+        self.assertEqual([], index.sentences([("UPOS", "none")]))
+        self.assertEqual([], index.tokens(0, [("UPOS", "none")]))
+        self.assertRaises(ValueError, index.tokens, 0, [])
+        upos = set(index.tokens(1, [("UPOS", "NOUN")]))
+        deprel = set(index.tokens(1, [("DEPREL", "nsubj")]))
+        self.assertEqual(sorted(upos & deprel),
+                         index.tokens(1, [("UPOS", "NOUN"),
+                                          ("DEPREL", "nsubj")]))
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            shutil.copy(fileName, tmpdir)
+            corpus = Corpus(tmpdir + "/sampleCoNLLU.conll")
+            index.save(tmpdir + "/index.pkl")
+            restored = TreebankIndex.load(tmpdir + "/index.pkl", corpus)
+            self.assertRaises(ValueError, TreebankIndex.load,
+                              tmpdir + "/index.pkl", content[1:])
+            self.assertEqual(index.postings, restored.postings)
+            self.assertEqual(content[2].export(),
+                             restored.sentence(2).export())
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
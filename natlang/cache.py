@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# On-disk cache of parsed files.
+# Simon Fraser University
+# Jetic Gu
+#
+# Parsed contents are stored as pickles named after a hash of the file
+# identity (path, size, mtime or content hash), the format and the loading
+# options. The directory is kept under a size budget by evicting the least
+# recently used entries.
+#
+from __future__ import absolute_import
+import os
+import sys
+import hashlib
+import inspect
+import tempfile
+import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from natlang.__version__ import version
+__version__ = "0.3a"
+
+defaultCacheDir = os.path.join("~", ".cache", "natlang")
+defaultMaxSize = 4 * 1024 ** 3
+cacheSuffix = ".pkl"
+# Bumped whenever the pickled layout of parsed content changes, e.g. the node
+# classes gaining __slots__, phrases becoming spans, labels being interned or
+# lazy sentences leaving out the shared vocabularies, so that entries written
+# by older code are never loaded
+cacheRevision = 5
+# Replaces an existing entry atomically, which os.rename only does on POSIX
+_replace = getattr(os, "replace", os.rename)
+
+
+class LoadCache():
+    '''
+    Persistent cache for parsed files.
+    @param directory: str, the cache directory, created if missing
+    @param maxSize: int, size budget in bytes for the cache directory
+    @param hashContent: bool, identify files by a hash of their content
+        instead of their size and modification time. Slower, but robust to
+        files being copied around or touched.
+    '''
+    def __init__(self, directory=defaultCacheDir, maxSize=defaultMaxSize,
+                 hashContent=False):
+        self.directory = os.path.expandvars(os.path.expanduser(directory))
+        self.maxSize = maxSize
+        self.hashContent = hashContent
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        return
+
+    def _fileIdentity(self, fileName):
+        fileName = os.path.abspath(os.path.expanduser(fileName))
+        if self.hashContent is True:
+            digest = hashlib.sha1()
+            with open(fileName, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            return (fileName, digest.hexdigest())
+        stat = os.stat(fileName)
+        return (fileName, stat.st_size, stat.st_mtime)
+
+    def key(self, fileName, formatName, options=None):
+        '''
+        @param fileName: str, the parsed file
+        @param formatName: str, name of the format or loader used
+        @param options: dict, the options the file was loaded with
+        @return: str, the cache key
+        '''
+        if options is None:
+            options = {}
+        identity = (version,
+                    cacheRevision,
+                    self._fileIdentity(fileName),
+                    formatName,
+                    sorted((str(k), repr(v)) for k, v in options.items()))
+        return hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + cacheSuffix)
+
+    def get(self, key):
+        '''
+        @return: the cached content, None if key is not in the cache. Entries
+            that fail to load, e.g. truncated or pickled with classes that
+            have changed since, are removed and count as misses.
+        '''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Refresh the modification time, which is used for LRU eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return content
+
+    def put(self, key, content):
+        '''
+        Store content under key, then evict old entries if the cache exceeds
+        its size budget.
+        @return: bool, whether content was stored
+        '''
+        tmpPath = None
+        try:
+            fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(content, f, pickle.HIGHEST_PROTOCOL)
+            _replace(tmpPath, self._path(key))
+        except Exception as e:
+            # The cache is only an optimisation: a full disk, a read-only
+            # directory or content that cannot be pickled (deeply nested
+            # structures might exceed the recursion limit) must not fail the
+            # load
+            sys.stderr.write(
+                "natlang.cache.LoadCache.put [WARN]: content not cached, " +
+                str(e) + "\n")
+            if tmpPath is not None:
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache directory fits in
+        maxSize.
+        '''
+        entries = []
+        totalSize = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(cacheSuffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            totalSize += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalSize -= size
+        return
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(cacheSuffix):
+                os.remove(os.path.join(self.directory, name))
+        return
+
+
+class TestLoadCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        return
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def testCacheHitAndMiss(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        cache = LoadCache(self.tmpdir)
+        fileName = currentdir + "/test/sampleTree.txt"
+        key = cache.key(fileName, "tree", {"linesToLoad": 10})
+        self.assertEqual(None, cache.get(key))
+        cache.put(key, [["a", "b"], ["c"]])
+        self.assertEqual([["a", "b"], ["c"]], cache.get(key))
+        self.assertNotEqual(key, cache.key(fileName, "txt",
+                                           {"linesToLoad": 10}))
+        self.assertNotEqual(key, cache.key(fileName, "tree",
+                                           {"linesToLoad": 11}))
+        cache.clear()
+        self.assertEqual(None, cache.get(key))
+        return
+
+    def testStaleEntry(self):
+        cache = LoadCache(self.tmpdir)
+        # Pickled with a class that no longer exists, loading it raises
+        # AttributeError
+        for content in (b"cnatlang.cache\nRemovedClass\n)\x81.",
+                        b"\x80\x02]q\x00"):
+            with open(cache._path("a"), 'wb') as f:
+                f.write(content)
+            self.assertEqual(None, cache.get("a"))
+            self.assertFalse(os.path.exists(cache._path("a")))
+        return
+
+    def testPutFailure(self):
+        import six
+
+        class Unwritable(object):
+            def __reduce__(self):
+                raise IOError(28, "No space left on device")
+
+        cache = LoadCache(self.tmpdir)
+        cache.put("a", [1])
+        cache.put("a", [2])
+        self.assertEqual([2], cache.get("a"))
+        stderr, sys.stderr = sys.stderr, six.StringIO()
+        try:
+            self.assertFalse(cache.put("b", [Unwritable()]))
+            cache.directory = os.path.join(self.tmpdir, "removed")
+            self.assertFalse(cache.put("c", [1]))
+        finally:
+            sys.stderr = stderr
+        # No temporary file is left behind
+        self.assertEqual(["a" + cacheSuffix], os.listdir(self.tmpdir))
+        return
+
+    def testEviction(self):
+        cache = LoadCache(self.tmpdir, maxSize=0)
+        cache.put("a", list(range(100)))
+        self.assertEqual(None, cache.get("a"))
+        cache.maxSize = defaultMaxSize
+        cache.put("a", list(range(100)))
+        self.assertEqual(list(range(100)), cache.get("a"))
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Columnar, array backed representation of CoNLL corpora.
+# Simon Fraser University
+# Jetic Gu
+#
+# Tokens of all sentences are stored in flat integer arrays: HEAD as is, every
+# other column as codes into a vocabulary shared by the whole corpus. A
+# sentence only becomes a tree of conll.Node when it is accessed. numpy is
+# used for the arrays when it is installed, array.array otherwise.
+#
+from __future__ import absolute_import
+import os
+import sys
+import array
+import inspect
+import unittest
+
+from natlang.format import conll
+from natlang.vocabulary import Vocabulary
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__version__ = "0.3a"
+
+# Code of a column missing from a token line
+_missing = -1
+
+
+def _toArray(values):
+    if numpy is None:
+        return values
+    if values.typecode == 'i':
+        return numpy.frombuffer(values, dtype=numpy.intc)
+    return numpy.frombuffer(values, dtype=numpy.int_)
+
+
+class ColumnarCorpus():
+    '''
+    CoNLL corpus stored column by column.
+    corpus[i] builds the conll.Node tree of sentence i, same as the one
+    conll.load returns. Token level data can be read without building trees
+    through column, heads and the codes attribute.
+    @param fileName: str, the CoNLL file
+    @param linesToLoad: int, the number of sentences to load
+    @param skip: int, the number of sentences to skip before loading
+    @param vocabularies: dict of Vocabulary, keyed by column name. Pass the
+        vocabularies of another corpus to share codes between corpora.
+
+    The ID column is not stored, IDs are the token positions in their
+    sentence (conll.constructFromText rejects any other numbering).
+    '''
+    def __init__(self, fileName,
+                 linesToLoad=sys.maxsize,
+                 entryIndex=conll.defaultEntryIndex,
+                 commentMark=conll.defaultCommentMark,
+                 verbose=True, skip=0, vocabularies=None):
+        self.entryIndex = entryIndex
+        self.vocabularies = vocabularies if vocabularies is not None else {}
+        self._names = dict((position, name)
+                           for name, position in entryIndex.items()
+                           if name != "__name__")
+        self._idIndex = entryIndex["ID"]
+        self._headIndex = entryIndex["HEAD"]
+        # Name of the column at each position of a token line
+        self.columnNames = []
+        self.codes = {}
+        self.heads = array.array('i')
+        self.offsets = array.array('l', [0])
+        # Sentences rejected for corrupt IDs, loaded as None
+        self.corrupt = set()
+
+        for entry in conll.iterEntries(fileName, linesToLoad, commentMark,
+                                       verbose, skip):
+            self._append(entry)
+
+        self.heads = _toArray(self.heads)
+        self.offsets = _toArray(self.offsets)
+        for name in self.codes:
+            self.codes[name] = _toArray(self.codes[name])
+        return
+
+    def _addColumn(self, position):
+        tokens = self.offsets[-1]
+        while len(self.columnNames) <= position:
+            name = self._names.get(len(self.columnNames),
+                                   str(len(self.columnNames)))
+            self.columnNames.append(name)
+            if len(self.columnNames) - 1 in (self._idIndex, self._headIndex):
+                continue
+            if name not in self.vocabularies:
+                self.vocabularies[name] = Vocabulary()
+            self.codes[name] = array.array('i', [_missing] * tokens)
+        return
+
+    def _append(self, entry):
+        lines = [line.split('\t') for line in entry]
+        headIndex = self._headIndex
+        heads = []
+        # Multiword tokens (1-2) and empty nodes (8.1) are rejected, as in
+        # conll.constructFromText
+        for i, line in enumerate(lines, start=1):
+            try:
+                if int(line[self._idIndex]) != i:
+                    raise ValueError()
+                heads.append(int(line[headIndex]))
+            except (ValueError, IndexError):
+                sys.stderr.write(
+                    "natlang.columnar [WARN]: Corrupt data format\n")
+                self.corrupt.add(len(self.offsets) - 1)
+                self.offsets.append(self.offsets[-1])
+                return
+        width = max([len(line) for line in lines] + [0])
+        if width > len(self.columnNames):
+            self._addColumn(width - 1)
+
+        self.heads.extend(heads)
+        for position, name in enumerate(self.columnNames):
+            if position == self._idIndex or position == headIndex:
+                continue
+            index = self.vocabularies[name].index
+            self.codes[name].extend(
+                [index(line[position]) if position < len(line) else _missing
+                 for line in lines])
+        self.offsets.append(self.offsets[-1] + len(lines))
+        return
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+        return
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("natlang.columnar.ColumnarCorpus: index out of " +
+                             "range")
+        if key in self.corrupt:
+            return None
+        return conll.constructFromText(self.lines(key), self.entryIndex)
+
+    def length(self, i):
+        '''
+        @return: int, the number of tokens of sentence i
+        '''
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def column(self, name, i):
+        '''
+        @return: list of str, column name of the tokens of sentence i
+        '''
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        if name == "ID":
+            return [str(j) for j in range(1, end - start + 1)]
+        if name == "HEAD":
+            return [str(head) for head in self.heads[start:end]]
+        items = self.vocabularies[name].items
+        return [items[code] if code != _missing else None
+                for code in self.codes[name][start:end]]
+
+    def lines(self, i):
+        '''
+        @return: list of str, the token lines of sentence i, as in the file
+        '''
+        columns = [self.column(name, i) for name in self.columnNames]
+        return ["\t".join([field for field in fields if field is not None])
+                for fields in zip(*columns)]
+
+    def export(self, i):
+        '''
+        @return: str, sentence i in CoNLL format, without building its tree
+        '''
+        return "\n".join(self.lines(i) + [""])
+
+
+class TestColumnarCorpus(unittest.TestCase):
+    def testColumnarCorpus(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleCoNLLU.conll"
+        content = conll.load(fileName, verbose=False)
+        corpus = ColumnarCorpus(fileName, verbose=False)
+        self.assertEqual(len(content), len(corpus))
+        self.assertEqual([x.export() for x in content],
+                         [x.export() for x in corpus])
+        self.assertEqual([x.export() for x in content],
+                         [corpus.export(i) for i in range(len(corpus))])
+        self.assertEqual(content[-1].export(), corpus[-1].export())
+        self.assertEqual(7, corpus.length(0))
+        self.assertEqual(["ADP", "DET", "PROPN", "VERB", "DET", "NOUN",
+                          "PUNCT"], corpus.column("UPOS", 0))
+        self.assertEqual([3, 3, 4, 0, 6, 4, 4], list(corpus.heads[:7]))
+        # UPOS codes are shared by all sentences
+        upos = corpus.vocabularies["UPOS"]
+        self.assertEqual(upos.get("DET"), corpus.codes["UPOS"][1])
+        self.assertEqual(upos.get("DET"), corpus.codes["UPOS"][7 + 15])
+
+        window = ColumnarCorpus(fileName, linesToLoad=1, skip=1,
+                                verbose=False,
+                                vocabularies=corpus.vocabularies)
+        self.assertEqual(1, len(window))
+        self.assertEqual(content[1].export(), window[0].export())
+        self.assertEqual(len(upos), len(window.vocabularies["UPOS"]))
+        return
+
+    def testMultiwordToken(self):
+        import six
+        import shutil
+        import tempfile
+        valid = "1\tA\t_\tX\t_\t_\t0\troot\t_\t_\n" +\
+            "2\tB\t_\tX\t_\t_\t1\tdep\t_\t_\n"
+        tmpdir = tempfile.mkdtemp()
+        stderr, sys.stderr = sys.stderr, six.StringIO()
+        try:
+            fileName = os.path.join(tmpdir, "multiword.conll")
+            with open(fileName, "w") as f:
+                f.write(valid + "\n" +
+                        "1-2\tAB\t_\t_\t_\t_\t_\t_\t_\t_\n" + valid +
+                        "\n" + valid + "2.1\tC\t_\tX\t_\t_\t_\t_\t_\t_\n" +
+                        "\n" + valid)
+            content = conll.load(fileName, verbose=False)
+            corpus = ColumnarCorpus(fileName, verbose=False)
+            self.assertEqual(4, len(corpus))
+            self.assertEqual(set([1, 2]), corpus.corrupt)
+            self.assertEqual([None if x is None else x.export()
+                              for x in content],
+                             [None if x is None else x.export()
+                              for x in corpus])
+            self.assertEqual(4, len(corpus.heads))
+            self.assertIn("[WARN]", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+            shutil.rmtree(tmpdir)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Random access into corpus files through a byte offset index.
+# Simon Fraser University
+# Jetic Gu
+#
+# The index records the byte offset of every sentence of a file and is stored
+# next to it as a sidecar (FILE.idx). A Corpus uses it to seek to and parse
+# only the requested sentences.
+#
+from __future__ import absolute_import
+import os
+import sys
+import array
+import inspect
+import unittest
+import six
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+__version__ = "0.3a"
+
+indexSuffix = ".idx"
+# Bumped whenever the sentence boundaries change, to rebuild stale indices
+indexRevision = 2
+
+try:
+    _offsetType = 'Q'
+    array.array(_offsetType)
+except ValueError:
+    # Python 2
+    _offsetType = 'L'
+
+
+def buildIndex(fileName, blankLine=False, commentMark=None):
+    '''
+    Record the byte offsets of the sentences of a file.
+    @param blankLine: bool, if True sentences are separated by blank lines
+        (CoNLL). Otherwise each line is a sentence.
+    @param commentMark: str, lines starting with commentMark belong to the
+        sentence that follows them, only used when blankLine is True.
+    @return: array, sentence i spans bytes [offsets[i], offsets[i + 1])
+    '''
+    if commentMark is not None:
+        commentMark = commentMark.encode('utf-8')
+    offsets = array.array(_offsetType, [0])
+    position = 0
+    hasEntry = False
+    with open(os.path.expanduser(fileName), 'rb') as file:
+        for line in file:
+            position += len(line)
+            if blankLine is False:
+                offsets.append(position)
+                continue
+            line = line.strip()
+            if line == b"":
+                offsets.append(position)
+                hasEntry = False
+            elif commentMark is None or not line.startswith(commentMark):
+                hasEntry = True
+    if hasEntry:
+        offsets.append(position)
+    return offsets
+
+
+def loadIndex(fileName, blankLine=False, commentMark=None, rebuild=False):
+    '''
+    Load the sidecar index of a file, (re)building it if it is missing or out
+    of date. If the sidecar cannot be written the index is only kept in
+    memory.
+    @return: array, see buildIndex
+    '''
+    fileName = os.path.expanduser(fileName)
+    stat = os.stat(fileName)
+    header = (__version__, indexRevision, stat.st_size, stat.st_mtime,
+              blankLine, commentMark)
+    indexName = fileName + indexSuffix
+    if rebuild is False and os.path.isfile(indexName):
+        try:
+            with open(indexName, 'rb') as f:
+                if pickle.load(f) == header:
+                    return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    offsets = buildIndex(fileName, blankLine, commentMark)
+    try:
+        with open(indexName, 'wb') as f:
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(offsets, f, pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError):
+        sys.stderr.write(
+            "natlang.corpus.loadIndex [WARN]: cannot write index " +
+            indexName + "\n")
+    return offsets
+
+
+class Corpus():
+    '''
+    Random access view of a corpus file. Sentences are parsed on access,
+    corpus[i] and corpus[i:j] only read the bytes of the requested sentences.
+    @param fileName: str, the corpus file
+    @param format: str or module, the format of the file. The format has to
+        provide a loadRange function (conll, tree, AMR, txt, alignment).
+    @param rebuildIndex: bool, ignore existing sidecar index
+    @param kwargs: extra keyword arguments for format.loadRange
+    '''
+    def __init__(self, fileName, format="conll", rebuildIndex=False,
+                 **kwargs):
+        if isinstance(format, six.string_types):
+            from natlang.loader import supportedList
+            if format not in supportedList:
+                raise ValueError(
+                    "natlang.corpus.Corpus: invalid format selection")
+            format = supportedList[format]
+        if not hasattr(format, 'loadRange'):
+            raise ValueError(
+                "natlang.corpus.Corpus: format does not support random " +
+                "access, loadRange missing")
+        self.fileName = os.path.expanduser(fileName)
+        from natlang.reader import isCompressed
+        if isCompressed(self.fileName):
+            raise ValueError(
+                "natlang.corpus.Corpus: compressed files do not support " +
+                "random access, decompress " + fileName + " first")
+        self.loader = format.loadRange
+        self.kwargs = kwargs
+        blankLine = getattr(format, 'blankLineSeparated', False)
+        commentMark = None
+        if blankLine is True:
+            commentMark = kwargs.get(
+                "commentMark", getattr(format, 'defaultCommentMark', None))
+        self.offsets = loadIndex(self.fileName, blankLine, commentMark,
+                                 rebuild=rebuildIndex)
+        return
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _loadRange(self, start, end):
+        return self.loader(self.fileName,
+                           self.offsets[start], self.offsets[end],
+                           **self.kwargs)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                if start >= stop:
+                    return []
+                return self._loadRange(start, stop)
+            return [self._loadRange(i, i + 1)[0]
+                    for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("natlang.corpus.Corpus: index out of range")
+        return self._loadRange(key, key + 1)[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+        return
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ("sampleCoNLLU.conll", "sampleTree.txt",
+                     "sampleAMR.amr"):
+            shutil.copy(currentdir + "/test/" + name, self.tmpdir)
+        return
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def testConllCorpus(self):
+        from natlang.format import conll
+        fileName = self.tmpdir + "/sampleCoNLLU.conll"
+        content = conll.load(fileName, verbose=False)
+        corpus = Corpus(fileName, "conll")
+        self.assertTrue(os.path.isfile(fileName + indexSuffix))
+        self.assertEqual(len(content), len(corpus))
+        self.assertEqual(content[1].export(), corpus[1].export())
+        self.assertEqual(content[-1].export(), corpus[-1].export())
+        self.assertEqual([x.export() for x in content[1:]],
+                         [x.export() for x in corpus[1:]])
+        self.assertEqual([x.export() for x in content[::2]],
+                         [x.export() for x in corpus[::2]])
+        self.assertRaises(IndexError, corpus.__getitem__, 3)
+        # Loaded from the sidecar this time
+        corpus = Corpus(fileName, "conll")
+        self.assertEqual([x.export() for x in content],
+                         [x.export() for x in corpus])
+        return
+
+    def testCommentedConllCorpus(self):
+        from natlang.format import conll
+        fileName = self.tmpdir + "/comments.conll"
+        token = "1\tA\ta\tX\t_\t_\t0\troot\t_\t_"
+        with open(fileName, 'w') as f:
+            f.write("\n".join(["# sent_id = 1", "# text = A", token, "",
+                               "# sent_id = 2", token, "", "# trailing"]))
+        content = conll.load(fileName, verbose=False)
+        corpus = Corpus(fileName, "conll")
+        self.assertEqual(2, len(corpus))
+        self.assertEqual([x.export() for x in content],
+                         [x.export() for x in corpus])
+        return
+
+    def testLineCorpus(self):
+        from natlang.format import tree, AMR
+        fileName = self.tmpdir + "/sampleTree.txt"
+        content = tree.load(fileName, verbose=False)
+        corpus = Corpus(fileName, "tree")
+        self.assertEqual(len(content), len(corpus))
+        self.assertEqual(content[1].export(), corpus[1].export())
+        self.assertEqual(None, corpus[2])
+
+        fileName = self.tmpdir + "/sampleAMR.amr"
+        content = AMR.load(fileName, verbose=False)
+        corpus = Corpus(fileName, "AMR")
+        self.assertEqual(len(content), len(corpus))
+        self.assertEqual([x.export() for x in content[3:7]],
+                         [x.export() for x in corpus[3:7]])
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
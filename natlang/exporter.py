@@ -7,22 +7,169 @@
 #
 #
 from __future__ import absolute_import
+import io
 import os
 import sys
 import inspect
 import unittest
-from natlang.format.tree import Node
+
+import six
+from natlang.reader import compressionFromExtension
 __version__ = "0.3a"
 
 
-def exportToFile(result, fileName):
-    with open(fileName, "w") as outputFile:
-        for sent in result:
+def _compressor(compression, rawFile):
+    if compression == "gzip":
+        import gzip
+        # Level 6 like the gzip command, 9 is several times slower
+        return gzip.GzipFile(fileobj=rawFile, mode='wb', compresslevel=6)
+    if compression == "bz2":
+        import bz2
+        if six.PY2:
+            # BZ2File only accepts file names on Python 2
+            return _IncrementalWriter(rawFile, bz2.BZ2Compressor())
+        return bz2.BZ2File(rawFile, 'wb')
+    if compression == "xz":
+        try:
+            import lzma
+        except ImportError:
+            from backports import lzma
+        return lzma.LZMAFile(rawFile, 'wb')
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "natlang.exporter: writing zstd compressed files requires " +
+                "the zstandard package")
+        return zstandard.ZstdCompressor().stream_writer(rawFile)
+    raise ValueError(
+        "natlang.exporter: unknown compression " + str(compression))
+
+
+class _IncrementalWriter(io.RawIOBase):
+    '''
+    Binary stream compressing into rawFile with an incremental compressor.
+    rawFile is not closed, like with the compressors of the standard
+    library.
+    @param compressor: object with compress and flush, e.g.
+        bz2.BZ2Compressor()
+    '''
+    def __init__(self, rawFile, compressor):
+        io.RawIOBase.__init__(self)
+        self._rawFile = rawFile
+        self._compressor = compressor
+        return
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if isinstance(b, memoryview):
+            b = b.tobytes()
+        self._rawFile.write(self._compressor.compress(bytes(b)))
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            self._rawFile.write(self._compressor.flush())
+        io.RawIOBase.close(self)
+        return
+
+
+def _exportSentence(sent):
+    if hasattr(sent, 'export'):
+        return sent.export()
+    if isinstance(sent, str):
+        return sent
+    return " ".join(sent)
+
+
+class Writer():
+    """
+    Buffered writer streaming sentences into a file, optionally compressed.
+    Trees are exported piece by piece while they are traversed, and the
+    pieces of many sentences are written out together.
+    @param fileName: str
+    @param compression: str, "gzip", "bz2", "xz" or "zstd". By default it is
+        guessed from the extension of fileName (.gz, .bz2, .xz, .zst).
+    @param bufferSize: int, size of the file buffer in bytes
+    """
+    # Number of pieces collected before they are written out
+    batchSize = 4096
+
+    def __init__(self, fileName, compression=None, encoding="utf-8",
+                 bufferSize=1 << 20):
+        fileName = os.path.expanduser(fileName)
+        if compression is None:
+            compression = compressionFromExtension(fileName)
+        self.__rawFile = io.open(fileName, 'wb', buffering=bufferSize)
+        stream = self.__rawFile
+        if compression is not None:
             try:
-                line = sent.export()
-            except AttributeError:
-                line = " ".join(sent)
-            outputFile.write(line + "\n")
+                stream = _compressor(compression, self.__rawFile)
+            except Exception:
+                self.__rawFile.close()
+                raise
+        self.__outputFile = io.TextIOWrapper(stream, encoding=encoding)
+        self.__encoding = encoding
+        self.__pending = []
+        return
+
+    def write(self, sent):
+        if hasattr(sent, 'iterExport'):
+            self.__pending.extend(sent.iterExport())
+        else:
+            self.__pending.append(_exportSentence(sent))
+        self.__pending.append("\n")
+        if len(self.__pending) >= self.batchSize:
+            self.flush()
+        return
+
+    def writeAll(self, content):
+        '''
+        @param content: iterable of sentences, e.g. a loader's iterload
+            generator
+        '''
+        for sent in content:
+            self.write(sent)
+        return
+
+    def flush(self):
+        pending = self.__pending
+        if six.PY2:
+            # Sentences hold native str, io only writes unicode
+            pending = [piece if isinstance(piece, six.text_type)
+                       else piece.decode(self.__encoding)
+                       for piece in pending]
+        # Writing one joined string is much cheaper than one call per piece
+        self.__outputFile.write(u"".join(pending))
+        del self.__pending[:]
+        return
+
+    def close(self):
+        if not self.__outputFile.closed:
+            self.flush()
+            self.__outputFile.close()
+        # Compressors do not close the file object they wrap
+        self.__rawFile.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return
+
+
+def exportToFile(result, fileName, compression=None):
+    '''
+    @param result: iterable of sentences, lists and generators alike
+    @param compression: str, see Writer
+    '''
+    with Writer(fileName, compression) as outputFile:
+        outputFile.writeAll(result)
     return
 
 
@@ -35,16 +182,49 @@ class RealtimeExporter():
         return
 
     def write(self, sent):
-        if isinstance(sent, Node):
-            line = sent.export()
-        elif isinstance(sent, str):
-            line = sent
-        else:
-            line = " ".join(sent)
-        self.__outputFile.write(line + "\n")
+        self.__outputFile.write(_exportSentence(sent) + "\n")
         self.__outputFile.flush()
         return
 
     def __del__(self):
         if self.__outputFile:
             self.__outputFile.close()
+
+
+class TestWriter(unittest.TestCase):
+    def testRoundTrip(self):
+        import shutil
+        import tempfile
+        from natlang.format import conll, tree, AMR
+        from natlang.reader import openFile, isCompressed
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for module, sample in ((conll, "sampleCoNLLU.conll"),
+                                   (tree, "sampleTree.txt"),
+                                   (AMR, "sampleAMR.amr")):
+                content = [x for x in module.load(
+                    currentdir + "/test/" + sample, verbose=False)
+                    if x is not None]
+                expected = "".join(x.export() + "\n" for x in content)
+                for name in ("out", "out.gz", "out.bz2", "out.xz"):
+                    fileName = os.path.join(tmpdir, name)
+                    exportToFile(iter(content), fileName)
+                    self.assertEqual(name != "out", isCompressed(fileName))
+                    with openFile(fileName) as f:
+                        self.assertEqual(expected, f.read())
+            fileName = os.path.join(tmpdir, "out")
+            with Writer(fileName, compression="gzip") as f:
+                f.write("a b")
+                f.write(["c", "d"])
+            with openFile(fileName) as f:
+                self.assertEqual("a b\nc d\n", f.read())
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
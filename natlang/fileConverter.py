@@ -21,8 +21,6 @@ except ImportError:
 
 import xml.etree.ElementTree as ET
 
-import jieba
-
 from natlang.format.tree import lexicaliseNode
 from natlang.format.tree import load as loadPennTree
 
@@ -190,6 +188,7 @@ def procXML(filename, jieba=False):
 
 
 def procXMLCN(filename):
+    import jieba
     result = []
     tree = ET.parse(filename)
     root = tree.getroot()
@@ -202,6 +201,7 @@ def procXMLCN(filename):
 
 
 def rawIntoSegForms(fileName, linesToLoad=sys.maxsize):
+    import jieba
     result = []
     fileName = os.path.expanduser(fileName)
     content = [line.strip() for line in open(fileName)][:linesToLoad]
@@ -10,19 +10,38 @@ import os
 import sys
 import inspect
 import unittest
+import warnings
+from six.moves import zip
 from natlang.format.tree import Node
 from natlang.format.tree import load as loadPennTree
+from natlang.reader import openFile
 __version__ = "0.2a"
-sys.stderr.write("Warning, use of fileIO is deprecated")
+warnings.warn("natlang.fileIO is deprecated, use natlang.loader and " +
+              "natlang.exporter instead", DeprecationWarning, stacklevel=2)
 
 
-def _loadBitext(file1, file2, linesToLoad=sys.maxsize):
+def _window(iterable, linesToLoad=sys.maxsize, skip=0):
+    '''
+    Lazily yield linesToLoad items of iterable after skipping the first skip
+    items, so that files are only read as far as needed.
+    '''
+    for i, item in enumerate(iterable):
+        if i < skip:
+            continue
+        if i >= skip + linesToLoad:
+            break
+        yield item
+    return
+
+
+def _loadBitext(file1, file2, linesToLoad=sys.maxsize, skip=0):
     '''
     This function is used to read a bitext from two text files.
 
     @param file1: str, the first file to read
     @param file2: str, the second file to read
     @param* linesToLoad: int, the lines to read
+    @param* skip: int, the lines to skip before reading
     @return: Bitext, detailed of this format:
         https://github.com/sfu-natlang/HMM-Aligner/wiki/API-reference:-Dataset-Data-Format-V0.1a#bitext
     '''
@@ -30,12 +49,12 @@ def _loadBitext(file1, file2, linesToLoad=sys.maxsize):
     path2 = os.path.expanduser(file2)
     bitext =\
         [[sentence.strip().split() for sentence in pair] for pair in
-            list(zip(open(path1), open(path2)))[:linesToLoad]]
+            _window(zip(openFile(path1), openFile(path2)), linesToLoad, skip)]
     return bitext
 
 
 def loadDataset(fFiles, eFiles, linesToLoad=sys.maxsize,
-                reverse=False):
+                reverse=False, skip=0):
     '''
     This function is used to read a Dataset files.
 
@@ -45,17 +64,20 @@ def loadDataset(fFiles, eFiles, linesToLoad=sys.maxsize,
         including FORM, POS, etc.,
     @param alignmentFile: str, the alignmentFile
     @param* linesToLoad: int, the lines to read
+    @param* skip: int, the lines to skip before reading
     @return: Dataset, detail of this format:
         https://github.com/sfu-natlang/HMM-Aligner/wiki/API-reference:-Dataset-Data-Format-V0.2a#tritext
     '''
     fContents =\
         [list(zip(*[fContent.strip().split() for fContent in contents]))
-         for contents in list(zip(*[open(os.path.expanduser(fFile))
-                                    for fFile in fFiles]))[:linesToLoad]]
+         for contents in _window(zip(*[openFile(fFile)
+                                       for fFile in fFiles]),
+                                 linesToLoad, skip)]
     eContents =\
         [list(zip(*[eContent.strip().split() for eContent in contents]))
-         for contents in list(zip(*[open(os.path.expanduser(eFile))
-                                    for eFile in eFiles]))[:linesToLoad]]
+         for contents in _window(zip(*[openFile(eFile)
+                                       for eFile in eFiles]),
+                                 linesToLoad, skip)]
 
     return zip(fContents, eContents)
 
@@ -65,7 +87,7 @@ AMR/PropBank/NomBank Semantic Frame loaders
 """
 
 
-def loadSemFrame(filePattern, linesToLoad=sys.maxsize):
+def loadSemFrame(filePattern, linesToLoad=sys.maxsize, skip=0):
     content = []
     import glob
     if isinstance(filePattern, list):
@@ -87,17 +109,18 @@ def loadSemFrame(filePattern, linesToLoad=sys.maxsize):
             "fileIO.loadSemFrame [ERROR]: Cannot find matching files")
     for filename in files:
         if filename[-4:] == ".xml":
-            content += loadSemFrameXML(filename)
+            content += loadSemFrameXML(filename, linesToLoad=linesToLoad,
+                                       skip=skip)
         else:
-            content += loadAMRFrame(filename, linesToLoad=linesToLoad)
+            content += loadAMRFrame(filename, linesToLoad=linesToLoad,
+                                    skip=skip)
     return content
 
 
-def loadAMRFrame(filename, linesToLoad=sys.maxsize):
+def loadAMRFrame(filename, linesToLoad=sys.maxsize, skip=0):
     """
     Loader for AMR2.0 frames file: propbank-frame-arg-descr.txt
     """
-    content = list(open(os.path.expanduser(filename)))[:linesToLoad]
 
     def splitEntry(line):
         raw = line.strip().split()
@@ -119,18 +142,18 @@ def loadAMRFrame(filename, linesToLoad=sys.maxsize):
             raise
         return result
 
-    content = [splitEntry(entry) for entry in content]
+    with openFile(filename) as f:
+        content = [splitEntry(entry)
+                   for entry in _window(f, linesToLoad, skip)]
     return content
 
 
-def loadSemFrameXML(filename, linesToLoad=sys.maxsize):
+def loadSemFrameXML(filename, linesToLoad=sys.maxsize, skip=0):
     """
     Loader for CoNLL-2008 frames file: *.xml
+    linesToLoad and skip count rolesets. The whole document is still parsed.
     """
     content = []
-    if linesToLoad != sys.maxsize:
-        sys.stderr.write(
-            "fileIO.loadAMRFrameXML [WARN]: linesToLoad option ignored\n")
 
     from xml.dom import minidom
     xmldoc = minidom.parse(os.path.expanduser(filename))
@@ -143,30 +166,27 @@ def loadSemFrameXML(filename, linesToLoad=sys.maxsize):
             args[str("ARG" + role.attributes['n'].value)] =\
                 str(role.attributes['descr'].value)
         content.append((frame, args))
-    return content
+    return content[skip:skip + linesToLoad]
+
 
+def loadTreeDataset(fFile, eFile, linesToLoad=sys.maxsize, skip=0):
+    def loadTxt(file):
+        with openFile(file) as f:
+            return [line.strip().split()
+                    for line in _window(f, linesToLoad, skip)]
 
-def loadTreeDataset(fFile, eFile, linesToLoad=sys.maxsize):
     try:
-        fContents = loadPennTree(fFile, linesToLoad)
+        fContents = loadPennTree(fFile, linesToLoad, skip=skip)
         if len([f for f in fContents if f is not None]) < (len(fContents) / 2):
-            fContents =\
-                [line.strip().split()
-                 for line in open(os.path.expanduser(fFile))][:linesToLoad]
+            fContents = loadTxt(fFile)
     except AttributeError:
-        fContents =\
-            [line.strip().split() for line in open(os.path.expanduser(fFile))][
-                :linesToLoad]
+        fContents = loadTxt(fFile)
     try:
-        eContents = loadPennTree(eFile, linesToLoad)
+        eContents = loadPennTree(eFile, linesToLoad, skip=skip)
         if len([e for e in eContents if e is not None]) < (len(eContents) / 2):
-            eContents =\
-                [line.strip().split()
-                 for line in open(os.path.expanduser(eFile))][:linesToLoad]
+            eContents = loadTxt(eFile)
     except AttributeError:
-        eContents =\
-            [line.strip().split() for line in open(os.path.expanduser(eFile))][
-                :linesToLoad]
+        eContents = loadTxt(eFile)
     dataset = zip(fContents, eContents)
     dataset = [(f, e) for f, e in dataset if f is not None and e is not None]
     dataset = [(f, e) for f, e in dataset if len(f) > 0 and len(e) > 0]
@@ -13,17 +13,29 @@ import sys
 import os
 import unittest
 import inspect
-import progressbar
 from copy import deepcopy
 from six import string_types
 
+from natlang.parallel import loadParallel, readRange
+from natlang.progress import ByteProgress
+from natlang.reader import openFile
+from natlang.lazy import LazySentence
+from natlang.vocabulary import shared
+from natlang.traversal import walk
 
-class NodeAMR:
+# Name of the vocabulary table of AMR roles
+internedRoles = "ROLE"
+
+
+class NodeAMR(object):
     '''
     This is the main data structure of a tree, a Node instance is a node on the
     tree. The structure of the subtree with node x as root can be viewed by
     calling x.__repr__()
     '''
+    # No per instance __dict__, graph banks have millions of nodes
+    __slots__ = ("id", "concept", "hyperlink", "parent", "link", "linkType")
+
     def __init__(self, hyperlink=None):
         self.id = ""  # instance id: "b" in "(b/boy)"
         self.concept = ""  # concept name: "boy" in "(b/boy)"
@@ -36,6 +48,15 @@ class NodeAMR:
             self.hyperlink = hyperlink
         return
 
+    def __getstate__(self):
+        # Same state as conll.Node, see there
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        return
+
     def __repr__(self, __spacing="", __dispChild=True):
         '''
         This method prints the structure of the graph.
@@ -60,25 +81,47 @@ class NodeAMR:
     def __len__(self):
         raise NotImplemented
 
-    def export(self):
-        if self.hyperlink is not None:
-            return self.id
-
-        result = "( " + self.id + " / " + self.concept
-        for (relation, entry) in self.link:
-            result += " " + relation + " "
-            if isinstance(entry, NodeAMR):
-                result += entry.export()
+    def iterExport(self):
+        '''
+        @return: generator of the pieces of the export string, in order, so
+            that it can be written out without building it
+        '''
+        for (relation, entry), entering in walk([(None, self)], _links):
+            if entering is False:
+                if isinstance(entry, NodeAMR) and entry.hyperlink is None:
+                    yield " )"
+                continue
+            if relation is not None:
+                yield " " + relation + " "
+            if not isinstance(entry, NodeAMR):
+                yield entry
+            elif entry.hyperlink is not None:
+                yield entry.id
             else:
-                result += entry
-        result += " )"
-        return result
+                yield "( " + entry.id + " / " + entry.concept
+        return
+
+    def export(self):
+        return "".join(self.iterExport())
 
 
-def constructAMRFromStr(string):
+def _links(link):
+    '''
+    @param link: (relation, entry) tuple
+    @return: list, the links of entry, empty for constants and hyperlinks
+    '''
+    entry = link[-1]
+    if isinstance(entry, NodeAMR) and entry.hyperlink is None:
+        return entry.link
+    return []
+
+
+def constructAMRFromStr(string, vocabularies=shared):
     '''
     This method constructs an AMR graph from a string.
     @param string: str, in Penn Treebank format
+    @param vocabularies: natlang.vocabulary.VocabularySet, roles are interned
+        into its internedRoles table. None disables interning.
     @return root: NodeAMR, the root node.
     '''
     elements = string.replace(" / ", "-/-").split("\"")
@@ -90,6 +133,11 @@ def constructAMRFromStr(string):
 
     elements = [i for i in "\"".join(elements).split("\t") if i != ""]
     instances = {}
+    if vocabularies is not None:
+        internRole = vocabularies[internedRoles].intern
+    else:
+        def internRole(role):
+            return role
 
     # Generate Instances
     for i in range(len(elements)):
@@ -104,69 +152,95 @@ def constructAMRFromStr(string):
             newInstance = NodeAMR(hyperlink=instances[elements[i]])
             elements[i] = newInstance
 
-    def constructGraph(elements):
-        result = None
-        i = -1
-        count = 0
-        main = None
-        while i < len(elements) - 1:
-            i += 1
-
-            if isinstance(elements[i], NodeAMR) and\
-                    elements[i].hyperlink is None:
-                main = elements[i]
+    # Build the graph with a stack of the enclosing instances, nested
+    # brackets may be deeper than the recursion limit
+    main = None
+    stack = []
+    for element in elements:
+        if isinstance(element, NodeAMR):
+            if element.hyperlink is not None:
+                main.link[-1] += (element,)
                 continue
-            if isinstance(elements[i], NodeAMR) and\
-                    elements[i].hyperlink is not None:
-                main.link[-1] += (elements[i],)
-                continue
-            if elements[i] == "(":
-                count += 1
-                if count > 1:
-                    length, Node = constructGraph(elements[i:])
-                    main.link[-1] += (Node,)
-                    i += length - 1
-                continue
-            if elements[i] == ")":
-                count -= 1
-                if count == 0:
-                    return i, main
-                continue
-            if elements[i][0] == ":":
-                main.link.append((elements[i], ))
-                continue
-            if elements[i][0] == "\"":
-                main.link[-1] += (elements[i],)
-                continue
-            main.link[-1] += (elements[i],)
-
-    _, root = constructGraph(elements)
-    return root
+            if main is not None:
+                main.link[-1] += (element,)
+            main = element
+            continue
+        if element == "(":
+            stack.append(main)
+            continue
+        if element == ")":
+            parent = stack.pop()
+            if len(stack) == 0:
+                return main
+            main = parent
+            continue
+        if element[0] == ":":
+            main.link.append((internRole(element), ))
+            continue
+        main.link[-1] += (element,)
+    return None
 
 
-def load(fileName, linesToLoad=sys.maxsize, verbose=True):
+def iterload(fileName, linesToLoad=sys.maxsize, verbose=True, skip=0,
+             lazy=False, vocabularies=shared):
+    '''
+    Generator version of load. AMR graphs are yielded one at a time as soon
+    as they are read, so only a single graph is kept in memory.
+    @param linesToLoad: int, the number of graphs to load
+    @param skip: int, the number of graphs to skip before loading
+    @param lazy: bool, yield natlang.lazy.LazySentence objects, which only
+        build their graph when it is accessed.
+    @param vocabularies: VocabularySet, see constructAMRFromStr
+    '''
     fileName = os.path.expanduser(fileName)
-    content = []
     i = 0
-    widgets = [progressbar.Bar('>'), ' ', progressbar.ETA(),
-               progressbar.FormatLabel(
-               '; Total: %(value)d sents (in: %(elapsed)s)')]
-    if verbose is True:
-        loadProgressBar =\
-            progressbar.ProgressBar(widgets=widgets,
-                                    maxval=min(
-                                        sum(1 for line in open(fileName)),
-                                        linesToLoad)).start()
-    for line in open(fileName):
-        i += 1
+    with openFile(fileName) as file:
         if verbose is True:
-            loadProgressBar.update(i)
-        content.append(constructAMRFromStr(line))
-        if i == linesToLoad:
-            break
-    if verbose is True:
-        loadProgressBar.finish()
-    return content
+            loadProgress = ByteProgress(file)
+        for j, line in enumerate(file):
+            if j < skip:
+                continue
+            if i >= linesToLoad:
+                break
+            i += 1
+            if verbose is True:
+                loadProgress.tick()
+            if lazy is True:
+                yield LazySentence(line, constructAMRFromStr,
+                                   (vocabularies,))
+            else:
+                yield constructAMRFromStr(line, vocabularies)
+        if verbose is True:
+            loadProgress.finish()
+    return
+
+
+def loadRange(fileName, start=0, end=None, vocabularies=shared):
+    '''
+    Load the AMR graphs between byte offsets start and end. The offsets have
+    to be aligned to line boundaries (see natlang.parallel.splitFile).
+    '''
+    return [constructAMRFromStr(line, vocabularies)
+            for line in readRange(fileName, start, end)]
+
+
+def load(fileName, linesToLoad=sys.maxsize, verbose=True, workers=1,
+         skip=0, lazy=False, vocabularies=shared):
+    '''
+    @param workers: int, if larger than 1 the file is split into ranges of
+        lines which are parsed by a pool of processes. Only used when the
+        whole file is loaded; no progress bar is shown in this mode.
+    @param skip: int, the number of graphs to skip before loading
+    @param lazy: bool, see iterload
+    @param vocabularies: VocabularySet, see constructAMRFromStr. With
+        workers, roles are interned within each worker process.
+    '''
+    if workers > 1 and linesToLoad == sys.maxsize and skip == 0 and\
+            lazy is False:
+        return loadParallel(loadRange, os.path.expanduser(fileName), workers,
+                            kwargs={"vocabularies": vocabularies})
+    return list(iterload(fileName, linesToLoad=linesToLoad, verbose=verbose,
+                         skip=skip, lazy=lazy, vocabularies=vocabularies))
 
 
 class TestAMR(unittest.TestCase):
@@ -213,6 +287,41 @@ class TestAMR(unittest.TestCase):
             self.assertEqual(str.split(), amr.export().split())
         return
 
+    def testPickle(self):
+        import pickle
+        x = constructAMRFromStr(
+            "( a / and :op1 ( i / international ) :op2 ( m / military ) " +
+            ":op3 ( i ) )")
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps(x, protocol))
+            self.assertEqual(x.export(), restored.export())
+            self.assertEqual("international", restored.link[0][1].concept)
+        return
+
+    def testInterning(self):
+        from natlang.vocabulary import VocabularySet
+        vocabularies = VocabularySet()
+        x = constructAMRFromStr(
+            "( a / and :op1 ( i / international ) :op2 ( m / military ) )",
+            vocabularies)
+        y = constructAMRFromStr("( b / boy :op1 ( g / girl ) )",
+                                vocabularies)
+        self.assertIs(x.link[0][0], y.link[0][0])
+        self.assertEqual([":op1", ":op2"], list(vocabularies[internedRoles]))
+        return
+
+    def testParallelLoadAMRFromFile(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = load(parentdir + "/test/sampleAMR.amr", verbose=False,
+                       workers=3)
+        rawText = list(open(parentdir + "/test/sampleAMR.amr"))
+        self.assertEqual(len(rawText), len(content))
+        for amr, str in zip(content, rawText):
+            self.assertEqual(str.split(), amr.export().split())
+        return
+
 
 if __name__ == '__main__':
     import __main__ as main
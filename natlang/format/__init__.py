@@ -1,11 +1,28 @@
 from __future__ import absolute_import
+import sys
+import importlib
 
-import unittest
-from natlang.format import AMR
-from natlang.format import semanticFrame
-from natlang.format import tree
-from natlang.format import txt
-from natlang.format import txtFiles
-from natlang.format import txtOrTree
-from natlang.format import conll
-from natlang.format import alignment
+# Formats are imported on first access, e.g. natlang.format.conll
+__all__ = [
+    "AMR",
+    "semanticFrame",
+    "tree",
+    "txt",
+    "txtFiles",
+    "txtOrTree",
+    "conll",
+    "alignment",
+]
+
+
+def __getattr__(attr):
+    if attr in __all__:
+        return importlib.import_module("natlang.format." + attr)
+    raise AttributeError(
+        "module 'natlang.format' has no attribute '" + attr + "'")
+
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ is not supported, import everything upfront
+    for _format in __all__:
+        importlib.import_module("natlang.format." + _format)
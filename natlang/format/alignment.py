@@ -7,16 +7,12 @@
 #
 #
 from __future__ import absolute_import
-import io
 import os
 import sys
-__version__ = "0.3a"
-
 
-def load(file, linesToLoad=sys.maxsize):
-    with io.open(os.path.expanduser(file), encoding='utf-8') as f:
-        content = [line.lower().strip().split() for line in f][:linesToLoad]
-    return content
+from natlang.parallel import readRange
+from natlang.reader import openFile
+__version__ = "0.3a"
 
 
 def processAlignmentEntry(entry, listToAddTo, splitChar='-',
@@ -46,16 +42,33 @@ def processAlignmentEntry(entry, listToAddTo, splitChar='-',
     return
 
 
-def load(file, linesToLoad=sys.maxsize):
-    alignment =\
-        [sentence.strip().split() for sentence in
-            list(open(os.path.expanduser(file)))[:linesToLoad]]
+def iterload(file, linesToLoad=sys.maxsize, skip=0):
+    with openFile(file) as f:
+        for i, sentence in enumerate(f):
+            if i < skip:
+                continue
+            if i >= skip + linesToLoad:
+                break
+            result = []
+            for entry in sentence.strip().split():
+                processAlignmentEntry(entry, result, reverse=False)
+            yield result
+    return
+
+
+def load(file, linesToLoad=sys.maxsize, skip=0):
+    return list(iterload(file, linesToLoad=linesToLoad, skip=skip))
+
 
-    for i in range(len(alignment)):
-        entries = alignment[i]
+def loadRange(file, start=0, end=None):
+    '''
+    Load the lines between byte offsets start and end. The offsets have to be
+    aligned to line boundaries (see natlang.parallel.splitFile).
+    '''
+    content = []
+    for sentence in readRange(file, start, end):
         result = []
-        for entry in entries:
+        for entry in sentence.strip().split():
             processAlignmentEntry(entry, result, reverse=False)
-        alignment[i] = result
-
-    return alignment
+        content.append(result)
+    return content
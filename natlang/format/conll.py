@@ -13,9 +13,17 @@ import sys
 import copy
 import inspect
 import unittest
-import progressbar
+from operator import itemgetter
 
 from natlang.exporter import exportToFile
+from natlang.progress import ByteProgress
+from natlang.parallel import loadParallel, readRange
+from natlang.reader import openFile
+from natlang.phrase import Phrase
+from natlang.lazy import LazySentence
+from natlang.vocabulary import shared
+from natlang.traversal import siblings, preorder, inorder, conllInorder,\
+    conllLeft, conllRight, conllChildren
 
 
 defaultEntryIndex = {
@@ -42,6 +50,10 @@ defaultEntryIndex = {
 }
 
 defaultCommentMark = '#'
+# Sentences are separated by blank lines rather than being one per line
+blankLineSeparated = True
+# Closed class columns, interned into natlang.vocabulary.shared by default
+internedColumns = ("UPOS", "XPOS", "FEATS", "DEPREL")
 if sys.version_info[0] < 3:
     # OK this is a tad silly
     _lArrow = u'\u250C'.encode('utf-8')
@@ -55,12 +67,16 @@ else:
     _hArrow = u'\u2500'
 
 
-class Node():
+class Node(object):
     '''
     This is the main data structure of a dependency, a Node instance is a node
     on the tree. The structure of the subtree with node x as root can be viewed
     by calling x.__repr__()
     '''
+    # No per instance __dict__, treebanks have millions of nodes
+    __slots__ = ("value", "phrase", "id", "parent", "deprel", "leftChild",
+                 "rightChild", "sibling", "depth", "format", "rawEntries")
+
     def __init__(self, parent=None):
         self.value = ()
         self.phrase = []
@@ -75,43 +91,62 @@ class Node():
         self.rawEntries = []
         return
 
+    def __getstate__(self):
+        # Required for classes with __slots__ on Python 2. A dict, like the
+        # __dict__ of the former unslotted class, so both load alike.
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        return
+
     def __repr__(self, __spacing=[], __showSibling=False):
         '''
         This method prints the structure of the subtree with self as root.
         '''
-        if self.leftChild is not None:
-            if len(__spacing) != 0 and __spacing[-1] == _lArrow and\
-                    self.parent is not None and self.parent.leftChild == self:
-                self.leftChild.__repr__(__spacing[:-1] + [' ', _lArrow], True)
+        roots = siblings(self) if __showSibling is True else [self]
+        roots = list(roots)
+        # The indentation of each node follows from that of its parent
+        spacing = dict((node, list(__spacing)) for node in roots)
+        for node in preorder(roots, conllChildren):
+            nodeSpacing = spacing[node]
+            if node.leftChild is not None:
+                if len(nodeSpacing) != 0 and nodeSpacing[-1] == _lArrow and\
+                        node.parent is not None and\
+                        node.parent.leftChild == node:
+                    childSpacing = nodeSpacing[:-1] + [' ', _lArrow]
+                else:
+                    childSpacing = nodeSpacing + [_lArrow]
+                for child in siblings(node.leftChild):
+                    spacing[child] = childSpacing
+            if node.rightChild is not None:
+                if len(nodeSpacing) != 0 and nodeSpacing[-1] == _rArrow and\
+                        node.sibling is None:
+                    childSpacing = nodeSpacing[:-1] + [' ', _rArrow]
+                else:
+                    childSpacing = nodeSpacing + [_rArrow]
+                for child in siblings(node.rightChild):
+                    spacing[child] = childSpacing
+
+        for node in inorder(roots, conllLeft, conllRight):
+            nodeSpacing = spacing[node]
+            for i, entry in enumerate(nodeSpacing):
+                if i == 0:
+                    print(' ', end='')
+                if i == len(nodeSpacing) - 1:
+                    print(entry, end='')
+                elif entry != " ":
+                    print(_vArrow + "       ", end='')
+                else:
+                    print("        ", end='')
+
+            if node.parent is None:
+                print("ROOT")
+            elif len(nodeSpacing) == 0:
+                print(node.value[0])
             else:
-                self.leftChild.__repr__(__spacing + [_lArrow], True)
-
-        for i, entry in enumerate(__spacing):
-            if i == 0:
-                print(' ', end='')
-            if i == len(__spacing) - 1:
-                print(entry, end='')
-            elif entry != " ":
-                print(_vArrow + "       ", end='')
-            else:
-                print("        ", end='')
-
-        if self.parent is None:
-            print("ROOT")
-        elif len(__spacing) == 0:
-            print(self.value[0])
-        else:
-            print(_hArrow + self.deprel + _hArrow + self.value[0])
-
-        if self.rightChild is not None:
-            if len(__spacing) != 0 and __spacing[-1] == _rArrow and\
-                    self.sibling is None:
-                self.rightChild.__repr__(__spacing[:-1] + [' ', _rArrow], True)
-            else:
-                self.rightChild.__repr__(__spacing + [_rArrow], True)
-
-        if self.sibling is not None and __showSibling is True:
-            self.sibling.__repr__(__spacing, True)
+                print(_hArrow + node.deprel + _hArrow + node.value[0])
 
         return "\nRepresentation: " +\
             "conll.Node(\"" + str((self.id,) + self.value) + "\")\n" +\
@@ -122,144 +157,354 @@ class Node():
         return len(self.phrase)
 
     def calcPhrase(self, force=False):
-        if self.phrase == [] or force is True:
-            self.phrase = []
-            if self.leftChild is not None:
-                self.phrase += self.leftChild.calcPhrase(force)
-
-            if self.parent is not None:
-                self.phrase += [self]
-
-            if self.rightChild is not None:
-                self.phrase += self.rightChild.calcPhrase(force)
-
-            if self.sibling is not None:
-                self.sibling.calcPhrase(force)
-
-        if self.sibling is not None:
-            return self.phrase + self.sibling.calcPhrase()
-        return self.phrase
-
-    def _exportSubTree(self):
-        content = []
-        if self.leftChild is not None:
-            content += self.leftChild._exportSubTree()
-        # If current node is root then does not output
-        if self.parent is not None:
-            content.append("\t".join(self.rawEntries))
-        if self.rightChild is not None:
-            content += self.rightChild._exportSubTree()
-
-        if self.sibling is not None:
-            content += self.sibling._exportSubTree()
+        '''
+        Compute the phrases of self, its following siblings and all their
+        descendants. Phrases are natlang.phrase.Phrase views into a single
+        in-order list of the nodes, so this takes linear time.
+        @return: Phrase, the nodes of self and its following siblings
+        '''
+        if len(self.phrase) == 0 or force is True:
+            tokens = []
+            self._calcSpans(tokens)
+        end = self.phrase.end
+        tmp = self.sibling
+        while tmp is not None:
+            end = tmp.phrase.end
+            tmp = tmp.sibling
+        return Phrase(self.phrase.tokens, self.phrase.start, end)
+
+    def _calcSpans(self, tokens):
+        nodes = list(conllInorder(self))
+        # In order, the left subtree of a node is complete when it is reached
+        for node in nodes:
+            start = len(tokens)
+            # The root is not part of any phrase
+            if node.parent is not None:
+                tokens.append(node)
+            if node.leftChild is not None:
+                start = node.leftChild.phrase.start
+            node.phrase = Phrase(tokens, start, len(tokens))
+        # In reverse order, its right subtree is
+        for node in reversed(nodes):
+            child = node.rightChild
+            if child is not None:
+                while child.sibling is not None:
+                    child = child.sibling
+                node.phrase.end = child.phrase.end
+        return
 
-        return content
+    def iterExport(self):
+        '''
+        @return: generator of the lines of the export string, in order, so
+            that it can be written out without building it
+        '''
+        for node in conllInorder(self):
+            # If current node is root then does not output
+            if node.parent is not None:
+                yield "\t".join(node.rawEntries) + "\n"
+        return
 
     def export(self):
-        content = self._exportSubTree() + [""]
+        return "".join(self.iterExport())
+
+
+def _corrupt():
+    sys.stderr.write("natlang.format.conll [WARN]: Corrupt data format\n")
+    return None
+
+
+def _projectLines(rawContent, entryIndex, columns):
+    # ID, FORM, HEAD and DEPREL are needed to build the tree. Lines are only
+    # split up to the last column kept, dropped columns are left as "_".
+    keep = set([entryIndex["ID"], entryIndex["FORM"], entryIndex["HEAD"],
+                entryIndex["DEPREL"]])
+    for column in columns:
+        keep.add(entryIndex[column])
+    last = max(keep)
+    width = max([position for name, position in entryIndex.items()
+                 if name != "__name__"]) + 1
+    # Position of each column in the split line, -1 for the "_" appended
+    # to it
+    pick = itemgetter(*[j if j in keep else -1 for j in range(width)])
+    content = []
+    for line in rawContent:
+        fields = line.strip().split('\t', last + 1)
+        if len(fields) <= last:
+            return None
+        fields.append('_')
+        content.append(list(pick(fields)))
+    return content
+
 
-        return "\n".join(content)
+def checkColumns(columns, entryIndex=defaultEntryIndex):
+    '''
+    @raise ValueError: if a column in columns is not in entryIndex
+    '''
+    if columns is None:
+        return
+    for column in columns:
+        if column == "__name__" or column not in entryIndex:
+            raise ValueError(
+                "natlang.format.conll: unknown column " + str(column))
+    return
 
 
-def constructFromText(rawContent, entryIndex=defaultEntryIndex):
-    content = [line.strip().split('\t') for line in rawContent]
+def constructFromText(rawContent, entryIndex=defaultEntryIndex,
+                      columns=None, vocabularies=shared):
+    '''
+    Build the dependency tree of a sentence in O(n).
+    @param rawContent: list of str, the token lines of the sentence
+    @param columns: list of str, names of the columns to keep (see
+        entryIndex). ID, FORM, HEAD and DEPREL are always kept, the other
+        columns are stored and exported as "_". None keeps every column.
+    @param vocabularies: natlang.vocabulary.VocabularySet, the tables the
+        internedColumns are interned into. None disables interning.
+    @return: Node, the root. None if IDs are not 1..n, a HEAD is not
+        another valid ID or the HEADs form a cycle.
+    '''
+    if columns is None:
+        content = [line.strip().split('\t') for line in rawContent]
+    else:
+        content = _projectLines(rawContent, entryIndex, columns)
+        if content is None:
+            return _corrupt()
+    idIndex = entryIndex["ID"]
+    headIndex = entryIndex["HEAD"]
+    deprelIndex = entryIndex["DEPREL"]
+    formIndex = entryIndex["FORM"]
+    length = len(content)
     # adding the root node
-    nodes = [Node()]
+    root = Node()
     if "__name__" in entryIndex:
-        nodes[0].format = entryIndex
-    nodes[0].value = ("-ROOT-", )
+        root.format = entryIndex
+    root.value = ("-ROOT-", )
+    nodes = [root]
+    heads = [0]
+    # Columns stored in node.value after FORM, by number of columns
+    valueIndices = {}
+    interners = []
+    if vocabularies is not None:
+        interners = [(entryIndex[name], vocabularies[name].intern)
+                     for name in internedColumns if name in entryIndex]
 
     for i, line in enumerate(content, start=1):
-        # Check ID for data integrity
-        if int(line[entryIndex["ID"]]) != i:
-            sys.stderr.write(
-                "natlang.format.conll [WARN]: Corrupt data format\n")
-            return None
+        # Check ID and HEAD for data integrity
+        try:
+            if int(line[idIndex]) != i:
+                return _corrupt()
+            head = int(line[headIndex])
+        except (IndexError, ValueError):
+            return _corrupt()
+        if head < 0 or head > length or head == i:
+            return _corrupt()
+
+        width = len(line)
+        if width not in valueIndices:
+            valueIndices[width] = [
+                j for j in range(width)
+                if j not in (idIndex, headIndex, deprelIndex, formIndex)]
+
+        for j, intern in interners:
+            if j < width:
+                line[j] = intern(line[j])
 
         # force the first value in node.value to be FORM
-        # temporarily store parent id in node.parent
         # store everything else in node.value
         newNode = Node()
         newNode.format = entryIndex
         newNode.rawEntries = line
         newNode.id = i
-        newNode.parent = int(line[entryIndex["HEAD"]])
-        newNode.deprel = line[entryIndex["DEPREL"]]
-
-        newNode.value = (line[entryIndex["FORM"]], )
-        for i, item in enumerate(line):
-            if i != entryIndex["ID"] and i != entryIndex["HEAD"] and\
-                    i != entryIndex["DEPREL"] and i != entryIndex["FORM"]:
-                newNode.value += (line[i] if line[i] != '_' else None, )
-
+        newNode.deprel = line[deprelIndex]
+        newNode.value = tuple(
+            [line[formIndex]] +
+            [line[j] if line[j] != '_' else None
+             for j in valueIndices[width]])
         nodes.append(newNode)
-
-    # replace node.parent with real entity.
-    # add sibling, leftChild, rightChild
-    for node in nodes[1:]:
-        node.parent = nodes[node.parent]
-        if node.parent.id > node.id:
-            # leftChild
-            if node.parent.leftChild is None:
-                node.parent.leftChild = node
-                continue
-            tmp = node.parent.leftChild
-            while tmp.sibling is not None:
-                tmp = tmp.sibling
-            tmp.sibling = node
+        heads.append(head)
+
+    # set node.parent, add sibling, leftChild, rightChild. Nodes are visited
+    # in ID order, so appending to the tail of the sibling chains keeps them
+    # sorted.
+    leftTail = [None] * (length + 1)
+    rightTail = [None] * (length + 1)
+    for i in range(1, length + 1):
+        node = nodes[i]
+        head = heads[i]
+        parent = nodes[head]
+        node.parent = parent
+        if head > i:
+            if leftTail[head] is None:
+                parent.leftChild = node
+            else:
+                leftTail[head].sibling = node
+            leftTail[head] = node
         else:
-            # rightChild
-            if node.parent.rightChild is None:
-                node.parent.rightChild = node
-                continue
-            tmp = node.parent.rightChild
-            while tmp.sibling is not None:
-                tmp = tmp.sibling
-            tmp.sibling = node
-    nodes[0].calcPhrase(force=True)
-    return nodes[0]
+            if rightTail[head] is None:
+                parent.rightChild = node
+            else:
+                rightTail[head].sibling = node
+            rightTail[head] = node
+    root.calcPhrase(force=True)
+    # Tokens on a HEAD cycle, e.g. 1 -> 2 -> 1, are not reachable from root
+    if len(root.phrase) != length:
+        return _corrupt()
+    return root
 
 
-def load(fileName,
-         linesToLoad=sys.maxsize,
-         entryIndex=defaultEntryIndex, commentMark=defaultCommentMark,
-         verbose=True):
+def parseComments(comments, commentMark=defaultCommentMark):
+    '''
+    @param comments: list of str, the comment lines of a sentence
+    @return: dict, "key = value" comments (e.g. sent_id, text) as key: value
+    '''
+    metadata = {}
+    for comment in comments:
+        key, sep, value = comment.lstrip(commentMark).partition("=")
+        if sep != "":
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def iterEntries(fileName,
+                linesToLoad=sys.maxsize, commentMark=defaultCommentMark,
+                verbose=True, skip=0, comments=False):
+    '''
+    Generator of the raw sentences of a file, each a list of stripped token
+    lines. Sentences are separated by blank lines, comment lines belong to
+    the sentence that follows them. Skipped sentences are never stored.
+    @param linesToLoad: int, the number of sentences to load
+    @param skip: int, the number of sentences to skip before loading
+    @param comments: bool, yield (comment lines, token lines) tuples instead
+    '''
     fileName = os.path.expanduser(fileName)
-    content = []
-    widgets = [progressbar.Bar('>'), ' ', progressbar.ETA(),
-               progressbar.FormatLabel(
-               '; Total: %(value)d lines (in: %(elapsed)s)')]
-    if verbose is True:
-        loadProgressBar =\
-            progressbar.ProgressBar(widgets=widgets,
-                                    maxval=min(
-                                        sum(1 for line in open(fileName)),
-                                        linesToLoad)).start()
-    i = 0
+    sentence = 0
     entry = []
-    with open(fileName) as file:
+    commentLines = []
+    with openFile(fileName) as file:
+        if verbose is True:
+            loadProgress = ByteProgress(file)
         for rawLine in file:
-            i += 1
-            if verbose is True:
-                loadProgressBar.update(i)
+            if sentence >= skip + linesToLoad:
+                break
             line = rawLine.strip()
 
-            if line != "" and line[0] != commentMark:
-                entry.append(line)
+            if line != "":
+                if sentence < skip:
+                    continue
+                if line[0] != commentMark:
+                    entry.append(line)
+                elif comments is True:
+                    commentLines.append(line)
             else:
-                content.append(constructFromText(entry))
+                if sentence >= skip:
+                    if verbose is True:
+                        loadProgress.tick()
+                    yield (commentLines, entry) if comments is True else entry
+                sentence += 1
                 entry = []
-                if i >= linesToLoad:
-                    break
+                commentLines = []
 
-    if len(entry) > 0:
-        content.append(constructFromText(entry))
+        if len(entry) > 0:
+            if verbose is True:
+                loadProgress.tick()
+            yield (commentLines, entry) if comments is True else entry
+
+        if verbose is True:
+            loadProgress.finish()
+    return
 
-    if verbose is True:
-        loadProgressBar.finish()
+
+def iterload(fileName,
+             linesToLoad=sys.maxsize,
+             entryIndex=defaultEntryIndex, commentMark=defaultCommentMark,
+             verbose=True, skip=0, lazy=False, columns=None,
+             vocabularies=shared):
+    '''
+    Generator version of load. Sentences are yielded one at a time as soon as
+    they are read, so only a single sentence is kept in memory.
+    @param linesToLoad: int, the number of sentences to load
+    @param skip: int, the number of sentences to skip before loading
+    @param lazy: bool, yield natlang.lazy.LazySentence objects, which only
+        build their tree when it is accessed. Their metadata holds the
+        "key = value" comments of the sentence, e.g. sent_id.
+    @param columns: list of str, the columns to keep, see constructFromText.
+        None keeps every column, so that export reproduces the file.
+    @param vocabularies: VocabularySet, see constructFromText
+    '''
+    checkColumns(columns, entryIndex)
+    if lazy is True:
+        for comments, entry in iterEntries(fileName, linesToLoad,
+                                           commentMark, verbose, skip,
+                                           comments=True):
+            yield LazySentence(entry, constructFromText,
+                               (entryIndex, columns, vocabularies),
+                               len(entry),
+                               parseComments(comments, commentMark))
+        return
+    for entry in iterEntries(fileName, linesToLoad, commentMark, verbose,
+                             skip):
+        yield constructFromText(entry, entryIndex, columns, vocabularies)
+    return
+
+
+def loadRange(fileName, start=0, end=None,
+              entryIndex=defaultEntryIndex, commentMark=defaultCommentMark,
+              columns=None, vocabularies=shared):
+    '''
+    Load the sentences between byte offsets start and end. The offsets have
+    to be aligned to sentence boundaries (see natlang.parallel.splitFile).
+    '''
+    content = []
+    entry = []
+    for rawLine in readRange(fileName, start, end):
+        line = rawLine.strip()
+        if line == "":
+            content.append(constructFromText(entry, entryIndex, columns,
+                                             vocabularies))
+            entry = []
+        elif line[0] != commentMark:
+            entry.append(line)
+    if len(entry) > 0:
+        content.append(constructFromText(entry, entryIndex, columns,
+                                         vocabularies))
     return content
 
 
+def load(fileName,
+         linesToLoad=sys.maxsize,
+         entryIndex=defaultEntryIndex, commentMark=defaultCommentMark,
+         verbose=True, workers=1, skip=0, lazy=False, columns=None,
+         vocabularies=shared):
+    '''
+    @param linesToLoad: int, the number of sentences to load
+    @param workers: int, if larger than 1 the file is split at blank lines
+        and the parts are parsed by a pool of processes. Only used when the
+        whole file is loaded; no progress bar is shown in this mode.
+    @param skip: int, the number of sentences to skip before loading
+    @param lazy: bool, see iterload
+    @param columns: list of str, see iterload
+    @param vocabularies: VocabularySet, see constructFromText. With workers,
+        labels are interned within each worker process.
+    '''
+    checkColumns(columns, entryIndex)
+    if workers > 1 and linesToLoad == sys.maxsize and skip == 0 and\
+            lazy is False:
+        return loadParallel(loadRange, os.path.expanduser(fileName), workers,
+                            blankLine=True,
+                            kwargs={"entryIndex": entryIndex,
+                                    "commentMark": commentMark,
+                                    "columns": columns,
+                                    "vocabularies": vocabularies})
+    return list(iterload(fileName,
+                         linesToLoad=linesToLoad,
+                         entryIndex=entryIndex,
+                         commentMark=commentMark,
+                         verbose=verbose,
+                         skip=skip,
+                         lazy=lazy,
+                         columns=columns,
+                         vocabularies=vocabularies))
+
+
 class TestTree(unittest.TestCase):
     def testBuildTreeA(self, x=None):
         rawLine = [
@@ -339,6 +584,91 @@ class TestTree(unittest.TestCase):
             [n.value[0] for n in x.rightChild.rightChild.sibling.phrase])
         return
 
+    def testPhraseSpans(self):
+        # Flat sentence, every token is a dependent of the last one
+        length = 500
+        rawLine = ["\t".join([str(i), "w" + str(i), "_", "X", "_", "_",
+                              str(0 if i == length else length), "dep",
+                              "_", "_"])
+                   for i in range(1, length + 1)]
+        x = constructFromText(rawLine)
+        self.assertEqual(length, len(x))
+        head = x.rightChild
+        self.assertEqual(length, len(head.phrase))
+        self.assertEqual(1, len(head.leftChild.phrase))
+        self.assertIs(head.phrase.tokens, head.leftChild.phrase.tokens)
+        self.assertEqual([str(i) for i in range(1, length + 1)],
+                         [n.rawEntries[0] for n in x.phrase])
+        return
+
+    def testCorruptSentence(self):
+        import six
+        valid = ["1\tA\t_\tX\t_\t_\t0\troot\t_\t_",
+                 "2\tB\t_\tX\t_\t_\t1\tdep\t_\t_"]
+        self.assertEqual(2, len(constructFromText(valid)))
+        stderr, sys.stderr = sys.stderr, six.StringIO()
+        try:
+            for i, head in ((0, "5"), (0, "-1"), (1, "2"), (1, "x")):
+                line = valid[i].split("\t")
+                line[6] = head
+                rawLine = list(valid)
+                rawLine[i] = "\t".join(line)
+                self.assertEqual(None, constructFromText(rawLine))
+            self.assertEqual(None, constructFromText(valid[1:]))
+            self.assertEqual(None, constructFromText([valid[0], "2\tB"]))
+            cycle = ["1\tA\t_\tX\t_\t_\t2\tdep\t_\t_",
+                     "2\tB\t_\tX\t_\t_\t1\tdep\t_\t_",
+                     "3\tC\t_\tX\t_\t_\t0\troot\t_\t_"]
+            self.assertEqual(None, constructFromText(cycle))
+        finally:
+            sys.stderr = stderr
+        return
+
+    def testColumnProjection(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        fileName = parentdir + "/test/sampleCoNLLU.conll"
+        content = load(fileName, verbose=False)
+        projected = load(fileName, verbose=False, columns=["UPOS"])
+        self.testBuildTreeA(projected[0])
+        self.testBuildTreeB(projected[1])
+        node = projected[0].rightChild
+        self.assertEqual(("comes", None, "VERB", None, None, None, None),
+                         node.value)
+        self.assertEqual(content[0].rightChild.value[:3:2], node.value[:3:2])
+        self.assertEqual("4\tcomes\t_\tVERB\t_\t_\t0\troot\t_\t_",
+                         "\t".join(node.rawEntries))
+        self.assertEqual(
+            [x.export() for x in projected],
+            [x.export() for x in load(fileName, verbose=False, workers=2,
+                                      columns=["UPOS"])])
+        self.assertRaises(ValueError, load, fileName, verbose=False,
+                          columns=["POS"])
+        return
+
+    def testInterning(self):
+        from natlang.vocabulary import VocabularySet
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        fileName = parentdir + "/test/sampleCoNLLU.conll"
+        vocabularies = VocabularySet()
+        content = load(fileName, verbose=False, vocabularies=vocabularies)
+        nouns = [n.rawEntries[3] for x in content for n in x.phrase
+                 if n.rawEntries[3] == "NOUN"]
+        self.assertTrue(len(nouns) > 1)
+        self.assertTrue(all(noun is nouns[0] for noun in nouns))
+        self.assertIs(content[0].phrase[0].deprel,
+                      vocabularies["DEPREL"].intern("case"))
+        self.assertIn("det", vocabularies["DEPREL"])
+        self.assertEqual(0, vocabularies["UPOS"].get("ADP"))
+        self.assertEqual(
+            [x.export() for x in content],
+            [x.export() for x in load(fileName, verbose=False,
+                                      vocabularies=None)])
+        return
+
     def testLoader(self):
         currentdir = os.path.dirname(
             os.path.abspath(inspect.getfile(inspect.currentframe())))
@@ -349,17 +679,78 @@ class TestTree(unittest.TestCase):
         self.testBuildTreeA(A)
         self.testBuildTreeB(B)
 
+    def testPickle(self):
+        import pickle
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = load(parentdir + "/test/sampleCoNLLU.conll", verbose=False)
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps(content, protocol))
+            self.assertEqual([x.export() for x in content],
+                             [x.export() for x in restored])
+            self.testBuildTreeA(restored[0])
+            self.testBuildTreeB(restored[1])
+        return
+
     def testExporter(self):
+        import shutil
+        import tempfile
         currentdir = os.path.dirname(
             os.path.abspath(inspect.getfile(inspect.currentframe())))
         parentdir = os.path.dirname(currentdir)
         content = load(parentdir + "/test/sampleCoNLLU.conll", verbose=False)
-        exportToFile(content, parentdir + "/test/.sampleCoNLLU.conll.tmp")
-        exportedContent = load(
-            parentdir + "/test/.sampleCoNLLU.conll.tmp", verbose=False)
+        tmpdir = tempfile.mkdtemp()
+        try:
+            exportToFile(content, tmpdir + "/sampleCoNLLU.conll")
+            exportedContent = load(tmpdir + "/sampleCoNLLU.conll",
+                                   verbose=False)
+        finally:
+            shutil.rmtree(tmpdir)
         self.testBuildTreeA(exportedContent[0])
         self.testBuildTreeB(exportedContent[1])
 
+    def testParallelLoader(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = load(parentdir + "/test/sampleCoNLLU.conll", verbose=False,
+                       workers=2)
+        self.assertEqual(3, len(content))
+        self.testBuildTreeA(content[0])
+        self.testBuildTreeB(content[1])
+        self.assertEqual(
+            load(parentdir + "/test/sampleCoNLLU.conll",
+                 verbose=False)[2].export(),
+            content[2].export())
+
+    def testLoaderWindow(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        fileName = parentdir + "/test/sampleCoNLLU.conll"
+        content = load(fileName, verbose=False)
+        self.assertEqual(1, len(load(fileName, linesToLoad=1,
+                                     verbose=False)))
+        window = load(fileName, linesToLoad=1, skip=1, verbose=False)
+        self.assertEqual(1, len(window))
+        self.testBuildTreeB(window[0])
+        window = load(fileName, skip=1, verbose=False)
+        self.assertEqual([x.export() for x in content[1:]],
+                         [x.export() for x in window])
+        self.assertEqual([], load(fileName, skip=3, verbose=False))
+        return
+
+    def testIterLoader(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = iterload(parentdir + "/test/sampleCoNLLU.conll",
+                           verbose=False)
+        self.assertFalse(isinstance(content, list))
+        self.testBuildTreeA(next(content))
+        self.testBuildTreeB(next(content))
+
 
 if __name__ == '__main__':
     if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
@@ -12,23 +12,14 @@ import sys
 import unittest
 import glob
 from xml.dom import minidom
+from natlang.reader import openFile
 __version__ = "0.3a"
 
 
-def load(filename, linesToLoad=sys.maxsize):
-    if filename[-4:] == ".xml":
-        content += loadSemFrameXML(filename)
-    else:
-        content += loadAMRFrame(filename, linesToLoad=linesToLoad)
-    return content
-
-
-def loadAMRFrame(filename, linesToLoad=sys.maxsize):
+def iterloadAMRFrame(filename, linesToLoad=sys.maxsize, skip=0):
     """
-    Loader for AMR2.0 frames file: propbank-frame-arg-descr.txt
+    Generator version of loadAMRFrame, frames are yielded one at a time.
     """
-    content = list(open(os.path.expanduser(filename)))[:linesToLoad]
-
     def splitEntry(line):
         raw = line.strip().split()
         result = [raw[0]]
@@ -49,20 +40,33 @@ def loadAMRFrame(filename, linesToLoad=sys.maxsize):
             raise
         return result
 
-    content = [splitEntry(entry) for entry in content]
-    return content
+    with openFile(filename) as f:
+        for i, entry in enumerate(f):
+            if i < skip:
+                continue
+            if i >= skip + linesToLoad:
+                break
+            yield splitEntry(entry)
+    return
+
+
+def loadAMRFrame(filename, linesToLoad=sys.maxsize, skip=0):
+    """
+    Loader for AMR2.0 frames file: propbank-frame-arg-descr.txt
+    """
+    return list(iterloadAMRFrame(filename, linesToLoad=linesToLoad,
+                                 skip=skip))
 
 
-def loadSemFrameXML(filename, linesToLoad=sys.maxsize):
+def loadSemFrameXML(filename, linesToLoad=sys.maxsize, skip=0):
     """
     Loader for CoNLL-2008 frames file: *.xml
+    linesToLoad and skip count rolesets. The whole document is still parsed.
     """
     content = []
-    if linesToLoad != sys.maxsize:
-        sys.stderr.write(
-            "loader.loadSemFrameXML [WARN]: linesToLoad option ignored\n")
 
-    xmldoc = minidom.parse(os.path.expanduser(filename))
+    with openFile(filename, 'rb') as f:
+        xmldoc = minidom.parse(f)
     items = xmldoc.getElementsByTagName('roleset')
     for item in items:
         frame = str(item.attributes['id'].value)
@@ -72,13 +76,21 @@ def loadSemFrameXML(filename, linesToLoad=sys.maxsize):
             args[str("ARG" + role.attributes['n'].value)] =\
                 str(role.attributes['descr'].value)
         content.append((frame, args))
-    return content
+    return content[skip:skip + linesToLoad]
 
 
-def load(filename, linesToLoad=sys.maxsize):
-    content = []
+def iterload(filename, linesToLoad=sys.maxsize, skip=0):
     if filename[-4:] == ".xml":
-        content += loadSemFrameXML(filename, linesToLoad=linesToLoad)
+        # minidom needs the whole document, so xml frames cannot be streamed
+        for entry in loadSemFrameXML(filename, linesToLoad=linesToLoad,
+                                     skip=skip):
+            yield entry
     else:
-        content += loadAMRFrame(filename, linesToLoad=linesToLoad)
-    return content
+        for entry in iterloadAMRFrame(filename, linesToLoad=linesToLoad,
+                                      skip=skip):
+            yield entry
+    return
+
+
+def load(filename, linesToLoad=sys.maxsize, skip=0):
+    return list(iterload(filename, linesToLoad=linesToLoad, skip=skip))
@@ -16,13 +16,29 @@ import unittest
 import inspect
 from copy import deepcopy
 
+from natlang.parallel import loadParallel, readRange
+from natlang.progress import ByteProgress
+from natlang.phrase import Phrase
+from natlang.reader import openFile
+from natlang.lazy import LazySentence, leafCount
+from natlang.vocabulary import shared
+from natlang.traversal import siblings, siblingList, walk, treeChildren,\
+    treePreorder
 
-class Node:
+# Name of the vocabulary table of constituent labels and POS tags
+internedLabels = "LABEL"
+
+
+class Node(object):
     '''
     This is the main data structure of a tree, a Node instance is a node on the
     tree. The structure of the subtree with node x as root can be viewed by
     calling x.onScreen()
     '''
+    # No per instance __dict__, treebanks have millions of nodes
+    __slots__ = ("value", "phrase", "id", "parent", "sibling", "child",
+                 "depth")
+
     def __init__(self, parent=None):
         self.value = ()
         self.phrase = []
@@ -33,35 +49,63 @@ class Node:
         self.depth = -1
         return
 
+    def __getstate__(self):
+        # Same state as conll.Node, see there
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        return
+
     def onScreen(self, __spacing="", __showSibling=False):
         '''
         This method prints the structure of the subtree with self as root.
         '''
-        if self.child is not None:
-            print(__spacing + str((self.id,) + self.value)[:-1])
-            self.child.onScreen(__spacing + "  ", True)
-            print(__spacing + ")")
-        else:
-            print(__spacing + str((self.id,) + self.value))
-        if self.sibling is not None and __showSibling is True:
-            self.sibling.onScreen(__spacing, True)
+        roots = siblings(self) if __showSibling is True else [self]
+        depth = 0
+        for node, entering in walk(roots, treeChildren):
+            if node.child is None:
+                if entering is True:
+                    print(__spacing + "  " * depth + str((node.id,) +
+                                                         node.value))
+                continue
+            if entering is True:
+                print(__spacing + "  " * depth +
+                      str((node.id,) + node.value)[:-1])
+                depth += 1
+            else:
+                depth -= 1
+                print(__spacing + "  " * depth + ")")
         return
 
     def __iter__(self):
-        return iter([w for t, w in self.phrase])
+        return (w for t, w in self.phrase)
 
     def __len__(self):
         return len(self.phrase)
 
+    def iterExport(self):
+        '''
+        @return: generator of the pieces of the export string, in order, so
+            that it can be written out without building it
+        '''
+        top = self.parent
+        for node in treePreorder(self):
+            if node.child is not None:
+                yield "(" + str(node.value[0]) + " "
+                continue
+            yield "(" + str(node.value[0]) + " " + str(node.value[1]) + ")"
+            # Close the phrases ending with this leaf
+            while node.sibling is None and node.parent is not top:
+                node = node.parent
+                yield ")"
+            if node.sibling is not None:
+                yield " "
+        return
+
     def export(self):
-        result = "("
-        if self.child is None:
-            result += str(self.value[0]) + " " + str(self.value[1]) + ")"
-        else:
-            result += str(self.value[0]) + " " + self.child.export() + ")"
-        if self.sibling is not None:
-            result += " " + self.sibling.export()
-        return result
+        return "".join(self.iterExport())
 
     def refresh(self):
         '''
@@ -104,22 +148,33 @@ class Node:
         return
 
     def calcPhrase(self, force=False):
-        if self.phrase == [] or self.depth <= 0 or force is True:
-            self.phrase = []
-            self.depth = 1
-            if self.child is not None:
-                self.child.calcPhrase(force)
-                self.depth = max(self.depth, self.child.depth + 1)
-            if self.sibling is not None:
-                self.sibling.calcPhrase(force)
-                self.depth = max(self.depth, self.sibling.depth)
-        if self.child is None:
-            self.phrase = [self.value]
-        else:
-            tmp = self.child
-            while tmp is not None:
-                self.phrase += tmp.phrase
-                tmp = tmp.sibling
+        '''
+        Compute the phrases and depths of self, its following siblings and all
+        their descendants. Phrases are natlang.phrase.Phrase views into a
+        single list of the leaf values, so this takes linear time.
+        '''
+        if len(self.phrase) == 0 or self.depth <= 0 or force is True:
+            tokens = []
+            self._calcSpans(tokens)
+        return
+
+    def _calcSpans(self, tokens):
+        top = self.parent
+        for node in treePreorder(self):
+            start = len(tokens)
+            if node.child is not None:
+                node.phrase = Phrase(tokens, start, start)
+                continue
+            tokens.append(node.value)
+            node.phrase = Phrase(tokens, start, start + 1)
+            node.depth = 1
+            # Close the phrases ending with this leaf
+            while node.sibling is None and node.parent is not top:
+                node = node.parent
+                node.phrase.end = len(tokens)
+                _propagateDepth(node.child)
+                node.depth = node.child.depth + 1
+        _propagateDepth(self)
         return
 
     def columnFormat(self, parColumn=None, sibColumn=None,
@@ -138,87 +193,106 @@ class Node:
             valColumn = []
             hasChild = []
             hasSibl = []
-        while len(parColumn) <= self.id:
-            parColumn.append(0)
-            sibColumn.append(0)
-            hasChild.append(0)
-            hasSibl.append(0)
-            valColumn.append(("NULL",))
-        valColumn[self.id] = self.value
-
-        if self.parent is not None:
-            parColumn[self.id] = self.parent.id
-            if self.parent.child != self:
-                sibColumn[self.id] = self.id - 1
-            else:
-                if LM is True:
-                    sibColumn[self.id] = sibColumn[self.parent.id]
-
-        if self.child is not None:
-            hasChild[self.id] = 1
-            self.child.columnFormat(
-                parColumn, sibColumn, valColumn, hasChild, hasSibl, LM)
-        if self.sibling is not None:
-            hasSibl[self.id] = 1
-            self.sibling.columnFormat(
-                parColumn, sibColumn, valColumn, hasChild, hasSibl, LM)
+        for node in treePreorder(self):
+            while len(parColumn) <= node.id:
+                parColumn.append(0)
+                sibColumn.append(0)
+                hasChild.append(0)
+                hasSibl.append(0)
+                valColumn.append(("NULL",))
+            valColumn[node.id] = node.value
+
+            if node.parent is not None:
+                parColumn[node.id] = node.parent.id
+                if node.parent.child != node:
+                    sibColumn[node.id] = node.id - 1
+                else:
+                    if LM is True:
+                        sibColumn[node.id] = sibColumn[node.parent.id]
+
+            if node.child is not None:
+                hasChild[node.id] = 1
+            if node.sibling is not None:
+                hasSibl[node.id] = 1
         return parColumn, sibColumn, valColumn, hasChild, hasSibl
 
     def columnFormatWordIndex(self, column=None, start=0):
         if column is None:
             column = []
-        while len(column) <= self.id:
-            column.append(0)
-        column[self.id] = start
-        if self.child is not None:
-            self.child.columnFormatWordIndex(column, start=start)
-        if self.sibling is not None:
-            self.sibling.columnFormatWordIndex(column, start=start + len(self))
+        starts = {}
+        for node in siblings(self):
+            starts[node] = start
+            start += len(node)
+        for node in treePreorder(self):
+            while len(column) <= node.id:
+                column.append(0)
+            column[node.id] = starts[node]
+            start = starts[node]
+            for child in siblings(node.child):
+                starts[child] = start
+                start += len(child)
         return column
 
 
-def constructTreeFromStr(string, rootLabel="ROOT"):
+def _propagateDepth(node):
+    '''
+    The depth of a node also covers its following siblings.
+    '''
+    chain = siblingList(node)
+    for i in range(len(chain) - 2, -1, -1):
+        chain[i].depth = max(chain[i].depth, chain[i + 1].depth)
+    return
+
+
+def constructTreeFromStr(string, rootLabel="ROOT", vocabularies=shared):
     '''
     This method constructs a tree from a string.
     @param string: str, in Penn Treebank format
+    @param vocabularies: natlang.vocabulary.VocabularySet, see constructTree
     @return root: Node, the root node.
     '''
     if string.strip() == "(())":
         return None
     newString = string.replace("(", " ( ").replace(")", " ) ")
     try:
-        return constructTree(newString.split(), rootLabel)
+        return constructTree(newString.split(), rootLabel, vocabularies)
     except AttributeError as e:
         return None
 
 
-def constructTree(elements, rootLabel="ROOT"):
+def constructTree(elements, rootLabel="ROOT", vocabularies=shared):
     '''
     This method constructs a tree from a list of elements. Each bracket is
     considered an independent element.
     @param elements: list of str, in Penn Treebank format
+    @param vocabularies: natlang.vocabulary.VocabularySet, constituent labels
+        and POS tags are interned into its internedLabels table. None
+        disables interning.
     @return root: Node, the root node.
     '''
     root = None
     currentParent = None
     current = None
+    # Last child of each open node, so that appending a sibling is O(1)
+    lastChild = []
     for element in elements:
         if element == "(":
             currentParent = current
             current = Node(parent=currentParent)
             if currentParent is not None:
-                if currentParent.child is not None:
-                    tmp = currentParent.child
-                    while tmp.sibling is not None:
-                        tmp = tmp.sibling
-                    tmp.sibling = current
+                if lastChild[-1] is not None:
+                    lastChild[-1].sibling = current
                 else:
                     currentParent.child = current
+                lastChild[-1] = current
             else:
                 root = current
+                lastChild = []
+            lastChild.append(None)
 
         elif element == ")":
             current = current.parent
+            lastChild.pop()
             if current is not None:
                 currentParent = current.parent
         else:
@@ -227,12 +301,30 @@ def constructTree(elements, rootLabel="ROOT"):
         if root.value == ():
             root.value = (rootLabel,)
         try:
-            root.refresh()
+            root.calcId(1)
         except RuntimeError:
             return None
+        if vocabularies is not None:
+            # After calcId, which strips function tags from labels
+            _internLabels(root, vocabularies[internedLabels].intern)
+        root.calcPhrase(force=True)
     return root
 
 
+def _internLabels(root, intern):
+    stack = [root]
+    while len(stack) != 0:
+        node = stack.pop()
+        label = intern(node.value[0])
+        if label is not node.value[0]:
+            node.value = (label,) + node.value[1:]
+        if node.sibling is not None:
+            stack.append(node.sibling)
+        if node.child is not None:
+            stack.append(node.child)
+    return
+
+
 def constructTreeFromRNNGAction(actions):
     root = None
     current = root
@@ -276,33 +368,68 @@ def constructTreeFromRNNGAction(actions):
     return root
 
 
-def load(fileName, linesToLoad=sys.maxsize, verbose=True):
-    import progressbar
+def iterload(fileName, linesToLoad=sys.maxsize, verbose=True, skip=0,
+             lazy=False, vocabularies=shared):
+    '''
+    Generator version of load. Trees are yielded one at a time as soon as
+    they are read, so only a single tree is kept in memory.
+    @param linesToLoad: int, the number of trees to load
+    @param skip: int, the number of trees to skip before loading
+    @param lazy: bool, yield natlang.lazy.LazySentence objects, which only
+        build their tree when it is accessed.
+    @param vocabularies: VocabularySet, see constructTree
+    '''
     fileName = os.path.expanduser(fileName)
-    content = []
     i = 0
-    widgets = [progressbar.Bar('>'), ' ', progressbar.ETA(),
-               progressbar.FormatLabel(
-               '; Total: %(value)d sents (in: %(elapsed)s)')]
-    with open(fileName) as file:
+    with openFile(fileName) as file:
         if verbose is True:
-            loadProgressBar =\
-                progressbar.ProgressBar(widgets=widgets,
-                                        maxval=min(
-                                            sum(1 for line in file),
-                                            linesToLoad)).start()
-            file.seek(0)
-        for line in file:
+            loadProgress = ByteProgress(file)
+        for j, line in enumerate(file):
+            if j < skip:
+                continue
+            if i >= linesToLoad:
+                break
             i += 1
             if verbose is True:
-                loadProgressBar.update(i)
-            content.append(constructTreeFromStr(line))
-            if i == linesToLoad:
-                break
+                loadProgress.tick()
+            if lazy is True:
+                yield LazySentence(line, constructTreeFromStr,
+                                   ("ROOT", vocabularies),
+                                   length=leafCount(line))
+            else:
+                yield constructTreeFromStr(line, vocabularies=vocabularies)
+
+        if verbose is True:
+            loadProgress.finish()
+    return
+
+
+def loadRange(fileName, start=0, end=None, vocabularies=shared):
+    '''
+    Load the trees between byte offsets start and end. The offsets have to be
+    aligned to line boundaries (see natlang.parallel.splitFile).
+    '''
+    return [constructTreeFromStr(line, vocabularies=vocabularies)
+            for line in readRange(fileName, start, end)]
+
 
-    if verbose is True:
-        loadProgressBar.finish()
-    return content
+def load(fileName, linesToLoad=sys.maxsize, verbose=True, workers=1,
+         skip=0, lazy=False, vocabularies=shared):
+    '''
+    @param workers: int, if larger than 1 the file is split into ranges of
+        lines which are parsed by a pool of processes. Only used when the
+        whole file is loaded; no progress bar is shown in this mode.
+    @param skip: int, the number of trees to skip before loading
+    @param lazy: bool, see iterload
+    @param vocabularies: VocabularySet, see constructTree. With workers,
+        labels are interned within each worker process.
+    '''
+    if workers > 1 and linesToLoad == sys.maxsize and skip == 0 and\
+            lazy is False:
+        return loadParallel(loadRange, os.path.expanduser(fileName), workers,
+                            kwargs={"vocabularies": vocabularies})
+    return list(iterload(fileName, linesToLoad=linesToLoad, verbose=verbose,
+                         skip=skip, lazy=lazy, vocabularies=vocabularies))
 
 
 def lexicaliseNode(root, wLex, tLex=None, lLex=None):
@@ -347,15 +474,16 @@ def lexicaliseNode(root, wLex, tLex=None, lLex=None):
 
 
 def constructRNNGAction(root):
+    top = root.parent
     result = []
-    if root.child is None:
-        result += [("GEN", root.value[1])]
-    else:
-        result += [("NT", root.value[0])]
-        result += constructRNNGAction(root.child)
-        result += [("REDUCE",)]
-    if root.sibling is not None:
-        result += constructRNNGAction(root.sibling)
+    for node in treePreorder(root):
+        if node.child is not None:
+            result.append(("NT", node.value[0]))
+            continue
+        result.append(("GEN", node.value[1]))
+        while node.sibling is None and node.parent is not top:
+            node = node.parent
+            result.append(("REDUCE",))
     return result
 
 
@@ -412,6 +540,58 @@ class TestTree(unittest.TestCase):
         self.testBuildTreeB(B)
         return
 
+    def testPickle(self):
+        import pickle
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = load(parentdir + "/test/sampleTree.txt", verbose=False)
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps(content, protocol))
+            self.assertEqual(
+                [x.export() if x is not None else None for x in content],
+                [x.export() if x is not None else None for x in restored])
+            self.testBuildTreeA(restored[0])
+            self.testBuildTreeB(restored[1])
+        return
+
+    def testIterLoadTreeFromFile(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = iterload(parentdir + "/test/sampleTree.txt", verbose=False)
+        self.assertFalse(isinstance(content, list))
+        self.testBuildTreeA(next(content))
+        self.testBuildTreeB(next(content))
+        return
+
+    def testInterning(self):
+        from natlang.vocabulary import VocabularySet
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        vocabularies = VocabularySet()
+        content = load(parentdir + "/test/sampleTree.txt", verbose=False,
+                       vocabularies=vocabularies)
+        labels = [t for x in content if x is not None for t, w in x.phrase]
+        self.assertTrue(len(labels) > len(set(labels)))
+        for label in labels:
+            self.assertIs(vocabularies[internedLabels].intern(label), label)
+        self.assertIn("ROOT", vocabularies[internedLabels])
+        return
+
+    def testParallelLoadTreeFromFile(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        content = load(parentdir + "/test/sampleTree.txt", verbose=False,
+                       workers=2)
+        self.assertEqual(3, len(content))
+        self.testBuildTreeA(content[0])
+        self.testBuildTreeB(content[1])
+        self.assertEqual(None, content[2])
+        return
+
     def testLoadTreeFromLoader(self):
         from natlang.loader import DataLoader
         currentdir = os.path.dirname(
@@ -7,13 +7,67 @@
 #
 #
 from __future__ import absolute_import
-import io
 import os
 import sys
+import six
+import unittest
+
+from natlang.parallel import readRange
+from natlang.reader import openFile
 __version__ = "0.3a"
 
 
-def load(file, linesToLoad=sys.maxsize):
-    with io.open(os.path.expanduser(file), encoding='utf-8') as f:
-        content = [line.lower().strip().split() for line in f][:linesToLoad]
-    return content
+def _decode(line):
+    # openFile and readRange give native str, which is bytes on Python 2.
+    # Text is loaded as unicode on both versions.
+    if six.PY2:
+        return line.decode('utf-8')
+    return line
+
+
+def iterload(file, linesToLoad=sys.maxsize, skip=0):
+    with openFile(file) as f:
+        for i, line in enumerate(f):
+            if i < skip:
+                continue
+            if i >= skip + linesToLoad:
+                break
+            yield _decode(line).lower().strip().split()
+    return
+
+
+def load(file, linesToLoad=sys.maxsize, skip=0):
+    return list(iterload(file, linesToLoad=linesToLoad, skip=skip))
+
+
+def loadRange(file, start=0, end=None):
+    '''
+    Load the lines between byte offsets start and end. The offsets have to be
+    aligned to line boundaries (see natlang.parallel.splitFile).
+    '''
+    return [_decode(line).lower().strip().split()
+            for line in readRange(file, start, end)]
+
+
+class TestTxt(unittest.TestCase):
+    def testNonAscii(self):
+        import shutil
+        import tempfile
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(tmpdir, "text.txt")
+            with open(fileName, 'wb') as f:
+                f.write(u"Ölçü ÇAY\nA b\n".encode('utf-8'))
+            expected = [[u"ölçü", u"çay"], [u"a", u"b"]]
+            for content in (load(fileName), loadRange(fileName)):
+                self.assertEqual(expected, content)
+                self.assertIsInstance(content[0][0], six.text_type)
+            self.assertEqual(expected[1:], load(fileName, skip=1))
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -11,21 +11,46 @@ import os
 import sys
 import inspect
 import unittest
+from six.moves import zip
+from natlang.reader import openFile
 __version__ = "0.3a"
 
 
-def load(files, linesToLoad=sys.maxsize):
+def iterload(files, linesToLoad=sys.maxsize, skip=0):
+    '''
+    Generator version of load. The files are read in lock step and sentences
+    are yielded one at a time.
+
+    @param files: list of str, the files include FORM, POS, etc.,
+    @param* linesToLoad: int, the lines to read
+    @param* skip: int, the lines to skip before reading
+    @return: generator of sentences. Each sentence is a list of tuples with
+        POS, FORM, etc.
+    '''
+    handles = [openFile(f) for f in files]
+    try:
+        for i, contents in enumerate(zip(*handles)):
+            if i < skip:
+                continue
+            if i >= skip + linesToLoad:
+                break
+            yield list(zip(*[content.strip().split()
+                             for content in contents]))
+    finally:
+        for handle in handles:
+            handle.close()
+    return
+
+
+def load(files, linesToLoad=sys.maxsize, skip=0):
     '''
     This function is used to read a set of files with different information
     (e.g. POS, Form, etc.) on the same set of tokens.
 
     @param files: list of str, the files include FORM, POS, etc.,
     @param* linesToLoad: int, the lines to read
+    @param* skip: int, the lines to skip before reading
     @return: list of sentences. Each sentence is a list of tuples with POS,
         FORM, etc.
     '''
-    content =\
-        [list(zip(*[content.strip().split() for content in contents]))
-         for contents in list(zip(*[open(os.path.expanduser(f))
-                                    for f in files]))[:linesToLoad]]
-    return content
+    return list(iterload(files, linesToLoad=linesToLoad, skip=skip))
@@ -13,25 +13,59 @@ import inspect
 import unittest
 try:
     from tree import load as loadTree
+    from tree import iterload as iterloadTree
     from txt import load as loadTxt
+    from txt import iterload as iterloadTxt
 except ImportError:
     from natlang.format.tree import load as loadTree
+    from natlang.format.tree import iterload as iterloadTree
     from natlang.format.txt import load as loadTxt
+    from natlang.format.txt import iterload as iterloadTxt
 __version__ = "0.3a"
 
 
-def load(file, linesToLoad=sys.maxsize, verbose=True):
+def load(file, linesToLoad=sys.maxsize, verbose=True, skip=0):
     try:
-        contents = loadTree(file, linesToLoad, verbose=verbose)
-        contentsTxt = loadTxt(file, linesToLoad)
+        contents = loadTree(file, linesToLoad, verbose=verbose, skip=skip)
+        contentsTxt = loadTxt(file, linesToLoad, skip=skip)
         if len([f for f in contents if f is not None]) <\
                 (len(contentsTxt) / 2):
             return contentsTxt
     except AttributeError:
-        return loadTxt(file, linesToLoad)
+        return loadTxt(file, linesToLoad, skip=skip)
     return contents
 
 
+def iterload(file, linesToLoad=sys.maxsize, verbose=True, skip=0,
+             sampleSize=1000):
+    '''
+    Generator version of load. Since the whole file is not available up front,
+    the decision between tree and txt is made on the first sampleSize lines
+    instead, using the same criterion as load.
+    '''
+    sample = []
+    trees = iterloadTree(file, linesToLoad, verbose=verbose, skip=skip)
+    try:
+        for tree in trees:
+            sample.append(tree)
+            if len(sample) >= sampleSize:
+                break
+    except AttributeError:
+        sample = []
+    if len([f for f in sample if f is not None]) < (len(sample) / 2) or\
+            len(sample) == 0:
+        trees.close()
+        for entry in iterloadTxt(file, linesToLoad, skip=skip):
+            yield entry
+        return
+
+    for tree in sample:
+        yield tree
+    for tree in trees:
+        yield tree
+    return
+
+
 class TestTxtOrTree(unittest.TestCase):
     def testLoadTreeFromFile(self):
         from natlang.format.tree import constructTree, constructTreeFromStr
@@ -55,6 +89,22 @@ class TestTxtOrTree(unittest.TestCase):
             compare(x, y)
         return
 
+    def testIterLoad(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        parentdir = os.path.dirname(currentdir)
+        for fileName in ("/test/sampleTree.txt", "/test/sampleDepTree.txt"):
+            content = load(parentdir + fileName, verbose=False)
+            iterContent = list(
+                iterload(parentdir + fileName, verbose=False, sampleSize=2))
+            self.assertEqual(len(content), len(iterContent))
+            for x, y in zip(content, iterContent):
+                if x is None or isinstance(x, list):
+                    self.assertEqual(x, y)
+                else:
+                    self.assertEqual(x.export(), y.export())
+        return
+
     def testLoadTxtFromFile(self):
         currentdir = os.path.dirname(
             os.path.abspath(inspect.getfile(inspect.currentframe())))
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Lazily parsed sentences.
+# Simon Fraser University
+# Jetic Gu
+#
+# A LazySentence keeps the raw text of a sentence along with cheap metadata
+# and only builds its tree the first time a structural attribute is accessed.
+# conll, tree and AMR return them from load and iterload with lazy=True.
+#
+from __future__ import absolute_import
+import re
+import sys
+import unittest
+
+from natlang import vocabulary
+__version__ = "0.3a"
+
+_leaf = re.compile(r"[^\s()]\s*\)")
+
+
+def leafCount(string):
+    '''
+    @param string: str, a tree in Penn Treebank format
+    @return: int, the number of leaves, without building the tree
+    '''
+    return len(_leaf.findall(string))
+
+
+class LazySentence(object):
+    '''
+    Sentence kept as raw text until its structure is needed. Attributes and
+    methods of the tree (phrase, export, ...) are forwarded to it, building
+    it on first access.
+    @param raw: the raw text, e.g. the token lines of a CoNLL sentence
+    @param builder: function, builder(raw, *args) returns the tree. It has
+        to be defined at module level for the sentence to be picklable.
+    @param args: tuple, extra arguments for builder
+    @param length: int, the number of tokens, None if it is only known after
+        building the tree
+    @param metadata: dict, e.g. {"sent_id": ...} from CoNLL-U comments
+    '''
+    __slots__ = ("raw", "builder", "args", "length", "metadata", "_node",
+                 "_built")
+
+    def __init__(self, raw, builder, args=(), length=None, metadata=None):
+        self.raw = raw
+        self.builder = builder
+        self.args = args
+        self.length = length
+        self.metadata = metadata if metadata is not None else {}
+        self._node = None
+        self._built = False
+        return
+
+    @property
+    def built(self):
+        return self._built
+
+    @property
+    def node(self):
+        '''
+        The tree of the sentence, None if the raw text is corrupt.
+        '''
+        if self._built is False:
+            self._node = self.builder(self.raw, *self.args)
+            self._built = True
+        return self._node
+
+    def __getattr__(self, name):
+        # Only called for attributes LazySentence does not have. Unset slots
+        # and special names must not be forwarded, e.g. during unpickling.
+        if name.startswith("__") or name in LazySentence.__slots__:
+            raise AttributeError(name)
+        node = self.node
+        if node is None:
+            raise AttributeError(
+                "natlang.lazy.LazySentence: corrupt sentence has no " +
+                "attribute " + name)
+        return getattr(node, name)
+
+    def __len__(self):
+        if self.length is not None:
+            return self.length
+        return len(self.node)
+
+    def __iter__(self):
+        return iter(self.node)
+
+    def __repr__(self):
+        return repr(self.node)
+
+    def __getstate__(self):
+        # Required for classes with __slots__ on Python 2. The tree is left
+        # out, it is rebuilt from raw when accessed. So are the shared
+        # vocabularies, which would otherwise be copied into every pickle and
+        # no longer be shared once unpickled: their positions in args are
+        # kept instead.
+        shared = tuple(i for i, arg in enumerate(self.args)
+                       if arg is vocabulary.shared)
+        args = tuple(None if i in shared else arg
+                     for i, arg in enumerate(self.args))
+        return (self.raw, self.builder, args, self.length, self.metadata,
+                shared)
+
+    def __setstate__(self, state):
+        self.raw, self.builder, args, self.length, self.metadata, shared =\
+            state
+        self.args = tuple(vocabulary.shared if i in shared else arg
+                          for i, arg in enumerate(args))
+        self._node = None
+        self._built = False
+        return
+
+
+class TestLazySentence(unittest.TestCase):
+    def testLazyConll(self):
+        import os
+        import shutil
+        import tempfile
+        from natlang.format import conll
+        tokens = ["1\tA\ta\tX\t_\t_\t0\troot\t_\t_",
+                  "2\tB\tb\tX\t_\t_\t1\tdep\t_\t_"]
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(tmpdir, "comments.conll")
+            with open(fileName, 'w') as f:
+                f.write("\n".join(["# sent_id = s1", "# text = A B"] +
+                                  tokens + ["", "# sent_id = s2"] +
+                                  tokens[:1] + [""]))
+            content = conll.load(fileName, verbose=False)
+            lazy = conll.load(fileName, verbose=False, lazy=True)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(2, len(content))
+        self.assertEqual(2, len(lazy))
+        self.assertEqual([2, 1], [len(x) for x in lazy])
+        self.assertEqual({"sent_id": "s1", "text": "A B"}, lazy[0].metadata)
+        self.assertEqual("s2", lazy[1].metadata["sent_id"])
+        self.assertFalse(lazy[0].built)
+        self.assertEqual(content[0].export(), lazy[0].export())
+        self.assertTrue(lazy[0].built)
+        self.assertEqual(["A", "B"], [n.value[0] for n in lazy[0].phrase])
+        self.assertFalse(lazy[1].built)
+        return
+
+    def testLazyTreeAndAMR(self):
+        import os
+        import pickle
+        import inspect
+        from natlang.format import tree, AMR
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleTree.txt"
+        content = tree.load(fileName, verbose=False)
+        lazy = tree.load(fileName, verbose=False, lazy=True)
+        self.assertEqual(len(content), len(lazy))
+        for x, y in zip(content, lazy):
+            if x is None:
+                self.assertEqual(None, y.node)
+                continue
+            self.assertEqual(len(x), len(y))
+            self.assertFalse(y.built)
+            self.assertEqual(x.export(), y.export())
+            self.assertEqual(list(x), list(y))
+
+        fileName = currentdir + "/test/sampleAMR.amr"
+        content = AMR.load(fileName, verbose=False)
+        lazy = list(AMR.iterload(fileName, verbose=False, lazy=True))
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps(lazy, protocol))
+            self.assertFalse(any(x.built for x in restored))
+            self.assertEqual(lazy[0].metadata, restored[0].metadata)
+            self.assertEqual([x.export() for x in content],
+                             [x.export() for x in restored])
+        self.assertEqual([x.export() for x in content],
+                         [x.export() for x in lazy])
+        # Built sentences are pickled as raw text too
+        restored = pickle.loads(pickle.dumps(lazy))
+        self.assertFalse(restored[0].built)
+        self.assertEqual(lazy[0].export(), restored[0].export())
+        # The shared vocabularies are not pickled, but re-attached
+        self.assertIs(vocabulary.shared, lazy[0].args[0])
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            data = pickle.dumps(lazy[0], protocol)
+            self.assertNotIn(b"natlang.vocabulary", data)
+            self.assertIs(vocabulary.shared, pickle.loads(data).args[0])
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -13,23 +13,50 @@ import inspect
 import unittest
 import glob
 import six
+from six.moves import zip, zip_longest
 import ast
 import importlib
+import multiprocessing
 
-from natlang.format import *
+from natlang.cache import LoadCache
 
 __version__ = "0.3a"
 
-supportedList = {
-    "tree": tree,
-    "txtFiles": txtFiles,
-    "txt": txt,
-    "AMR": AMR,
-    "txtOrTree": txtOrTree,
-    "conll": conll,
-    "semanticFrame": semanticFrame,
-    "alignment": alignment,
-}
+
+class _FormatDict(dict):
+    """
+    Maps format names to format modules. Values given as module paths are
+    imported on first access, so only the formats in use are ever imported.
+    """
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, six.string_types):
+            value = importlib.import_module(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+supportedList = _FormatDict({
+    "tree": "natlang.format.tree",
+    "txtFiles": "natlang.format.txtFiles",
+    "txt": "natlang.format.txt",
+    "AMR": "natlang.format.AMR",
+    "txtOrTree": "natlang.format.txtOrTree",
+    "conll": "natlang.format.conll",
+    "semanticFrame": "natlang.format.semanticFrame",
+    "alignment": "natlang.format.alignment",
+})
 
 
 def processOption(option, errorMessage="invalid option"):
@@ -51,11 +78,40 @@ def processOption(option, errorMessage="invalid option"):
     return option
 
 
+_missing = object()
+
+
+def _loadFile(args):
+    # Runs in a worker process, hence defined at module level for pickling
+    loader, fileName, kwargs, drop = args
+    if drop > 0:
+        return loader(fileName, **kwargs)[drop:]
+    return loader(fileName, **kwargs)
+
+
 class DataLoader():
-    def __init__(self, format="txtOrTree", loader=None):
+    """
+    @param format: str or module, the format of the files
+    @param loader: function, custom loader used instead of format.load
+    @param cache: None, True, str or natlang.cache.LoadCache. When set, parsed
+        files are kept in a persistent on-disk cache and reloaded from there
+        as long as the file, format and options are unchanged. True uses the
+        default cache directory, a str is taken as the cache directory.
+    """
+    def __init__(self, format="txtOrTree", loader=None, cache=None):
+        self.iterLoader = None
+        if cache is True:
+            cache = LoadCache()
+        elif isinstance(cache, six.string_types):
+            cache = LoadCache(cache)
+        self.cache = cache
+
         if loader is not None:
             if hasattr(loader, '__call__'):
                 self.loader = loader
+                self.formatName =\
+                    getattr(loader, '__module__', '') + "." +\
+                    getattr(loader, '__name__', '')
                 return
             else:
                 raise TypeError(
@@ -67,34 +123,36 @@ class DataLoader():
                 raise ValueError(
                     "natlang.dataLoader: invalid format selection")
             else:
-                self.loader = supportedList[format].load
+                format = supportedList[format]
+        self.formatName = getattr(format, '__name__', str(format))
+        if hasattr(format, 'load') and hasattr(format.load, '__call__'):
+            self.loader = format.load
         else:
-            if hasattr(format, 'load') and hasattr(format.load, '__call__'):
-                self.loader = format.load
-            else:
-                raise ValueError(
-                    "natlang.dataLoader: custom format selected does not",
-                    "have a callable load attr")
+            raise ValueError(
+                "natlang.dataLoader: custom format selected does not",
+                "have a callable load attr")
+        if hasattr(format, 'iterload') and\
+                hasattr(format.iterload, '__call__'):
+            self.iterLoader = format.iterload
         return
 
     def __call__(self,
-                 file, linesToLoad=sys.maxsize, verbose=True, option=None):
+                 file, linesToLoad=sys.maxsize, verbose=True, option=None,
+                 workers=1, skip=0):
         return self.load(file,
                          linesToLoad=linesToLoad,
                          verbose=verbose,
-                         option=option)
+                         option=option,
+                         workers=workers,
+                         skip=skip)
 
-    def load(self, file, linesToLoad=sys.maxsize, verbose=True, option=None):
+    def _matchFiles(self, file):
         def matchPattern(pattern):
             pattern = os.path.expandvars(os.path.expanduser(pattern))
             return [filename
-                    for filename in glob.glob(pattern)
+                    for filename in sorted(glob.glob(pattern))
                     if os.path.isfile(filename)]
 
-        option = processOption(
-            option, errorMessage="natlang.dataLoader.load: invalid option")
-
-        content = []
         if isinstance(file, list):
             files = []
             for filePattern in file:
@@ -108,34 +166,121 @@ class DataLoader():
         if len(files) == 0:
             raise RuntimeError(
                 "natlang.dataLoader.load [ERROR]: Cannot find matching files")
+        return files
 
+    def _loaderKwargs(self, loader, linesToLoad, verbose, option, workers=1,
+                      skip=0):
+        """
+        Returns the keyword arguments to call loader with, containing whichever
+        of the options the loader accepts. If the loader does not accept skip,
+        linesToLoad is extended instead and the caller has to drop the first
+        skip entries. The default linesToLoad, sys.maxsize, means all entries
+        and is passed unchanged.
+        """
         if sys.version_info[0] < 3:
             getSpec = inspect.getargspec
         else:
             getSpec = inspect.getfullargspec
 
-        if "verbose" in getSpec(self.loader)[0]:
-            if "option" in getSpec(self.loader)[0]:
-                def load(fileName):
-                    return self.loader(filename, linesToLoad=linesToLoad,
-                                       verbose=verbose, option=option)
-            else:
-                def load(fileName):
-                    return self.loader(filename, linesToLoad=linesToLoad,
-                                       verbose=verbose)
+        kwargs = {"linesToLoad": linesToLoad}
+        if "verbose" in getSpec(loader)[0]:
+            kwargs["verbose"] = verbose
+        if "option" in getSpec(loader)[0]:
+            kwargs["option"] = option
+        if workers > 1 and "workers" in getSpec(loader)[0]:
+            kwargs["workers"] = workers
+        if "skip" in getSpec(loader)[0]:
+            kwargs["skip"] = skip
+        elif skip > 0 and linesToLoad != sys.maxsize:
+            kwargs["linesToLoad"] = linesToLoad + skip
+        return kwargs
+
+    def load(self, file, linesToLoad=sys.maxsize, verbose=True, option=None,
+             workers=1, skip=0):
+        """
+        Load all files matching file.
+        @param linesToLoad: int, the number of entries to load from each file
+        @param skip: int, the number of entries to skip at the beginning of
+            each file
+        @param workers: int, number of processes used to load the matched
+            files. With workers > 1 the files are distributed over a process
+            pool and the results are merged following the order of the files.
+            Progress bars are disabled in the worker processes. If only one
+            file is matched and the format supports it, the file itself is
+            split between the workers instead.
+        """
+        option = processOption(
+            option, errorMessage="natlang.dataLoader.load: invalid option")
+        files = self._matchFiles(file)
+
+        contents = {}
+        keys = {}
+        if self.cache is not None:
+            for filename in files:
+                keys[filename] = self.cache.key(
+                    filename, self.formatName,
+                    {"linesToLoad": linesToLoad, "option": option,
+                     "skip": skip})
+                cached = self.cache.get(keys[filename])
+                if cached is not None:
+                    contents[filename] = cached
+        toLoad = [filename for filename in files if filename not in contents]
+
+        if workers > 1 and len(toLoad) > 1:
+            kwargs = self._loaderKwargs(
+                self.loader, linesToLoad, False, option, skip=skip)
+            drop = 0 if "skip" in kwargs else skip
+            pool = multiprocessing.Pool(min(workers, len(toLoad)))
+            try:
+                for filename, result in zip(toLoad, pool.imap(
+                        _loadFile,
+                        [(self.loader, filename, kwargs, drop)
+                         for filename in toLoad])):
+                    contents[filename] = result
+            finally:
+                pool.close()
+                pool.join()
         else:
-            if "option" in getSpec(self.loader)[0]:
-                def load(fileName):
-                    return self.loader(filename, linesToLoad=linesToLoad,
-                                       option=option)
-            else:
-                def load(fileName):
-                    return self.loader(filename, linesToLoad=linesToLoad)
+            kwargs = self._loaderKwargs(
+                self.loader, linesToLoad, verbose, option, workers, skip)
+            drop = 0 if "skip" in kwargs else skip
+            for filename in toLoad:
+                contents[filename] = _loadFile(
+                    (self.loader, filename, kwargs, drop))
+
+        if self.cache is not None:
+            for filename in toLoad:
+                self.cache.put(keys[filename], contents[filename])
 
+        content = []
         for filename in files:
-            content += load(filename)
+            content += contents[filename]
         return content
 
+    def iter(self, file, linesToLoad=sys.maxsize, verbose=True, option=None,
+             skip=0):
+        """
+        Streaming version of load. Entries from all matched files are yielded
+        one at a time. If the selected format does not provide an iterload
+        function, each file is loaded with load and then yielded from.
+        """
+        option = processOption(
+            option, errorMessage="natlang.dataLoader.iter: invalid option")
+        files = self._matchFiles(file)
+        if self.iterLoader is not None:
+            loader = self.iterLoader
+        else:
+            loader = self.loader
+        kwargs = self._loaderKwargs(
+            loader, linesToLoad, verbose, option, skip=skip)
+        drop = 0 if "skip" in kwargs else skip
+
+        for filename in files:
+            for i, entry in enumerate(loader(filename, **kwargs)):
+                if i >= drop:
+                    yield entry
+        return
+
 
 class ParallelDataLoader():
     def __init__(self,
@@ -149,22 +294,61 @@ class ParallelDataLoader():
 
     def __call__(self,
                  fFile, eFile,
-                 linesToLoad=sys.maxsize, verbose=True, option=None):
+                 linesToLoad=sys.maxsize, verbose=True, option=None, skip=0):
         return self.load(fFile, eFile,
                          linesToLoad=linesToLoad,
                          verbose=verbose,
-                         option=option)
+                         option=option,
+                         skip=skip)
 
     def load(self, fFile, eFile,
-             linesToLoad=sys.maxsize, verbose=True, option=None):
-        data = zip(self.srcLoader.load(fFile, linesToLoad,
-                                       verbose=verbose, option=option),
-                   self.tgtLoader.load(eFile, linesToLoad,
-                                       verbose=verbose, option=option))
-        # Remove incomplete or invalid entries
-        data = [(f, e) for f, e in data if f is not None and e is not None]
-        data = [(f, e) for f, e in data if len(f) > 0 and len(e) > 0]
-        return data
+             linesToLoad=sys.maxsize, verbose=True, option=None, skip=0):
+        return list(self.iter(fFile, eFile,
+                              linesToLoad=linesToLoad,
+                              verbose=verbose,
+                              option=option,
+                              skip=skip))
+
+    def iter(self, fFile, eFile,
+             linesToLoad=sys.maxsize, verbose=True, option=None, skip=0,
+             reportMismatch=False):
+        """
+        Streaming version of load. Both sides are read in lock step and
+        incomplete or invalid entries are dropped on the fly, so only one
+        entry of each side is held in memory at a time.
+        @param reportMismatch: bool, if True, keep reading the longer side
+            once the shorter one is exhausted and report the number of entries
+            on each side to stderr if they differ.
+        """
+        srcData = self.srcLoader.iter(fFile, linesToLoad,
+                                      verbose=verbose, option=option,
+                                      skip=skip)
+        tgtData = self.tgtLoader.iter(eFile, linesToLoad,
+                                      verbose=verbose, option=option,
+                                      skip=skip)
+        srcCount = tgtCount = 0
+        if reportMismatch is True:
+            data = zip_longest(srcData, tgtData, fillvalue=_missing)
+        else:
+            data = zip(srcData, tgtData)
+        for f, e in data:
+            if f is not _missing:
+                srcCount += 1
+            if e is not _missing:
+                tgtCount += 1
+            if f is _missing or e is _missing:
+                continue
+            # Remove incomplete or invalid entries
+            if f is None or e is None or len(f) == 0 or len(e) == 0:
+                continue
+            yield f, e
+
+        if reportMismatch is True and srcCount != tgtCount:
+            sys.stderr.write(
+                "natlang.parallelDataLoader.iter [WARN]: mismatched " +
+                "number of entries, source: " + str(srcCount) +
+                ", target: " + str(tgtCount) + "\n")
+        return
 
 
 class TestPatternMatching(unittest.TestCase):
@@ -194,6 +378,110 @@ class TestPatternMatching(unittest.TestCase):
                              loader.load("/*", option='cheese=2')[0])
         return
 
+    def testParallelLoader(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        files = [currentdir + "/test/sampleTree.txt",
+                 currentdir + "/test/sampleDepTree.txt",
+                 currentdir + "/test/sampleTree.txt"]
+        loader = DataLoader("txt")
+        self.assertEqual(loader.load(files, verbose=False),
+                         loader.load(files, verbose=False, workers=2))
+        return
+
+    def testCachedLoader(self):
+        import shutil
+        import tempfile
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        from natlang.format import tree
+        calls = []
+
+        def load(fileName, linesToLoad=sys.maxsize):
+            calls.append(fileName)
+            return tree.load(fileName, linesToLoad, verbose=False)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            loader = DataLoader(loader=load, cache=tmpdir)
+            content = loader.load(currentdir + "/test/sampleTree.txt")
+            cachedContent = loader.load(currentdir + "/test/sampleTree.txt")
+            self.assertEqual(1, len(calls))
+            self.assertEqual(
+                [x.export() for x in content if x is not None],
+                [x.export() for x in cachedContent if x is not None])
+            loader.load(currentdir + "/test/sampleTree.txt", linesToLoad=1)
+            self.assertEqual(2, len(calls))
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+    def testParallelIterLoader(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        loader = ParallelDataLoader("txt", "txt")
+        data = loader.iter(currentdir + "/test/sampleTree.txt",
+                           currentdir + "/test/sampleAMR.amr",
+                           verbose=False, reportMismatch=True)
+        self.assertFalse(isinstance(data, list))
+        stderr, sys.stderr = sys.stderr, six.StringIO()
+        try:
+            data = list(data)
+            self.assertIn("source: 3, target: 10", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(2, len(data))
+        self.assertEqual(data,
+                         loader.load(currentdir + "/test/sampleTree.txt",
+                                     currentdir + "/test/sampleAMR.amr",
+                                     verbose=False))
+        return
+
+    def testLoaderWindow(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleAMR.amr"
+        from natlang.format import txt
+        content = DataLoader("txt").load(fileName)
+
+        requested = []
+
+        def load(fileName, linesToLoad=sys.maxsize):
+            requested.append(linesToLoad)
+            return txt.load(fileName, linesToLoad)
+
+        for loader in (DataLoader("txt"), DataLoader(loader=load)):
+            self.assertEqual(content[2:5],
+                             loader.load(fileName, linesToLoad=3, skip=2))
+            self.assertEqual(content[2:5],
+                             list(loader.iter(fileName, linesToLoad=3,
+                                              skip=2)))
+            self.assertEqual(content[8:], loader.load(fileName, skip=8))
+        # Loading everything is not turned into a larger count
+        self.assertEqual([5, 5, sys.maxsize], requested)
+        return
+
+    def testIterLoader(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        samples = {
+            "tree": "/test/sampleTree.txt",
+            "txt": "/test/sampleTree.txt",
+            "txtOrTree": "/test/sampleDepTree.txt",
+            "AMR": "/test/sampleAMR.amr",
+            "conll": "/test/sampleCoNLLU.conll",
+        }
+        for format in samples:
+            loader = DataLoader(format)
+            content = loader.iter(currentdir + samples[format],
+                                  verbose=False)
+            self.assertFalse(isinstance(content, list))
+            self.assertEqual(
+                len(loader.load(currentdir + samples[format],
+                                verbose=False)),
+                len(list(content)))
+        return
+
 
 if __name__ == '__main__':
     if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Intra-file parallel loading.
+# Simon Fraser University
+# Jetic Gu
+#
+# This module splits a single file into byte ranges aligned to sentence
+# boundaries, so that the ranges can be parsed independently in a pool of
+# worker processes and stitched back together in order.
+#
+from __future__ import absolute_import
+import os
+import sys
+import inspect
+import unittest
+import multiprocessing
+import six
+from natlang.reader import openFile, isCompressed
+__version__ = "0.3a"
+
+
+def alignOffset(file, offset, blankLine=False):
+    '''
+    Move offset forward to the closest sentence boundary.
+    @param file: binary file object
+    @param offset: int, byte offset
+    @param blankLine: bool, if True sentences are separated by blank lines
+        (CoNLL). Otherwise each line is a sentence (tree, AMR, txt).
+    @return: int, the aligned byte offset
+    '''
+    if offset <= 0:
+        return 0
+    # Skip what remains of the line containing offset - 1. If offset is
+    # already at the start of a line, this only consumes the previous "\n".
+    file.seek(offset - 1)
+    file.readline()
+    if blankLine is False:
+        return file.tell()
+    while True:
+        line = file.readline()
+        if not line or line.strip() == b"":
+            return file.tell()
+
+
+def splitFile(fileName, parts, blankLine=False):
+    '''
+    Split a file into at most parts byte ranges aligned to sentence
+    boundaries.
+    @return: list of (start, end) tuples covering the entire file
+    '''
+    fileName = os.path.expanduser(fileName)
+    size = os.path.getsize(fileName)
+    offsets = [0]
+    with open(fileName, 'rb') as file:
+        for i in range(1, parts):
+            offset = alignOffset(file, size * i // parts, blankLine)
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    if offsets[-1] < size:
+        offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def readRange(fileName, start=0, end=None):
+    '''
+    Generator of the lines of a file between byte offsets start and end, of
+    the same type as openFile yields in text mode: native str on Python 2,
+    decoded str on Python 3. Compressed files can only be read as a whole.
+    '''
+    with openFile(fileName, 'rb') as file:
+        if start != 0:
+            if hasattr(file, 'rawFile'):
+                raise ValueError(
+                    "natlang.parallel.readRange: cannot seek into " +
+                    "compressed file " + fileName)
+            file.seek(start)
+        position = start
+        for line in file:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line if six.PY2 else line.decode('utf-8')
+    return
+
+
+def _loadRange(args):
+    # Runs in a worker process, hence defined at module level for pickling
+    loader, fileName, start, end, kwargs = args
+    return loader(fileName, start, end, **kwargs)
+
+
+def loadParallel(loader, fileName, workers, blankLine=False, kwargs=None,
+                 chunksPerWorker=4):
+    '''
+    Parse a single file with a pool of processes.
+    @param loader: function, loader(fileName, start, end, **kwargs) parses the
+        sentences between two aligned byte offsets and returns them as a list.
+        It has to be defined at module level so it could be pickled.
+    @param workers: int, number of processes
+    @param blankLine: bool, see alignOffset
+    @param kwargs: dict, extra keyword arguments for loader
+    @param chunksPerWorker: int, the file is split in workers * chunksPerWorker
+        ranges to balance the load between processes.
+    @return: list, concatenated results in file order
+    '''
+    if kwargs is None:
+        kwargs = {}
+    if isCompressed(fileName):
+        # Compressed streams cannot be split, decompress in a single pass
+        return loader(fileName, 0, None, **kwargs)
+    ranges = splitFile(fileName, workers * chunksPerWorker, blankLine)
+    content = []
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(
+                _loadRange,
+                [(loader, fileName, start, end, kwargs)
+                 for start, end in ranges]):
+            content += result
+    finally:
+        pool.close()
+        pool.join()
+    return content
+
+
+class TestParallel(unittest.TestCase):
+    def testSplitFileLines(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleAMR.amr"
+        raw = list(open(fileName, 'rb'))
+        for parts in (1, 2, 3, 7, 100):
+            ranges = splitFile(fileName, parts)
+            lines = []
+            for start, end in ranges:
+                lines += [six.ensure_binary(line)
+                          for line in readRange(fileName, start, end)]
+            self.assertEqual(raw, lines)
+        return
+
+    def testSplitFileBlankLine(self):
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleCoNLLU.conll"
+        raw = list(open(fileName, 'rb'))
+        for parts in (2, 3, 100):
+            ranges = splitFile(fileName, parts, blankLine=True)
+            self.assertLessEqual(len(ranges), min(parts, 3))
+            lines = []
+            for start, end in ranges:
+                chunk = list(readRange(fileName, start, end))
+                self.assertNotEqual(chunk[0].strip(), "")
+                lines += [six.ensure_binary(line) for line in chunk]
+            self.assertEqual(raw, lines)
+        self.assertEqual(3, len(splitFile(fileName, 100, blankLine=True)))
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
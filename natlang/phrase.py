@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Span based phrase views.
+# Simon Fraser University
+# Jetic Gu
+#
+# The phrase of a node, i.e. the tokens it dominates, is a contiguous span of
+# the tokens of its tree listed in order. Each node keeps a Phrase view of that
+# span instead of its own list, so the phrases of a whole tree take linear
+# space and time.
+#
+from __future__ import absolute_import
+import sys
+import pickle
+import unittest
+__version__ = "0.3a"
+
+
+class Phrase(object):
+    '''
+    Read-only sequence view of tokens[start:end]. Compares equal to lists and
+    tuples with the same elements.
+    @param tokens: list, shared by all the phrases of a tree
+    @param start: int
+    @param end: int
+    '''
+    __slots__ = ("tokens", "start", "end")
+
+    def __init__(self, tokens, start=0, end=None):
+        self.tokens = tokens
+        self.start = start
+        self.end = len(tokens) if end is None else end
+        return
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __iter__(self):
+        tokens = self.tokens
+        for i in range(self.start, self.end):
+            yield tokens[i]
+        return
+
+    def __reversed__(self):
+        tokens = self.tokens
+        for i in range(self.end - 1, self.start - 1, -1):
+            yield tokens[i]
+        return
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return Phrase(self.tokens, self.start + start,
+                              self.start + max(start, stop))
+            return [self.tokens[self.start + i]
+                    for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("natlang.phrase.Phrase: index out of range")
+        return self.tokens[self.start + key]
+
+    def __contains__(self, item):
+        return any(token == item for token in self)
+
+    def __eq__(self, other):
+        if not isinstance(other, (Phrase, list, tuple)):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        return all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __getstate__(self):
+        # Required for classes with __slots__ on Python 2
+        return (self.tokens, self.start, self.end)
+
+    def __setstate__(self, state):
+        self.tokens, self.start, self.end = state
+        return
+
+
+class TestPhrase(unittest.TestCase):
+    def testPhrase(self):
+        tokens = ["a", "b", "c", "d", "e"]
+        phrase = Phrase(tokens, 1, 4)
+        self.assertEqual(3, len(phrase))
+        self.assertEqual(["b", "c", "d"], list(phrase))
+        self.assertEqual(["b", "c", "d"], phrase)
+        self.assertEqual(phrase, ("b", "c", "d"))
+        self.assertNotEqual(phrase, ["b", "c"])
+        self.assertEqual("d", phrase[-1])
+        self.assertRaises(IndexError, phrase.__getitem__, 3)
+        self.assertEqual(["c", "d"], phrase[1:])
+        self.assertTrue(isinstance(phrase[1:], Phrase))
+        self.assertEqual(["b", "d"], phrase[::2])
+        self.assertEqual(["d", "c", "b"], list(reversed(phrase)))
+        self.assertIn("c", phrase)
+        self.assertEqual(["b", "c", "d", "e"], phrase + ["e"])
+        self.assertEqual([], Phrase(tokens, 2, 2))
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps([phrase, phrase[1:]],
+                                                 protocol))
+            self.assertEqual([["b", "c", "d"], ["c", "d"]], restored)
+            # Phrases of a tree still share their token list
+            self.assertIs(restored[0].tokens, restored[1].tokens)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Byte based progress reporting for loaders.
+# Simon Fraser University
+# Jetic Gu
+#
+# Progress is measured by the position of the file being read, so no extra
+# pass over the file is needed to find out its length. Updates are throttled
+# by time to keep the per-line overhead negligible.
+#
+from __future__ import absolute_import
+import os
+import sys
+import stat
+import time
+import inspect
+import unittest
+import progressbar
+__version__ = "0.3a"
+
+
+class _TotalLabel(progressbar.Widget):
+    def __init__(self, progress):
+        self.progress = progress
+
+    def update(self, pbar):
+        return '; Total: %d %s (in: %s)' % (
+            self.progress.count, self.progress.unit,
+            progressbar.Timer.format_time(pbar.seconds_elapsed))
+
+
+class ByteProgress():
+    '''
+    Progress bar for a file being read. Call tick every time an entry is
+    read, the bar itself is only redrawn every interval seconds.
+    @param file: file object being read. Its position is taken from
+        file.buffer for text files, or from file.rawFile when reading a
+        compressed file, so that progress is measured in bytes on disk.
+    @param unit: str, name of the entries counted
+    @param interval: float, minimum number of seconds between redraws
+    '''
+    checkEvery = 256
+
+    def __init__(self, file, unit="sents", interval=0.5):
+        self.raw = getattr(file, 'rawFile', getattr(file, 'buffer', file))
+        self.unit = unit
+        self.interval = interval
+        self.count = 0
+        self._ticks = 0
+        self._last = 0
+        self.total = None
+        try:
+            fileStat = os.fstat(self.raw.fileno())
+            if stat.S_ISREG(fileStat.st_mode):
+                self.total = fileStat.st_size
+        except (AttributeError, OSError, ValueError):
+            pass
+
+        if self.total is not None:
+            widgets = [progressbar.Bar('>'), ' ', progressbar.ETA(),
+                       _TotalLabel(self)]
+            maxval = max(self.total, 1)
+        else:
+            # Streams of unknown length, e.g. pipes
+            widgets = [progressbar.AnimatedMarker(), _TotalLabel(self)]
+            maxval = progressbar.UnknownLength
+        self.bar = progressbar.ProgressBar(widgets=widgets, maxval=maxval,
+                                           fd=sys.stderr)
+        self.bar.start()
+        self._last = time.time()
+        return
+
+    def _position(self):
+        try:
+            position = self.raw.tell()
+        except (IOError, OSError, ValueError):
+            return None
+        if self.total is not None:
+            return min(position, self.bar.maxval)
+        return position
+
+    def tick(self, count=1):
+        self.count += count
+        self._ticks += 1
+        if self._ticks < self.checkEvery:
+            return
+        self._ticks = 0
+        now = time.time()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+        self.bar.update(self._position())
+        return
+
+    def finish(self):
+        if self.total is not None:
+            self.bar.currval = self.bar.maxval
+        self.bar.finish()
+        return
+
+
+class TestByteProgress(unittest.TestCase):
+    def testProgress(self):
+        import six
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        fileName = currentdir + "/test/sampleAMR.amr"
+        stderr, sys.stderr = sys.stderr, six.StringIO()
+        try:
+            with open(fileName) as file:
+                progress = ByteProgress(file, interval=0)
+                progress.checkEvery = 1
+                for line in file:
+                    progress.tick()
+                progress.finish()
+            output = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(10, progress.count)
+        self.assertEqual(os.path.getsize(fileName), progress.total)
+        self.assertIn("Total: 10 sents", output)
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# File reader with transparent decompression.
+# Simon Fraser University
+# Jetic Gu
+#
+# openFile detects gzip, bzip2, xz and zstd compressed files from their magic
+# bytes (or their extension, for streams that cannot be peeked into) and
+# decompresses them on the fly. Decompression runs in a separate thread so it
+# overlaps with parsing.
+#
+from __future__ import absolute_import
+import io
+import os
+import sys
+import inspect
+import threading
+import unittest
+
+import six
+from six.moves import queue
+__version__ = "0.3a"
+
+_magicNumbers = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+_extensions = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "xz",
+    ".zst": "zstd",
+}
+
+
+def detectCompression(rawFile, fileName=None):
+    '''
+    @param rawFile: io.BufferedReader, opened in binary mode. Its position is
+        left untouched.
+    @param fileName: str, used to guess from the extension when rawFile
+        cannot be peeked into
+    @return: str, "gzip", "bz2", "xz", "zstd" or None if uncompressed
+    '''
+    try:
+        header = rawFile.peek(6)[:6]
+    except (AttributeError, IOError, OSError):
+        header = None
+    if header:
+        for magic, compression in _magicNumbers:
+            if header.startswith(magic):
+                return compression
+        return None
+    if fileName is not None:
+        return compressionFromExtension(fileName)
+    return None
+
+
+def compressionFromExtension(fileName):
+    '''
+    @return: str, the compression implied by the extension of fileName, e.g.
+        "gzip" for .gz, None if there is none
+    '''
+    return _extensions.get(os.path.splitext(fileName)[1].lower())
+
+
+def isCompressed(fileName):
+    with io.open(os.path.expanduser(fileName), 'rb') as rawFile:
+        return detectCompression(rawFile, fileName) is not None
+
+
+def _decompressor(compression, rawFile):
+    if compression == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=rawFile, mode='rb')
+    if compression == "bz2":
+        import bz2
+        if six.PY2:
+            # BZ2File only accepts file names on Python 2
+            return _IncrementalReader(rawFile, bz2.BZ2Decompressor)
+        return bz2.BZ2File(rawFile)
+    if compression == "xz":
+        try:
+            import lzma
+        except ImportError:
+            from backports import lzma
+        return lzma.LZMAFile(rawFile)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "natlang.reader: reading zstd compressed files requires " +
+                "the zstandard package")
+        decompressor = zstandard.ZstdDecompressor()
+        try:
+            return decompressor.stream_reader(rawFile,
+                                              read_across_frames=True)
+        except TypeError:
+            return decompressor.stream_reader(rawFile)
+    raise ValueError("natlang.reader: unknown compression " + str(compression))
+
+
+class _IncrementalReader(object):
+    '''
+    Minimal binary stream decompressing rawFile with an incremental
+    decompressor. Concatenated streams, e.g. from pbzip2, are decompressed
+    one after the other.
+    @param rawFile: binary file object, the compressed file
+    @param newDecompressor: function returning a fresh decompressor object
+        with decompress and unused_data, e.g. bz2.BZ2Decompressor
+    '''
+    def __init__(self, rawFile, newDecompressor):
+        self._rawFile = rawFile
+        self._new = newDecompressor
+        self._decompressor = newDecompressor()
+        self._unused = b""
+        return
+
+    def read(self, size):
+        '''
+        @return: bytes, the data decompressed from up to size compressed
+            bytes, empty at the end of the file
+        '''
+        result = b""
+        while len(result) == 0:
+            data = self._unused or self._rawFile.read(size)
+            self._unused = b""
+            if not data:
+                return b""
+            try:
+                result = self._decompressor.decompress(data)
+            except EOFError:
+                # The previous stream ended exactly at the end of a read
+                self._decompressor = self._new()
+                result = self._decompressor.decompress(data)
+            if self._decompressor.unused_data:
+                self._unused = self._decompressor.unused_data
+                self._decompressor = self._new()
+        return result
+
+    def close(self):
+        return
+
+
+class DecompressedReader(io.RawIOBase):
+    '''
+    Raw binary stream over a decompressor. When threaded, the decompressor is
+    read from a background thread, so that decompression overlaps with
+    whatever the consumer is doing.
+    @param stream: binary file object, the decompressor
+    @param rawFile: binary file object, the compressed file. Closed along
+        with stream.
+    @param threaded: bool, read stream from a background thread
+    @param chunkSize: int, size of each read from stream
+    @param queueSize: int, maximum number of chunks read ahead
+    '''
+    def __init__(self, stream, rawFile, threaded=True, chunkSize=1 << 20,
+                 queueSize=8):
+        io.RawIOBase.__init__(self)
+        self._stream = stream
+        self._rawFile = rawFile
+        self._chunkSize = chunkSize
+        self._chunk = b""
+        self._offset = 0
+        self._eof = False
+        self._thread = None
+        if threaded is True:
+            self._queue = queue.Queue(queueSize)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        return
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        return
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._stream.read(self._chunkSize)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+        return
+
+    def _nextChunk(self):
+        if self._thread is None:
+            return self._stream.read(self._chunkSize)
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            self._eof = True
+            raise item
+        return item
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset >= len(self._chunk):
+            if self._eof:
+                return 0
+            chunk = self._nextChunk()
+            if not chunk:
+                self._eof = True
+                return 0
+            self._chunk = chunk
+            self._offset = 0
+        size = min(len(b), len(self._chunk) - self._offset)
+        b[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+            self._stream.close()
+            self._rawFile.close()
+        io.RawIOBase.close(self)
+        return
+
+
+def _textFile(stream, encoding):
+    if six.PY2:
+        # Loaders expect native str lines on Python 2, i.e. undecoded bytes
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding)
+
+
+def openFile(fileName, mode='r', encoding='utf-8', threaded=True):
+    '''
+    Open a file for reading, decompressing it on the fly if needed.
+    @param mode: str, 'r' for text or 'rb' for binary. On Python 2 both
+        return native str, so encoding is not applied.
+    @param threaded: bool, decompress in a separate thread
+    @return: file object. For compressed files, its rawFile attribute is the
+        underlying compressed file, which natlang.progress uses to report
+        progress in bytes on disk.
+    '''
+    if mode not in ('r', 'rb'):
+        raise ValueError("natlang.reader.openFile: invalid mode " + mode)
+    fileName = os.path.expanduser(fileName)
+    rawFile = io.open(fileName, 'rb')
+    compression = detectCompression(rawFile, fileName)
+    if compression is None:
+        if mode == 'rb':
+            return rawFile
+        return _textFile(rawFile, encoding)
+
+    try:
+        stream = _decompressor(compression, rawFile)
+    except Exception:
+        rawFile.close()
+        raise
+    stream = io.BufferedReader(DecompressedReader(stream, rawFile, threaded))
+    if mode == 'r':
+        stream = _textFile(stream, encoding)
+    stream.rawFile = rawFile
+    return stream
+
+
+class TestReader(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        self.tmpdir = tempfile.mkdtemp()
+        self.fileName = currentdir + "/test/sampleCoNLLU.conll"
+        with open(self.fileName, 'rb') as f:
+            self.content = f.read()
+        return
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def compressedCopies(self):
+        import gzip
+        import bz2
+        copies = {}
+        name = self.tmpdir + "/sample.conll.gz"
+        with gzip.GzipFile(name, 'wb') as f:
+            f.write(self.content)
+        copies["gzip"] = name
+        # No extension, compression is detected from the magic bytes
+        name = self.tmpdir + "/sample"
+        with open(name, 'wb') as f:
+            f.write(bz2.compress(self.content))
+        copies["bz2"] = name
+        try:
+            import lzma
+            name = self.tmpdir + "/sample.conll.xz"
+            with open(name, 'wb') as f:
+                f.write(lzma.compress(self.content))
+            copies["xz"] = name
+        except ImportError:
+            pass
+        try:
+            import zstandard
+            name = self.tmpdir + "/sample.conll.zst"
+            with open(name, 'wb') as f:
+                f.write(zstandard.ZstdCompressor().compress(self.content))
+            copies["zstd"] = name
+        except ImportError:
+            pass
+        return copies
+
+    def testOpenFile(self):
+        lines = self.content.splitlines(True)
+        if not six.PY2:
+            lines = self.content.decode('utf-8').splitlines(True)
+        with openFile(self.fileName) as f:
+            self.assertEqual(lines, list(f))
+        with openFile(self.fileName, 'rb') as f:
+            self.assertEqual(None, detectCompression(f))
+            self.assertEqual(self.content, f.read())
+        for compression, name in self.compressedCopies().items():
+            self.assertTrue(isCompressed(name))
+            for threaded in (True, False):
+                with openFile(name, 'rb', threaded=threaded) as f:
+                    self.assertEqual(self.content, f.read())
+                with openFile(name, threaded=threaded) as f:
+                    self.assertEqual(lines, list(f))
+        return
+
+    def testConcatenatedStreams(self):
+        import bz2
+        name = self.tmpdir + "/sample.bz2"
+        with open(name, 'wb') as f:
+            f.write(bz2.compress(self.content[:100]))
+            f.write(bz2.compress(self.content[100:]))
+        with openFile(name, 'rb', threaded=False) as f:
+            self.assertEqual(self.content, f.read())
+        # Streams ending exactly at the end of a read
+        with io.open(name, 'rb') as rawFile:
+            stream = _IncrementalReader(rawFile, bz2.BZ2Decompressor)
+            self.assertEqual(self.content,
+                             b"".join(iter(lambda: stream.read(7), b"")))
+        return
+
+    def testEarlyClose(self):
+        name = self.compressedCopies()["gzip"]
+        f = openFile(name)
+        f.readline()
+        f.close()
+        self.assertTrue(f.rawFile.closed)
+        return
+
+    def testLoadCompressed(self):
+        from natlang.format import conll
+        content = [x.export() for x in conll.load(self.fileName,
+                                                  verbose=False)]
+        for compression, name in self.compressedCopies().items():
+            self.assertEqual(
+                content,
+                [x.export() for x in conll.load(name, verbose=False)])
+            self.assertEqual(
+                content,
+                [x.export() for x in conll.load(name, verbose=False,
+                                                workers=2)])
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Python version: 3
+#
+# Memory and load time benchmark of ColumnarCorpus.
+# Simon Fraser University
+# Jetic Gu
+#
+# Loads a synthetic CoNLL-U file both as a list of conll.Node trees and as a
+# natlang.columnar.ColumnarCorpus.
+#
+#     > python -m natlang.test.benchColumnar [sentences]
+#
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import tracemalloc
+
+from natlang.format import conll
+from natlang.columnar import ColumnarCorpus
+
+upos = ["NOUN", "VERB", "ADJ", "ADP", "DET", "PROPN", "PRON", "PUNCT"]
+deprels = ["nsubj", "obj", "amod", "case", "det", "nmod", "punct", "advmod"]
+
+
+def generate(fileName, sentences, length, seed=0):
+    rng = random.Random(seed)
+    with open(fileName, 'w') as f:
+        for s in range(sentences):
+            root = rng.randint(1, length)
+            for i in range(1, length + 1):
+                head = 0 if i == root else root
+                word = "w%d" % rng.randint(0, 5000)
+                f.write("\t".join([
+                    str(i), word, word, rng.choice(upos), rng.choice(upos),
+                    "_", str(head), "root" if head == 0 else
+                    rng.choice(deprels), "_", "_"]) + "\n")
+            f.write("\n")
+    return
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.time()
+    content = load()
+    elapsed = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del content
+    return elapsed, memory
+
+
+if __name__ == '__main__':
+    sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fileName = os.path.join(tmpdir, "bench.conll")
+        generate(fileName, sentences, 25)
+        for name, load in (
+                ("conll.load", lambda: conll.load(fileName, verbose=False)),
+                ("ColumnarCorpus",
+                 lambda: ColumnarCorpus(fileName, verbose=False))):
+            elapsed, memory = measure(load)
+            print("%-16s %8.2f s %10.1f MB" %
+                  (name, elapsed, memory / 1024.0 ** 2))
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# conll.constructFromText benchmark on wide trees.
+# Simon Fraser University
+# Jetic Gu
+#
+# Builds synthetic sentences where every token depends on the first one (one
+# very long sibling chain) and reports the construction time per token, which
+# stays flat as sentences get longer.
+#
+#     > python -m natlang.test.benchConllConstruct
+#
+from __future__ import print_function
+import timeit
+
+from natlang.format.conll import constructFromText
+
+
+def wideSentence(length):
+    return ["\t".join([str(i), "w%d" % i, "w%d" % i, "NOUN", "NN", "_",
+                       "0" if i == 1 else "1", "root" if i == 1 else "dep",
+                       "_", "_"])
+            for i in range(1, length + 1)]
+
+
+if __name__ == '__main__':
+    for length in (10, 100, 1000, 10000):
+        rawLine = wideSentence(length)
+        number = max(1, 100000 // length)
+        elapsed = min(timeit.repeat(lambda: constructFromText(rawLine),
+                                    number=number, repeat=3))
+        print("%6d tokens: %8.2f us per token" %
+              (length, elapsed / number / length * 1e6))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Python version: 3
+#
+# Round trip benchmark of natlang.exporter.
+# Simon Fraser University
+# Jetic Gu
+#
+# Loads a synthetic CoNLL-U file with iterload and writes it back, once by
+# exporting each sentence to a string and once with exporter.exportToFile,
+# which streams the trees into a buffered file. Plain and gzip copies of the
+# file give the disk and compression speed for reference.
+#
+#     > python -m natlang.test.benchExport [sentences]
+#
+from __future__ import print_function
+import os
+import sys
+import gzip
+import time
+import shutil
+import tempfile
+
+from natlang.format import conll
+from natlang.exporter import exportToFile
+from natlang.test.benchColumnar import generate
+
+
+def timed(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+def exportStrings(fileName, outputName):
+    with open(outputName, 'w') as f:
+        for sent in conll.iterload(fileName, verbose=False):
+            f.write(sent.export() + "\n")
+    return
+
+
+def copyGzip(fileName, outputName):
+    with open(fileName, 'rb') as f, gzip.open(outputName, 'wb', 6) as g:
+        shutil.copyfileobj(f, g)
+    return
+
+
+if __name__ == '__main__':
+    sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fileName = os.path.join(tmpdir, "bench.conll")
+        generate(fileName, sentences, 25)
+        size = os.path.getsize(fileName) / 1e6
+        out = os.path.join(tmpdir, "out.conll")
+        results = [
+            ("copy", lambda: shutil.copyfile(fileName, out)),
+            ("gzip copy", lambda: copyGzip(fileName, out + ".gz")),
+            ("load only", lambda: sum(1 for _ in conll.iterload(
+                fileName, verbose=False))),
+            ("export strings", lambda: exportStrings(fileName, out)),
+            ("exportToFile", lambda: exportToFile(
+                conll.iterload(fileName, verbose=False), out)),
+            ("exportToFile gz", lambda: exportToFile(
+                conll.iterload(fileName, verbose=False), out + ".gz")),
+        ]
+        print("%.1f MB, %d sentences" % (size, sentences))
+        for name, function in results:
+            print("%-16s %7.2f s" % (name, timed(function)))
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Import time benchmark.
+# Simon Fraser University
+# Jetic Gu
+#
+# Compares the time it takes a fresh interpreter to "import natlang" with the
+# time it takes to import every submodule, which is what "import natlang"
+# used to do before submodules were imported lazily.
+#
+from __future__ import print_function
+import sys
+import time
+import subprocess
+
+lazyImport = "import natlang"
+eagerImport = "; ".join([
+    "import natlang",
+    "import natlang.format.AMR",
+    "import natlang.format.semanticFrame",
+    "import natlang.format.tree",
+    "import natlang.format.txt",
+    "import natlang.format.txtFiles",
+    "import natlang.format.txtOrTree",
+    "import natlang.format.conll",
+    "import natlang.format.alignment",
+    "import natlang.analysis.conllTransformer",
+    "import natlang.exporter",
+    "import natlang.fileConverter",
+    "import natlang.loader",
+])
+
+
+def timeImport(statement, repeat=10):
+    '''
+    @return: float, best wall time in seconds of a fresh interpreter running
+        statement, minus the time of a bare interpreter start.
+    '''
+    def best(code):
+        times = []
+        for i in range(repeat):
+            start = time.time()
+            subprocess.check_call([sys.executable, "-c", code])
+            times.append(time.time() - start)
+        return min(times)
+    return best(statement) - best("pass")
+
+
+if __name__ == '__main__':
+    lazy = timeImport(lazyImport)
+    eager = timeImport(eagerImport)
+    print("import natlang:          %.1f ms" % (lazy * 1000))
+    print("import all submodules:   %.1f ms" % (eager * 1000))
+    print("speedup:                 %.1fx" % (eager / max(lazy, 1e-6)))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Python version: 3
+#
+# Memory benchmark of node layouts.
+# Simon Fraser University
+# Jetic Gu
+#
+# Loads the sample files repeated many times with the slotted node classes of
+# conll, tree and AMR, then again with equivalent classes that keep a per
+# instance __dict__ (the layout before __slots__ were introduced).
+#
+#     > python -m natlang.test.benchNodeMemory [repeat]
+#
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import inspect
+import tempfile
+import tracemalloc
+
+from natlang.format import conll, tree, AMR
+
+
+def dictLayout(cls):
+    '''
+    @return: class, same methods as cls but with a per instance __dict__
+    '''
+    hidden = set(cls.__slots__) | set(["__slots__", "__dict__", "__weakref__"])
+    namespace = dict((k, v) for k, v in cls.__dict__.items()
+                     if k not in hidden)
+    return type(cls.__name__, (object,), namespace)
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.time()
+    content = load()
+    elapsed = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del content
+    return elapsed, memory
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    currentdir = os.path.dirname(
+        os.path.abspath(inspect.getfile(inspect.currentframe())))
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for module, className, sample in (
+                (conll, "Node", "sampleCoNLLU.conll"),
+                (tree, "Node", "sampleTree.txt"),
+                (AMR, "NodeAMR", "sampleAMR.amr")):
+            fileName = os.path.join(tmpdir, sample)
+            with open(os.path.join(currentdir, sample)) as f:
+                content = f.read().rstrip("\n") + "\n"
+            if getattr(module, "blankLineSeparated", False):
+                content += "\n"
+            with open(fileName, 'w') as f:
+                for i in range(repeat):
+                    f.write(content)
+
+            slotted = getattr(module, className)
+            for layout, cls in (("__dict__", dictLayout(slotted)),
+                                ("__slots__", slotted)):
+                setattr(module, className, cls)
+                try:
+                    elapsed, memory = measure(
+                        lambda: module.load(fileName, verbose=False))
+                finally:
+                    setattr(module, className, slotted)
+                print("%-6s %-10s %8.2f s %10.1f MB" %
+                      (module.__name__.split(".")[-1], layout, elapsed,
+                       memory / 1024.0 ** 2))
+    finally:
+        shutil.rmtree(tmpdir)
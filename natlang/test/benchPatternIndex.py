@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Indexed Dependency Expression search benchmark.
+# Simon Fraser University
+# Jetic Gu
+#
+# Counts the matches of frequent and rare patterns in a synthetic treebank,
+# once walking every node of every sentence and once through a
+# TreebankIndex, which only visits the candidate anchors of the sentences
+# holding every label the pattern requires.
+#
+#     > python -m natlang.test.benchPatternIndex
+#
+from __future__ import print_function
+import random
+import timeit
+
+from natlang.format.conll import constructFromText
+from natlang.analysis.conllTransformer import compile
+from natlang.analysis.treebankIndex import TreebankIndex
+
+patterns = [
+    "(* nsubj * |*| * obj *)",
+    "(|nsubj[UPOS=PRON]|)",
+    # 1 sentence in 1000 has a vocative
+    "(|vocative|)",
+    "(* vocative * |*[UPOS=VERB]| *)",
+]
+
+deprels = ["nsubj", "obj", "det", "amod", "advmod", "case", "nmod", "punct"]
+tags = ["NOUN", "VERB", "PRON", "ADJ", "DET", "ADP", "PUNCT"]
+
+
+def sentence(random, length, rare):
+    # Tokens are attached in random order, each to one attached before it
+    order = list(range(1, length + 1))
+    random.shuffle(order)
+    heads = {order[0]: 0}
+    for i, token in enumerate(order[1:], start=1):
+        heads[token] = order[random.randint(0, i - 1)]
+    lines = []
+    for i in range(1, length + 1):
+        deprel = "root" if heads[i] == 0 else random.choice(deprels)
+        if rare and i == order[-1]:
+            deprel = "vocative"
+        tag = "VERB" if heads[i] == 0 else random.choice(tags)
+        lines.append("\t".join([str(i), "w", "w", tag, tag, "_",
+                                str(heads[i]), deprel, "_", "_"]))
+    return constructFromText(lines)
+
+
+if __name__ == '__main__':
+    generator = random.Random(0)
+    corpus = [sentence(generator, 20, i % 1000 == 0) for i in range(20000)]
+    elapsed = min(timeit.repeat(lambda: TreebankIndex(corpus),
+                                number=1, repeat=3))
+    print("Indexing %d sentences: %8.1f ms" % (len(corpus), elapsed * 1e3))
+    index = TreebankIndex(corpus)
+    for pattern in patterns:
+        compiled = compile(pattern)
+        assert compiled.count(corpus) == compiled.count(index)
+        scan = min(timeit.repeat(lambda: compiled.count(corpus),
+                                 number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: compiled.count(index),
+                                    number=1, repeat=3))
+        print("%-34s %6d matches, scan %8.1f ms, index %8.1f ms" %
+              (pattern, compiled.count(index), scan * 1e3, indexed * 1e3))
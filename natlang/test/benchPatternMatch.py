@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Dependency Expression matching benchmark on wide trees.
+# Simon Fraser University
+# Jetic Gu
+#
+# Matches patterns with several * wildcards against a root with many right
+# children, mostly dep. The compiled matcher runs a dynamic program over
+# (pattern position, sibling position); a plain backtracking matcher with the
+# same semantics is timed for comparison on the smaller trees, it tries both
+# choices of every inner * (zero or one sibling).
+#
+#     > python -m natlang.test.benchPatternMatch
+#
+from __future__ import print_function
+import timeit
+
+from natlang.format.conll import constructFromText
+from natlang.analysis.conllTransformer import compile
+
+patterns = [
+    "(|root| * dep * dep * dep *)",
+    # Ambiguous dep items and no match: backtracking tries every way of
+    # placing them
+    "(|root| * dep * dep * iobj *)",
+    "(|root| * dep * dep * dep * iobj *)",
+    "(|root| * dep * dep * dep * dep * iobj *)",
+]
+
+
+def wideSentence(length):
+    # Token 1 is the root, the others its right children: mostly dep, then
+    # nsubj, obj, advmod and punct at the end
+    tail = ["nsubj", "obj", "advmod", "punct"]
+    deprels = ["dep"] * (length - 1 - len(tail)) + tail
+    return constructFromText([
+        "\t".join([str(i), "w", "w", "X", "X", "_",
+                   "0" if i == 1 else "1",
+                   "root" if i == 1 else deprels[i - 2], "_", "_"])
+        for i in range(1, length + 1)]).rightChild
+
+
+def backtrack(items, node):
+    # Naive matcher over the deprels of the sibling chain
+    if items == ["*"]:
+        return True
+    if len(items) == 0 or node is None:
+        return len(items) == 0 and node is None
+    if items[0] == "*":
+        return backtrack(items[1:], node) or\
+            backtrack(items[1:], node.sibling)
+    if node.deprel != items[0]:
+        return False
+    return backtrack(items[1:], node.sibling)
+
+
+if __name__ == '__main__':
+    for pattern in patterns:
+        print(pattern)
+        compiled = compile(pattern)
+        items = pattern.split("|")[2].replace(")", "").split()
+        for length in (10, 20, 40, 1000, 10000):
+            node = wideSentence(length)
+            number = max(1, 10000 // length)
+            elapsed = min(timeit.repeat(lambda: compiled.match(node),
+                                        number=number, repeat=3))
+            line = "%6d children: %10.1f us" % (length,
+                                                elapsed / number * 1e6)
+            if length <= 40:
+                elapsed = min(timeit.repeat(
+                    lambda: backtrack(items, node.rightChild),
+                    number=1, repeat=3))
+                line += ", backtracking %10.1f us" % (elapsed * 1e6)
+            print(line)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Rule set matching benchmark.
+# Simon Fraser University
+# Jetic Gu
+#
+# Runs rule sets of growing size over a synthetic treebank, once pattern by
+# pattern and once through a PatternSet, which tests each node only against
+# the rules whose top deprel is its deprel.
+#
+#     > python -m natlang.test.benchPatternSet
+#
+from __future__ import print_function
+import random
+import timeit
+
+from natlang.analysis.conllTransformer import compile, PatternSet
+from natlang.test.benchPatternIndex import sentence, deprels, tags
+
+
+def rules(count):
+    result = []
+    for i in range(count):
+        deprel = deprels[i % len(deprels)]
+        tag = tags[(i // len(deprels)) % len(tags)]
+        result.append("(* " + deprels[(i + 1) % len(deprels)] + " * |" +
+                      deprel + "[UPOS=" + tag + "]| *)")
+    return result
+
+
+if __name__ == '__main__':
+    generator = random.Random(0)
+    corpus = [sentence(generator, 20, False) for i in range(2000)]
+    for count in (1, 8, 32, 64):
+        patterns = rules(count)
+        compiled = [compile(pattern) for pattern in patterns]
+        ruleSet = PatternSet(patterns)
+        assert [x.count(corpus) for x in compiled] == ruleSet.count(corpus)
+        separate = min(timeit.repeat(
+            lambda: [x.count(corpus) for x in compiled], number=1, repeat=3))
+        together = min(timeit.repeat(lambda: ruleSet.count(corpus),
+                                     number=1, repeat=3))
+        print("%3d rules: one by one %8.1f ms, PatternSet %8.1f ms" %
+              (count, separate * 1e3, together * 1e3))
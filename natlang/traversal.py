@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Iterative tree traversal.
+# Simon Fraser University
+# Jetic Gu
+#
+# Generators walking trees with explicit stacks instead of recursion, so that
+# long sibling chains and deep trees neither hit the recursion limit nor pay
+# for a Python frame per node. The structure of a tree is given as functions
+# returning the children of a node, those of the node classes of
+# natlang.format are defined below.
+#
+from __future__ import absolute_import
+import sys
+import unittest
+__version__ = "0.3a"
+
+
+def siblings(node):
+    '''
+    @param node: node with a sibling attribute, or None
+    @return: generator of node and its following siblings
+    '''
+    while node is not None:
+        yield node
+        node = node.sibling
+    return
+
+
+def preorder(roots, children):
+    '''
+    @param roots: iterable of nodes, e.g. siblings(node)
+    @param children: function, children(node) returns the list of the
+        children of node in order
+    @return: generator of the nodes, each before its descendants
+    '''
+    stack = list(roots)
+    stack.reverse()
+    pop = stack.pop
+    while len(stack) != 0:
+        node = pop()
+        yield node
+        subNodes = children(node)
+        if subNodes:
+            stack.extend(reversed(subNodes))
+    return
+
+
+def inorder(roots, left, right):
+    '''
+    @param roots: iterable of nodes
+    @param left: function, left(node) returns the list of the children of
+        node that come before it
+    @param right: function, right(node) returns the list of the children of
+        node that come after it
+    @return: generator of the nodes, each after the subtrees of its left
+        children and before those of its right children
+    '''
+    stack = [(node, False) for node in roots]
+    stack.reverse()
+    pop = stack.pop
+    while len(stack) != 0:
+        node, expanded = pop()
+        if expanded is True:
+            yield node
+            continue
+        subNodes = right(node)
+        if subNodes:
+            stack += [(subNode, False) for subNode in reversed(subNodes)]
+        stack.append((node, True))
+        subNodes = left(node)
+        if subNodes:
+            stack += [(subNode, False) for subNode in reversed(subNodes)]
+    return
+
+
+def walk(roots, children):
+    '''
+    Depth-first walk reporting when each subtree is entered and left, e.g.
+    to print brackets.
+    @param roots: iterable of nodes
+    @param children: function, children(node) returns the children of node
+        in order
+    @return: generator of (node, entering) tuples. entering is True before
+        the descendants of node and False after them.
+    '''
+    path = []
+    stack = [iter(roots)]
+    while len(stack) != 0:
+        for node in stack[-1]:
+            yield node, True
+            path.append(node)
+            stack.append(iter(children(node)))
+            break
+        else:
+            stack.pop()
+            if len(path) != 0:
+                yield path.pop(), False
+    return
+
+
+def postorder(roots, children):
+    '''
+    @param roots: iterable of nodes
+    @param children: function, children(node) returns the children of node
+        in order
+    @return: generator of the nodes, each after its descendants
+    '''
+    return (node for node, entering in walk(roots, children)
+            if entering is False)
+
+
+def siblingList(node):
+    '''
+    @return: list of node and its following siblings, empty if node is None
+    '''
+    result = []
+    while node is not None:
+        result.append(node)
+        node = node.sibling
+    return result
+
+
+# Children of the node classes in natlang.format, for the generic traversals
+# above
+def conllLeft(node):
+    return siblingList(node.leftChild)
+
+
+def conllRight(node):
+    return siblingList(node.rightChild)
+
+
+def conllChildren(node):
+    '''
+    @return: list of the left then the right children of a
+        natlang.format.conll.Node
+    '''
+    return siblingList(node.leftChild) + siblingList(node.rightChild)
+
+
+def treeChildren(node):
+    return siblingList(node.child)
+
+
+# Traversals of the natlang.format node classes. They follow the child and
+# sibling links directly and are several times faster than the generic ones,
+# loaders and exporters run them on every sentence. Like the recursive
+# methods they replace, they cover node, its following siblings and all
+# their descendants.
+_resume = object()
+
+
+def conllInorder(node):
+    '''
+    @param node: natlang.format.conll.Node
+    @return: generator of the nodes in sentence order, i.e. left children,
+        then the node, then its right children
+    '''
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    while True:
+        while node is not None:
+            push(node)
+            node = node.leftChild
+        if len(stack) == 0:
+            return
+        node = pop()
+        if node is _resume:
+            # The subtree of the previous sibling is done, start this one
+            node = pop()
+            continue
+        yield node
+        if node.sibling is not None:
+            push(node.sibling)
+            push(_resume)
+        node = node.rightChild
+
+
+def conllPreorder(node):
+    '''
+    @param node: natlang.format.conll.Node
+    @return: generator of the nodes, each before its left then right
+        children
+    '''
+    stack = [node]
+    push = stack.append
+    pop = stack.pop
+    while len(stack) != 0:
+        node = pop()
+        yield node
+        if node.sibling is not None:
+            push(node.sibling)
+        if node.rightChild is not None:
+            push(node.rightChild)
+        if node.leftChild is not None:
+            push(node.leftChild)
+    return
+
+
+def treePreorder(node):
+    '''
+    @param node: natlang.format.tree.Node
+    @return: generator of the nodes, each before its children
+    '''
+    stack = [node]
+    push = stack.append
+    pop = stack.pop
+    while len(stack) != 0:
+        node = pop()
+        yield node
+        if node.sibling is not None:
+            push(node.sibling)
+        if node.child is not None:
+            push(node.child)
+    return
+
+
+class TestTraversal(unittest.TestCase):
+    def testOrders(self):
+        # 1 -> (2 -> (4, 5), 3)
+        tree = {1: [2, 3], 2: [4, 5], 3: [], 4: [], 5: []}
+        self.assertEqual([1, 2, 4, 5, 3], list(preorder([1], tree.get)))
+        self.assertEqual([4, 5, 2, 3, 1], list(postorder([1], tree.get)))
+        self.assertEqual([1, 2, 4, 5, 3, 6],
+                         list(preorder([1, 6], lambda x: tree.get(x, []))))
+        self.assertEqual([(1, True), (2, True), (4, True), (4, False),
+                          (5, True), (5, False), (2, False), (3, True),
+                          (3, False), (1, False)],
+                         list(walk([1], tree.get)))
+        # 2 has left child 4 and right child 5, 1 has right child 3
+        left = {2: [4]}
+        right = {1: [2, 3], 2: [5]}
+        self.assertEqual([1, 4, 2, 5, 3],
+                         list(inorder([1], lambda x: left.get(x, []),
+                                      lambda x: right.get(x, []))))
+        return
+
+    def testNodeTraversals(self):
+        import os
+        import inspect
+        from natlang.format import conll, tree
+        currentdir = os.path.dirname(
+            os.path.abspath(inspect.getfile(inspect.currentframe())))
+        for node in conll.load(currentdir + "/test/sampleCoNLLU.conll",
+                               verbose=False):
+            roots = siblingList(node)
+            self.assertEqual(
+                list(inorder(roots, conllLeft, conllRight)),
+                list(conllInorder(node)))
+            self.assertEqual(list(preorder(roots, conllChildren)),
+                             list(conllPreorder(node)))
+            self.assertEqual(list(inorder([node.rightChild], conllLeft,
+                                          conllRight)),
+                             list(conllInorder(node.rightChild)))
+        for node in tree.load(currentdir + "/test/sampleTree.txt",
+                              verbose=False):
+            if node is None:
+                continue
+            roots = siblingList(node.child)
+            self.assertEqual(list(preorder(roots, treeChildren)),
+                             list(treePreorder(node.child)))
+        return
+
+    def testWideAndDeepConll(self):
+        from natlang.format import conll
+        from natlang.analysis import conllTransformer
+        # 500 tokens: 299 left dependents of the head, which has 200 right
+        # dependents
+        lines = []
+        for i in range(1, 501):
+            head = 0 if i == 300 else 300
+            lines.append("\t".join([str(i), "w" + str(i), "_", "X", "_", "_",
+                                    str(head), "root" if head == 0 else "dep",
+                                    "_", "_"]))
+        node = conll.constructFromText(lines)
+        self.assertEqual(500, len(node.phrase))
+        self.assertEqual(200, len(list(siblings(node.rightChild.rightChild))))
+        self.assertEqual("\n".join(lines) + "\n", node.export())
+        self.assertEqual(
+            499, len(conllTransformer.matchPattern("(|dep|)", node)))
+        self.assertEqual(
+            [node.rightChild],
+            conllTransformer.matchPattern("(*|root|*)", node))
+        # A chain of 3000 tokens, each the head of the previous one
+        lines = []
+        for i in range(1, 3001):
+            lines.append("\t".join([str(i), "w" + str(i), "_", "X", "_", "_",
+                                    str((i + 1) % 3001), "dep", "_", "_"]))
+        node = conll.constructFromText(lines)
+        self.assertEqual(3000, len(node.phrase))
+        self.assertEqual("\n".join(lines) + "\n", node.export())
+        self.assertEqual(
+            3000, len(conllTransformer.matchPattern("(*|dep|)", node)))
+        return
+
+    def testWideAndDeepTree(self):
+        from natlang.format import tree, AMR
+        leaves = " ".join(["(X w" + str(i) + ")" for i in range(500)])
+        node = tree.constructTreeFromStr("(ROOT (S " + leaves + "))")
+        self.assertEqual(500, len(node))
+        self.assertEqual(3, node.depth)
+        self.assertEqual("(ROOT (S " + leaves + "))", node.export())
+        actions = tree.constructRNNGAction(node)
+        self.assertEqual(504, len(actions))
+        self.assertEqual([("NT", "ROOT"), ("NT", "S"), ("GEN", "w0")],
+                         actions[:3])
+        self.assertEqual(node.export(),
+                         tree.constructTreeFromRNNGAction(actions).export()
+                         .replace("NaN", "X"))
+        string = "(X " * 3000 + "(Y w)" + ")" * 3000
+        node = tree.constructTreeFromStr(string)
+        self.assertEqual(3001, node.depth)
+        self.assertEqual(string, node.export())
+        parColumn = node.columnFormat()[0]
+        self.assertEqual(list(range(3001)), parColumn[1:])
+        string = "( a0 / x" + "".join([" :ARG0 ( a" + str(i) + " / x"
+                                       for i in range(1, 2000)]) +\
+            " )" * 2000
+        self.assertEqual(string, AMR.constructAMRFromStr(string).export())
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# Python version: 2/3
+#
+# Vocabulary tables mapping strings to integer ids.
+# Simon Fraser University
+# Jetic Gu
+#
+from __future__ import absolute_import
+import os
+import sys
+import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+__version__ = "0.3a"
+
+
+class Vocabulary():
+    '''
+    Bidirectional mapping between strings and consecutive integer ids,
+    assigned in order of first appearance.
+    @param items: iterable of str, initial entries
+    '''
+    def __init__(self, items=()):
+        self.items = []
+        self.ids = {}
+        for item in items:
+            self.index(item)
+        return
+
+    def index(self, item):
+        '''
+        @return: int, the id of item. item is added if it is new.
+        '''
+        try:
+            return self.ids[item]
+        except KeyError:
+            self.ids[item] = len(self.items)
+            self.items.append(item)
+            return len(self.items) - 1
+
+    def intern(self, item):
+        '''
+        @return: str, the copy of item held by the vocabulary, so that equal
+            labels are the same object. item is added if it is new.
+        '''
+        try:
+            return self.items[self.ids[item]]
+        except KeyError:
+            self.ids[item] = len(self.items)
+            self.items.append(item)
+            return item
+
+    def get(self, item, default=None):
+        '''
+        @return: int, the id of item, default if it is not in the vocabulary
+        '''
+        return self.ids.get(item, default)
+
+    def lookup(self, id):
+        '''
+        @return: str, the entry with the given id
+        '''
+        return self.items[id]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.ids
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getstate__(self):
+        # ids is rebuilt from items, which halves the size of pickles
+        return self.items
+
+    def __setstate__(self, state):
+        self.items = state
+        self.ids = dict((item, i) for i, item in enumerate(state))
+        return
+
+
+class VocabularySet(dict):
+    '''
+    Named vocabulary tables, e.g. one per CoNLL column. Tables are created on
+    first access.
+    '''
+    def __missing__(self, name):
+        vocabulary = self[name] = Vocabulary()
+        return vocabulary
+
+    def save(self, fileName):
+        with open(os.path.expanduser(fileName), 'wb') as f:
+            pickle.dump(dict(self), f, pickle.HIGHEST_PROTOCOL)
+        return
+
+    @classmethod
+    def load(cls, fileName):
+        with open(os.path.expanduser(fileName), 'rb') as f:
+            return cls(pickle.load(f))
+
+
+# Tables the format loaders intern closed class labels (tags, dependency
+# relations, constituent labels, AMR roles) into by default, so that equal
+# labels are shared across the whole corpus.
+shared = VocabularySet()
+
+
+class TestVocabulary(unittest.TestCase):
+    def testVocabulary(self):
+        vocabulary = Vocabulary(["NOUN", "VERB"])
+        self.assertEqual(0, vocabulary.index("NOUN"))
+        self.assertEqual(2, vocabulary.index("ADJ"))
+        self.assertEqual(2, vocabulary.index("ADJ"))
+        self.assertEqual(3, len(vocabulary))
+        self.assertEqual("VERB", vocabulary.lookup(1))
+        self.assertEqual(None, vocabulary.get("ADV"))
+        self.assertNotIn("ADV", vocabulary)
+        restored = pickle.loads(pickle.dumps(vocabulary))
+        self.assertEqual(["NOUN", "VERB", "ADJ"], list(restored))
+        self.assertEqual(2, restored.get("ADJ"))
+        return
+
+    def testIntern(self):
+        import shutil
+        import tempfile
+        vocabularies = VocabularySet()
+        a = "".join(["NO", "UN"])
+        b = "".join(["N", "OUN"])
+        self.assertIsNot(a, b)
+        self.assertIs(vocabularies["UPOS"].intern(a),
+                      vocabularies["UPOS"].intern(b))
+        self.assertEqual(0, vocabularies["UPOS"].get("NOUN"))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            vocabularies.save(os.path.join(tmpdir, "vocab.pkl"))
+            restored = VocabularySet.load(os.path.join(tmpdir, "vocab.pkl"))
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(["NOUN"], list(restored["UPOS"]))
+        self.assertEqual(0, len(restored["DEPREL"]))
+        return
+
+
+if __name__ == '__main__':
+    if not bool(getattr(sys, 'ps1', sys.flags.interactive)):
+        unittest.main()